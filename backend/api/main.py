@@ -3,15 +3,44 @@ main.py
 FastAPI application entry point
 """
 
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 import sys
 import os
 
 # Add backend to path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from models.database import engine, Base
+from models.database import engine, Base, SessionLocal, pending_migrations
+from models import shards
+from services import admission, instrumentation, metrics, profiler, search_index
+
+
+@asynccontextmanager
+async def lifespan(app):
+    # Migrating can rewrite whole tables under an exclusive lock, so it is
+    # an explicit step (pipeline.py --migrate); refuse an outdated schema
+    pending = pending_migrations() + shards.pending_shard_migrations()
+    if pending:
+        for change in pending:
+            print(f"Database migration pending: {change}")
+        raise RuntimeError(
+            f"Database schema is out of date ({len(pending)} pending changes); "
+            "run `python backend/data_collection/pipeline.py --migrate` before starting the API"
+        )
+
+    # Warm the search index so the first lookup does not pay for the build
+    db = SessionLocal()
+    try:
+        search_index.get_index(db)
+    except Exception as e:
+        print(f"Search index not built at startup: {e}")
+    finally:
+        db.close()
+    yield
+
 
 # create fastapi app
 app = FastAPI(
@@ -19,7 +48,8 @@ app = FastAPI(
     description= "API for f1 race data analysis",
     version= "1.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    lifespan=lifespan
 )
 
 # Configure CORS (for React frontend)
@@ -31,6 +61,18 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Concurrency limits for expensive routes (F1_API_CONCURRENCY); registered
+# first so the accounting middleware also sees rejected requests
+admission.install(app)
+
+# Per-request SQL accounting and latency histograms
+instrumentation.instrument_engine(engine)
+instrumentation.install(app)
+
+# On-demand request profiling (?profile=1 with X-Admin-Token), opt-in only
+if os.environ.get("F1_API_PROFILING", "") == "1":
+    profiler.install(app, engine=engine)
+
 # Health check endpoint
 @app.get("/")
 def read_root():
@@ -41,12 +83,22 @@ def read_root():
         "docs": "/docs"
     }
 
+# Prometheus scrape endpoint
+@app.get("/metrics", include_in_schema=False)
+def read_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 # Include routes
-from routes import drivers, races, laps, teams
+from routes import admin, circuits, drivers, races, laps, teams, standings, search
 app.include_router(drivers.router, prefix="/api/v1")
 app.include_router(races.router, prefix="/api/v1")
 app.include_router(laps.router, prefix="/api/v1")
 app.include_router(teams.router, prefix="/api/v1")
+app.include_router(teams.teams_router, prefix="/api/v1")
+app.include_router(standings.router, prefix="/api/v1")
+app.include_router(search.router, prefix="/api/v1")
+app.include_router(circuits.router, prefix="/api/v1")
+app.include_router(admin.router, prefix="/api/v1")
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,158 @@
+"""
+admin.py
+Admin-only API endpoints: the ETL job queue
+"""
+
+from typing import List
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+import sys
+import os
+
+# Add backend to path
+backend_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, backend_dir)
+sys.path.append(os.path.join(backend_dir, "data_collection"))
+
+import fastf1_cache
+from models.database import SessionLocal, Job
+from services import job_queue
+from services.auth import require_admin
+
+router = APIRouter(prefix="/admin/jobs", tags=["admin"], dependencies=[Depends(require_admin)])
+
+
+def get_db():
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+@router.post("/")
+def submit_jobs(
+    season: int = Query(..., description="Season year"),
+    event: List[str] = Query(None, description="Event name (repeatable; default: every event of the season)"),
+    telemetry: bool = Query(False, description="Also store per-lap car telemetry"),
+    max_attempts: int = Query(None, ge=1, le=20, description="Attempts before a job stays failed"),
+    db: Session = Depends(get_db)
+):
+    """
+    Queue ETL loads for workers (backend/data_collection/worker.py)
+
+    Event names are resolved against the season's FastF1 schedule, and an
+    event that already has a queued or running job is not queued again;
+    its existing job is returned.
+
+    Args:
+        season: Season year
+        event: Event names, e.g. 'Monaco Grand Prix' or 'monaco' (default:
+            one job that a worker expands into every event of the season)
+        telemetry: Also store per-lap car telemetry
+        max_attempts: Attempts per job (default: F1_JOB_MAX_ATTEMPTS)
+    """
+    if event:
+        try:
+            event = fastf1_cache.resolve_events(season, event)
+        except Exception as e:
+            raise HTTPException(
+                status_code=503, detail=f"Could not load the {season} schedule to resolve event names: {e}"
+            )
+    jobs = job_queue.submit(db, season, event, telemetry=telemetry, max_attempts=max_attempts)
+    return {
+        "created": sum(1 for _, created in jobs if created),
+        "jobs": [{**job_queue.job_dict(job), "created": created} for job, created in jobs]
+    }
+
+
+@router.get("/")
+def get_jobs(
+    status: str = Query(None, pattern="^(queued|running|succeeded|failed|cancelled)$", description="Only jobs with this status"),
+    season: int = Query(None, description="Only jobs of this season"),
+    limit: int = Query(50, ge=1, le=500, description="Number of jobs"),
+    db: Session = Depends(get_db)
+):
+    """
+    Get the queue's counts and throughput with the most recent jobs
+
+    Args:
+        status: Only jobs with this status
+        season: Only jobs of this season
+        limit: Number of jobs, newest first (default: 50)
+    """
+    query = db.query(Job)
+    if status is not None:
+        query = query.filter(Job.status == status)
+    if season is not None:
+        query = query.filter(Job.year == season)
+    jobs = query.order_by(Job.id.desc()).limit(limit).all()
+
+    return {
+        "stats": job_queue.stats(db),
+        "count": len(jobs),
+        "jobs": [job_queue.job_dict(job) for job in jobs]
+    }
+
+
+@router.get("/stats")
+def get_job_stats(
+    window: int = Query(60, ge=1, le=7 * 24 * 60, description="Throughput window in minutes"),
+    db: Session = Depends(get_db)
+):
+    """
+    Get counts per status and season, live workers and throughput
+
+    Args:
+        window: Minutes of finished jobs the throughput covers (default: 60)
+    """
+    return job_queue.stats(db, window_minutes=window)
+
+
+@router.get("/{job_id}")
+def get_job(job_id: int, db: Session = Depends(get_db)):
+    """
+    Get one job
+
+    Args:
+        job_id: Job ID
+    """
+    job = db.get(Job, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return job_queue.job_dict(job)
+
+
+@router.post("/{job_id}/retry")
+def retry_job(job_id: int, db: Session = Depends(get_db)):
+    """
+    Queue a failed or cancelled job again with fresh attempts
+
+    Args:
+        job_id: Job ID
+    """
+    job = job_queue.retry(db, job_id)
+    if job is None:
+        if db.get(Job, job_id) is None:
+            raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+        raise HTTPException(
+            status_code=409, detail=f"Job {job_id} is not failed or cancelled, or its event is queued again"
+        )
+    return job_queue.job_dict(job)
+
+
+@router.post("/{job_id}/cancel")
+def cancel_job(job_id: int, db: Session = Depends(get_db)):
+    """
+    Cancel a queued job
+
+    Args:
+        job_id: Job ID
+    """
+    job = job_queue.cancel(db, job_id)
+    if job is None:
+        if db.get(Job, job_id) is None:
+            raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+        raise HTTPException(status_code=409, detail=f"Job {job_id} is not queued")
+    return job_queue.job_dict(job)
@@ -0,0 +1,241 @@
+"""
+circuits.py
+Circuit-related API endpoints: a venue's races across seasons
+"""
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from sqlalchemy.orm import Session, aliased
+from sqlalchemy import func, or_
+import sys
+import os
+
+# Add backend to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.database import SessionLocal, Circuit, Race, Driver, Lap, Result, circuit_key, LAP_DELETED
+from models import shards
+from services import cache
+from services.coalesce import coalesce
+
+router = APIRouter(prefix="/circuits", tags=["circuits"])
+
+# Dependency
+def get_db(request: Request):
+    db = SessionLocal()
+    shards.route_request(db, request)
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def resolve_circuit(db, circuit):
+    """
+    Circuit by id, key or location ('monaco', 'Spa-Francorchamps'), or by
+    the name of an event held there ('Monaco Grand Prix')
+    """
+    found = None
+    if circuit.isdigit():
+        found = db.get(Circuit, int(circuit))
+    if found is None:
+        found = db.query(Circuit).filter(Circuit.circuit_key == circuit_key(circuit)).first()
+    if found is None:
+        found = db.query(Circuit).join(Race, Race.circuit_id == Circuit.id).filter(
+            func.lower(Race.race_name) == circuit.lower()
+        ).order_by(Race.year.desc()).first()
+    if found is None:
+        raise HTTPException(status_code=404, detail=f"Circuit {circuit} not found")
+    return found
+
+
+def _circuit_dict(circuit):
+    return {
+        "id": circuit.id,
+        "key": circuit.circuit_key,
+        "name": circuit.name,
+        "country": circuit.country
+    }
+
+
+def _driver_dict(code, name):
+    return {"driver_code": code, "driver_name": name} if code is not None else None
+
+
+@router.get("/")
+@coalesce
+def get_circuits(db: Session = Depends(get_db)):
+    """
+    Get every circuit with the seasons raced there
+    """
+    def compute():
+        rows = db.query(
+            Circuit,
+            func.count(Race.id),
+            func.min(Race.year),
+            func.max(Race.year)
+        ).outerjoin(
+            Race, Race.circuit_id == Circuit.id
+        ).group_by(Circuit.id).order_by(Circuit.name).all()
+
+        return {
+            "count": len(rows),
+            "circuits": [
+                {
+                    **_circuit_dict(circuit),
+                    "races": races,
+                    "first_season": first_season,
+                    "last_season": last_season
+                }
+                for circuit, races, first_season, last_season in rows
+            ]
+        }
+
+    return cache.get_or_compute(db, ("circuits",), compute)
+
+
+@router.get("/{circuit}/history")
+@coalesce
+def get_circuit_history(
+    circuit: str,
+    since: int = Query(None, description="First season to include"),
+    until: int = Query(None, description="Last season to include"),
+    db: Session = Depends(get_db)
+):
+    """
+    Get a circuit's winners, pole-to-win conversion and fastest laps across seasons
+
+    One query over the circuit's races (ix_races_circuit_id_year) for the
+    race winner and the driver starting from pole, and one per batch of
+    season shards for the fastest lap of each race, deleted laps excluded.
+    Grid position stands in for qualifying, since only race and sprint
+    classifications are stored.
+
+    Args:
+        circuit: Circuit id, key or location (e.g. "monaco"), or the name of
+            an event held there (e.g. "Monaco Grand Prix")
+        since: First season to include
+        until: Last season to include
+    """
+    found = resolve_circuit(db, circuit)
+
+    def compute():
+        races = db.query(
+            Race.id, Race.year, Race.race_name, Race.event_date
+        ).filter(Race.circuit_id == found.id)
+        if since is not None:
+            races = races.filter(Race.year >= since)
+        if until is not None:
+            races = races.filter(Race.year <= until)
+        races = races.cte("circuit_races")
+
+        race_results = db.query(Result).filter(
+            Result.race_id.in_(db.query(races.c.id)),
+            or_(Result.session_type == 'R', Result.session_type.is_(None))
+        )
+        winners = race_results.filter(Result.position == 1).with_entities(
+            Result.race_id, Result.driver_id, Result.grid_position
+        ).subquery()
+        poles = race_results.filter(Result.grid_position == 1).with_entities(
+            Result.race_id, Result.driver_id
+        ).subquery()
+
+        winner = aliased(Driver)
+        pole = aliased(Driver)
+        rows = db.query(
+            races.c.id, races.c.year, races.c.race_name, races.c.event_date,
+            winner.driver_code, winner.driver_name, winners.c.grid_position,
+            pole.driver_code, pole.driver_name, poles.c.driver_id == winners.c.driver_id
+        ).select_from(races).outerjoin(
+            winners, winners.c.race_id == races.c.id
+        ).outerjoin(
+            winner, winner.id == winners.c.driver_id
+        ).outerjoin(
+            poles, poles.c.race_id == races.c.id
+        ).outerjoin(
+            pole, pole.id == poles.c.driver_id
+        ).order_by(races.c.year, races.c.id).all()
+
+        # Laps may span more season shards than fit on one connection
+        season_races = {}
+        for race_id, year, *_ in rows:
+            season_races.setdefault(year, []).append(race_id)
+        fastest_laps = {}
+        for seasons in shards.season_batches(db, season_races):
+            ranked_laps = db.query(
+                Lap.race_id,
+                Lap.driver_id,
+                Lap.lap_number,
+                Lap.lap_time_seconds.label("lap_time"),
+                func.row_number().over(
+                    partition_by=Lap.race_id, order_by=(Lap.lap_time_ms, Lap.id)
+                ).label("rank")
+            ).filter(
+                Lap.race_id.in_([race_id for season in seasons for race_id in season_races[season]]),
+                Lap.lap_time_ms.isnot(None),
+                or_(Lap.lap_flags.is_(None), Lap.lap_flags.op("&")(LAP_DELETED) == 0)
+            ).subquery()
+            for race_id, *fastest in db.query(
+                ranked_laps.c.race_id, Driver.driver_code, Driver.driver_name,
+                ranked_laps.c.lap_time, ranked_laps.c.lap_number
+            ).join(
+                Driver, Driver.id == ranked_laps.c.driver_id
+            ).filter(ranked_laps.c.rank == 1):
+                fastest_laps[race_id] = fastest
+
+        history = []
+        wins = {}
+        poles_known = converted = 0
+        record = None
+        for (race_id, year, race_name, event_date,
+             winner_code, winner_name, winner_grid,
+             pole_code, pole_name, pole_won) in rows:
+            if winner_code is not None:
+                driver_wins = wins.setdefault(winner_code, {
+                    "driver_code": winner_code, "driver_name": winner_name, "wins": 0, "seasons": []
+                })
+                driver_wins["wins"] += 1
+                driver_wins["seasons"].append(year)
+            pole_converted = None
+            if pole_code is not None and winner_code is not None:
+                pole_converted = bool(pole_won)
+                poles_known += 1
+                converted += pole_converted
+
+            fastest_lap = None
+            if race_id in fastest_laps:
+                fastest_code, fastest_name, lap_time, lap_number = fastest_laps[race_id]
+                fastest_lap = {
+                    **_driver_dict(fastest_code, fastest_name),
+                    "lap_time": round(lap_time, 3),
+                    "lap_number": lap_number
+                }
+                if record is None or lap_time < record["lap_time"]:
+                    record = {**fastest_lap, "season": year, "race": race_name}
+
+            history.append({
+                "race_id": race_id,
+                "season": year,
+                "race": race_name,
+                "date": event_date.isoformat() if event_date else None,
+                "winner": {
+                    **_driver_dict(winner_code, winner_name), "grid_position": winner_grid
+                } if winner_code is not None else None,
+                "pole": _driver_dict(pole_code, pole_name),
+                "pole_converted": pole_converted,
+                "fastest_lap": fastest_lap
+            })
+
+        return {
+            "circuit": _circuit_dict(found),
+            "count": len(history),
+            "pole_to_win": {
+                "races": poles_known,
+                "converted": converted,
+                "rate": round(converted / poles_known, 3) if poles_known else None
+            },
+            "lap_record": record,
+            "winners": sorted(wins.values(), key=lambda w: (-w["wins"], w["driver_code"])),
+            "races": history
+        }
+
+    return cache.get_or_compute(db, ("circuit_history", found.id, since, until), compute)
@@ -3,7 +3,7 @@ drivers.py
 Driver-related API endpoints
 """
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from sqlalchemy.orm import Session
 from sqlalchemy import func, or_
 import sys
@@ -12,27 +12,18 @@ import os
 # Add backend to path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from models.database import SessionLocal, Race, Driver, Lap, Result
+from models.database import SessionLocal, Race, Driver, Lap, Result, Team
+from models import shards
+from services.driver_stats import season_driver_stats
+from services.search_index import resolve_driver
+from services.coalesce import coalesce
 
 router = APIRouter(prefix="/drivers", tags=["drivers"])
 
-# Simple parser so non-numeric positions do not break stats.
-def _to_int_or_none(value):
-    if value is None:
-        return None
-    if isinstance(value, (int, float)):
-        try:
-            return int(value)
-        except (TypeError, ValueError):
-            return None
-    if isinstance(value, str):
-        stripped = value.strip()
-        return int(stripped) if stripped.isdigit() else None
-    return None
-
 # Dependency
-def get_db():
+def get_db(request: Request):
     db = SessionLocal()
+    shards.route_request(db, request)
     try:
         yield db
     finally:
@@ -40,6 +31,7 @@ def get_db():
 
 
 @router.get("/")
+@coalesce
 def get_all_drivers(
     season: int = Query(None, description="Filter drivers by season"),
     db: Session = Depends(get_db)
@@ -72,14 +64,16 @@ def get_all_drivers(
         driver_entries = []
         for driver in drivers:
             team_row = (
-                db.query(Lap.team, func.count(Lap.id).label("team_count"))
+                db.query(Team.name, func.count(Lap.id).label("team_count"))
+                .select_from(Lap)
                 .join(Race, Lap.race_id == Race.id)
+                .join(Team, Lap.team_id == Team.id)
                 .filter(
                     Lap.driver_id == driver.id,
                     Race.year == season
                 )
-                .group_by(Lap.team)
-                .order_by(func.count(Lap.id).desc())
+                .group_by(Lap.team_id)
+                .order_by(func.count(Lap.id).desc(), Team.name)
                 .first()
             )
             team_name = team_row[0] if team_row else None
@@ -116,6 +110,7 @@ def get_all_drivers(
 
 
 @router.get("/compare")
+@coalesce
 def compare_driver(
     driver1: str = Query(..., description="First driver code"),
     driver2: str = Query(..., description="Second driver code"),
@@ -133,66 +128,34 @@ def compare_driver(
     driver1_code = driver1
     driver2_code = driver2
     
-    driver1 = db.query(Driver).filter(Driver.driver_code == driver1_code).first()
-    driver2 = db.query(Driver).filter(Driver.driver_code == driver2_code).first()
+    driver1 = resolve_driver(db, driver1_code)
+    driver2 = resolve_driver(db, driver2_code)
 
     if not driver1:
         raise HTTPException(status_code=404, detail=f"Driver {driver1_code} not found")
     if not driver2:
         raise HTTPException(status_code=404, detail=f"Driver {driver2_code} not found")
     
-    # Get races in season
-    races = db.query(Race).filter(Race.year == season).all()
-    race_ids = [race.id for race in races]
-    
-    if not race_ids:
+    # Check the season has races
+    if db.query(Race.id).filter(Race.year == season).first() is None:
         return {
             "season": season,
             "message": f"No races found for season {season}",
             "drivers": None
         }
     
-    # Helper function to get driver stats
-    def get_driver_comparison_stats(driver, race_ids):
-        results = db.query(Result).filter(
-            Result.driver_id == driver.id,
-            Result.race_id.in_(race_ids)
-        ).all()
-        
-        laps = db.query(Lap).filter(
-            Lap.driver_id == driver.id,
-            Lap.race_id.in_(race_ids),
-            Lap.lap_time_seconds.isnot(None)
-        ).all()
-        
-        total_points = sum(r.points for r in results if r.points)
+    season_stats = season_driver_stats(db, {driver1.id, driver2.id}, season)
 
-        race_results = [r for r in results if (r.session_type or 'R') == 'R']
-        finishes = []
-        for r in race_results:
-            pos = _to_int_or_none(r.position)
-            if pos is not None:
-                finishes.append(pos)
-        avg_finish = sum(finishes) / len(finishes) if finishes else None
-        
-        # Calculate wins and podiums
-        wins = sum(1 for pos in finishes if pos == 1)
-        podiums = sum(1 for pos in finishes if pos <= 3)
-        
+    def get_driver_comparison_stats(driver):
         return {
             "code": driver.driver_code,
             "name": driver.driver_name,
             "number": driver.driver_number,
-            "races_entered": len(race_results),
-            "total_points": round(total_points, 1) if total_points else 0,
-            "average_finish_position": round(avg_finish, 2) if avg_finish else None,
-            "wins": wins,
-            "podiums": podiums,
-            "total_laps": len(laps)
+            **season_stats[driver.id]
         }
     
-    stats1 = get_driver_comparison_stats(driver1, race_ids)
-    stats2 = get_driver_comparison_stats(driver2, race_ids)
+    stats1 = get_driver_comparison_stats(driver1)
+    stats2 = get_driver_comparison_stats(driver2)
     
     return {
         "season": season,
@@ -203,6 +166,7 @@ def compare_driver(
     }
 
 @router.get("/{driver_code}")
+@coalesce
 def get_driver(driver_code: str, db: Session = Depends(get_db)):
     """
     Get driver by code
@@ -210,7 +174,7 @@ def get_driver(driver_code: str, db: Session = Depends(get_db)):
     Args:
         driver_code: Driver code (e.g., VER, HAM, LEC)
     """
-    driver = db.query(Driver).filter(Driver.driver_code == driver_code).first()
+    driver = resolve_driver(db, driver_code)
     
     if not driver:
         raise HTTPException(status_code=404, detail=f"Driver {driver_code} not found")
@@ -223,6 +187,7 @@ def get_driver(driver_code: str, db: Session = Depends(get_db)):
     }
 
 @router.get("/{driver_code}/stats")
+@coalesce
 def get_driver_stats(
     driver_code: str,
     season: int = Query(2024, description="Season year"),
@@ -239,15 +204,12 @@ def get_driver_stats(
         Driver statistics including points, average position, lap times
     """
     # Get driver
-    driver = db.query(Driver).filter(Driver.driver_code == driver_code).first()
+    driver = resolve_driver(db, driver_code)
     if not driver:
         raise HTTPException(status_code=404, detail=f"Driver {driver_code} not found")
     
-    # Get races in season
-    races = db.query(Race).filter(Race.year == season).all()
-    race_ids = [race.id for race in races]
-    
-    if not race_ids:
+    # Check the season has races
+    if db.query(Race.id).filter(Race.year == season).first() is None:
         return {
             "driver": {
                 "code": driver.driver_code,
@@ -259,33 +221,7 @@ def get_driver_stats(
             "stats": None
         }
     
-    # Get driver's results
-    results = db.query(Result).filter(
-        Result.driver_id == driver.id,
-        Result.race_id.in_(race_ids)
-    ).all()
-    
-    # Get driver's laps
-    laps = db.query(Lap).filter(
-        Lap.driver_id == driver.id,
-        Lap.race_id.in_(race_ids),
-        Lap.lap_time_seconds.isnot(None)
-    ).all()
-    
-    # Calculate statistics
-    total_points = sum(r.points for r in results if r.points)
-
-    race_results = [r for r in results if (r.session_type or 'R') == 'R']
-    finishes = []
-    for r in race_results:
-        pos = _to_int_or_none(r.position)
-        if pos is not None:
-            finishes.append(pos)
-    avg_finish = sum(finishes) / len(finishes) if finishes else None
-    
-    # Calculate wins and podiums
-    wins = sum(1 for pos in finishes if pos == 1)
-    podiums = sum(1 for pos in finishes if pos <= 3)
+    stats = season_driver_stats(db, [driver.id], season)[driver.id]
     
     return {
         "driver": {
@@ -294,18 +230,12 @@ def get_driver_stats(
             "number": driver.driver_number
         },
         "season": season,
-        "stats": {
-            "races_entered": len(race_results),
-            "total_points": round(total_points, 1) if total_points else 0,
-            "average_finish_position": round(avg_finish, 2) if avg_finish else None,
-            "wins": wins,
-            "podiums": podiums,
-            "total_laps": len(laps)
-        }
+        "stats": stats
     }
 
 
 @router.get("/{driver_code}/races")
+@coalesce
 def get_driver_races(
     driver_code: str,
     season: int = Query(2024, description="Season year"),
@@ -319,7 +249,7 @@ def get_driver_races(
         season: Season year
     """
     # Get driver
-    driver = db.query(Driver).filter(Driver.driver_code == driver_code).first()
+    driver = resolve_driver(db, driver_code)
     if not driver:
         raise HTTPException(status_code=404, detail=f"Driver {driver_code} not found")
     
@@ -3,7 +3,7 @@ laps.py
 Laps-related API endpoints
 '''
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from sqlalchemy.orm import Session
 import sys
 import os
@@ -13,12 +13,17 @@ backend_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__
 sys.path.insert(0, backend_dir)
 
 from models.database import SessionLocal, Race, Lap, Driver
+from models import shards
+from services import lap_engine
+from services.lap_classification import require_classified
+from services.coalesce import coalesce
 
 router = APIRouter(prefix="/laps", tags=["laps"])
 
 
-def get_db():
+def get_db(request: Request):
     db = SessionLocal()
+    shards.route_request(db, request)
     try:
         yield db
     finally:
@@ -26,9 +31,11 @@ def get_db():
 
 
 @router.get("/fastest")
+@coalesce
 def get_fastest_laps(
     season: int = Query(2024, description="Season year"),
     limit: int = Query(10, description="Number of results"),
+    only_clean: bool = Query(False, description="Only clean laps: no in/out laps, lap 1, deleted, SC/VSC, red flag or inaccurate laps"),
     db: Session = Depends(get_db)
 ):
     """
@@ -37,16 +44,29 @@ def get_fastest_laps(
     Args:
         season: Season year
         limit: Number of results to return
+        only_clean: Exclude laps with classification flags
     """
+    if only_clean:
+        require_classified(db, season=season)
+
+    if lap_engine.ENABLED:
+        return {
+            "season": season,
+            "fastest_laps": _fastest_laps_from_engine(db, season, limit, only_clean)
+        }
+
     # Get races in season
     races = db.query(Race).filter(Race.year == season).all()
     race_ids = [race.id for race in races]
     
     # Get fastest laps
+    # On the stored milliseconds, so clean laps are sorted from ix_laps_clean alone
+    filters = [Lap.race_id.in_(race_ids), Lap.lap_time_ms.isnot(None)]
+    if only_clean:
+        filters.append(Lap.is_clean())
     fastest = db.query(Lap, Driver, Race).join(Driver).join(Race).filter(
-        Lap.race_id.in_(race_ids),
-        Lap.lap_time_seconds.isnot(None)
-    ).order_by(Lap.lap_time_seconds).limit(limit).all()
+        *filters
+    ).order_by(Lap.lap_time_ms, Lap.id).limit(limit).all()
     
     return {
         "season": season,
@@ -60,4 +80,43 @@ def get_fastest_laps(
             }
             for lap, driver, race in fastest
         ]
+    }
+
+
+def _fastest_laps_from_engine(db, season, limit, only_clean=False):
+    """Top-N laps of a season from the in-memory lap engine"""
+    season_laps = lap_engine.get_season(db, season)
+    rows = season_laps.fastest(limit, season_laps.mask(clean=only_clean))
+
+    driver_ids = {int(season_laps.drivers[code]) for code in season_laps.driver[rows]}
+    race_ids = {int(race_id) for race_id in season_laps.race_id[rows]}
+    drivers = {d.id: d for d in db.query(Driver).filter(Driver.id.in_(driver_ids)).all()}
+    races = {r.id: r for r in db.query(Race).filter(Race.id.in_(race_ids)).all()}
+
+    fastest = []
+    for row, lap_time in zip(rows, lap_engine.lap_seconds(season_laps.lap_time[rows])):
+        driver = drivers[int(season_laps.drivers[season_laps.driver[row]])]
+        fastest.append({
+            "lap_time": float(lap_time),
+            "driver_code": driver.driver_code,
+            "driver_name": driver.driver_name,
+            "race": races[int(season_laps.race_id[row])].race_name,
+            "lap_number": int(season_laps.lap_number[row])
+        })
+    return fastest
+
+
+@router.get("/engine")
+def get_lap_engine_status():
+    """
+    Get the state of the in-memory lap engine
+
+    Returns:
+        Whether the engine is enabled and rows/bytes held per loaded season
+    """
+    report = lap_engine.memory_report()
+    return {
+        "enabled": lap_engine.ENABLED,
+        "total_bytes": sum(season["bytes"] for season in report.values()),
+        "seasons": report
     }
\ No newline at end of file
@@ -3,9 +3,10 @@ races.py
 Race-related API endpoints
 """
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from sqlalchemy.orm import Session
 from sqlalchemy import func, or_
+import pandas as pd
 import sys
 import os
 
@@ -13,13 +14,19 @@ import os
 backend_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 sys.path.insert(0, backend_dir)
 
-from models.database import SessionLocal, Race, Result, Lap, Driver
+from models.database import SessionLocal, Race, Result, Lap, Driver, Stint, Team, Compound
+from models import shards
+from services import cache, telemetry_store
+from services.lap_classification import require_classified
+from services.search_index import resolve_driver
+from services.coalesce import coalesce
 
 router = APIRouter(prefix="/races", tags=["races"])
 
 
-def get_db():
+def get_db(request: Request):
     db = SessionLocal()
+    shards.route_request(db, request)
     try:
         yield db
     finally:
@@ -27,6 +34,7 @@ def get_db():
 
 
 @router.get("/")
+@coalesce
 def get_all_races(
     season: int = Query(2024, description="Season year"),
     db: Session = Depends(get_db)
@@ -59,6 +67,7 @@ def get_all_races(
 
 
 @router.get("/{race_id}")
+@coalesce
 def get_race(race_id: int, db: Session = Depends(get_db)):
     """
     Get race details by ID
@@ -82,6 +91,7 @@ def get_race(race_id: int, db: Session = Depends(get_db)):
 
 
 @router.get("/{race_id}/results")
+@coalesce
 def get_race_results(race_id: int, db: Session = Depends(get_db)):
     """
     Get race results (finishing order)
@@ -134,6 +144,7 @@ def get_race_results(race_id: int, db: Session = Depends(get_db)):
 
 
 @router.get("/{race_id}/laps")
+@coalesce
 def get_race_laps(
     race_id: int,
     driver_code: str = Query(None, description="Filter by driver code"),
@@ -155,9 +166,10 @@ def get_race_laps(
     
     # Filter by driver if specified
     if driver_code:
-        driver = db.query(Driver).filter(Driver.driver_code == driver_code).first()
+        driver = resolve_driver(db, driver_code)
         if not driver:
             raise HTTPException(status_code=404, detail=f"Driver {driver_code} not found")
+        driver_code = driver.driver_code
         query = query.filter(Lap.driver_id == driver.id)
     
     laps = query.order_by(Lap.lap_number).limit(1000).all()  # Limit for performance
@@ -183,4 +195,454 @@ def get_race_laps(
             }
             for lap, driver in laps
         ]
-    }
\ No newline at end of file
+    }
+
+def _build_race_trace(rows):
+    """
+    Reconstruct the running order lap by lap
+
+    Cumulative time is a per-driver cumulative sum of lap times. Lap times
+    are often missing (lap 1 from the timing feed, red-flag laps), so a lap
+    without a time is estimated as the fastest time anyone set on that lap,
+    and flagged as estimated; an estimated driver ranks behind drivers with
+    a real time on the same cumulative time. A lap with no time for anyone
+    leaves every driver unranked on that lap only, and later cumulative
+    times leave it out.
+
+    Args:
+        rows: Iterable of (driver_code, lap_number, lap_time_seconds)
+
+    Returns:
+        List of laps, each with the ordered driver entries
+    """
+    df = pd.DataFrame(rows, columns=["driver_code", "lap_number", "lap_time"])
+    if df.empty:
+        return []
+
+    df["lap_time"] = df["lap_time"].astype(float)
+    df["estimated"] = df["lap_time"].isna()
+
+    # Laps x drivers; NaN where the driver has no lap or no time
+    times = df.pivot(index="lap_number", columns="driver_code", values="lap_time")
+    filled = times.mask(times.isna(), times.min(axis=1), axis=0)
+    # cumsum skips the NaN of laps nobody has a time for
+    cumulative = filled.cumsum().reset_index().melt(
+        id_vars="lap_number", var_name="driver_code", value_name="cumulative_time"
+    )
+    df = df.merge(cumulative, on=["lap_number", "driver_code"], how="left")
+
+    # Lap-wise ranking across all drivers at once
+    df = df.sort_values(
+        ["lap_number", "cumulative_time", "estimated", "driver_code"], kind="mergesort", na_position="last"
+    )
+    ranked = df["cumulative_time"].notna()
+    df["position"] = df[ranked].groupby("lap_number", sort=False).cumcount() + 1
+    df["gap_to_leader"] = df["cumulative_time"] - df.groupby("lap_number", sort=False)["cumulative_time"].transform("min")
+    df["gap_to_ahead"] = df.groupby("lap_number", sort=False)["cumulative_time"].diff()
+
+    trace = []
+    for lap_number, lap_df in df.groupby("lap_number", sort=True):
+        trace.append({
+            "lap_number": int(lap_number),
+            "drivers": [
+                {
+                    "driver_code": driver_code,
+                    "position": int(position) if pd.notna(position) else None,
+                    "cumulative_time": round(cumulative, 3) if pd.notna(cumulative) else None,
+                    "gap_to_leader": round(gap_leader, 3) if pd.notna(gap_leader) else None,
+                    "gap_to_ahead": round(gap_ahead, 3) if pd.notna(gap_ahead) else None,
+                    "estimated": bool(estimated)
+                }
+                for driver_code, position, cumulative, gap_leader, gap_ahead, estimated in zip(
+                    lap_df["driver_code"],
+                    lap_df["position"],
+                    lap_df["cumulative_time"],
+                    lap_df["gap_to_leader"],
+                    lap_df["gap_to_ahead"],
+                    lap_df["estimated"]
+                )
+            ]
+        })
+    return trace
+
+
+@router.get("/{race_id}/trace")
+@coalesce
+def get_race_trace(race_id: int, db: Session = Depends(get_db)):
+    """
+    Get the race trace: cumulative time and gaps for every driver on every lap
+
+    Args:
+        race_id: Race ID
+    """
+    race = db.query(Race).filter(Race.id == race_id).first()
+    if not race:
+        raise HTTPException(status_code=404, detail=f"Race {race_id} not found")
+
+    def compute():
+        rows = db.query(
+            Driver.driver_code,
+            Lap.lap_number,
+            Lap.lap_time_seconds
+        ).join(Driver, Lap.driver_id == Driver.id).filter(
+            Lap.race_id == race_id
+        ).all()
+
+        trace = _build_race_trace(rows)
+        return {
+            "race": {
+                "id": race.id,
+                "name": race.race_name
+            },
+            "count": len(trace),
+            "laps": trace
+        }
+
+    return cache.get_or_compute(db, ("race_trace", race_id), compute, race_id=race_id)
+
+
+def _seconds(value):
+    return round(value, 3) if value is not None else None
+
+
+SECTOR_COLUMNS = (Lap.sector1_time_seconds, Lap.sector2_time_seconds, Lap.sector3_time_seconds)
+SPEED_TRAPS = {
+    "speed_i1": Lap.speed_i1,
+    "speed_i2": Lap.speed_i2,
+    "speed_fl": Lap.speed_fl,
+    "speed_st": Lap.speed_st,
+}
+
+
+def _driver_sector_bests(db, race_id, only_clean):
+    """Best sector times and best lap per driver, best theoretical lap first"""
+    filters = [Lap.race_id == race_id]
+    if only_clean:
+        filters.append(Lap.is_clean())
+
+    best_sectors = [func.min(column) for column in SECTOR_COLUMNS]
+    theoretical = (best_sectors[0] + best_sectors[1] + best_sectors[2]).label("theoretical")
+
+    return db.query(
+        Driver.driver_code,
+        func.min(Lap.team),
+        *best_sectors,
+        theoretical,
+        func.min(Lap.lap_time_seconds)
+    ).join(
+        Driver, Lap.driver_id == Driver.id
+    ).filter(
+        *filters
+    ).group_by(
+        Lap.driver_id
+    ).order_by(
+        theoretical.is_(None), theoretical, Driver.driver_code
+    ).all()
+
+
+@router.get("/{race_id}/sectors")
+@coalesce
+def get_race_sectors(
+    race_id: int,
+    only_clean: bool = Query(False, description="Only clean laps: no in/out laps, lap 1, deleted, SC/VSC, red flag or inaccurate laps"),
+    db: Session = Depends(get_db)
+):
+    """
+    Get the fastest time in each sector and every driver's best sectors
+
+    Args:
+        race_id: Race ID
+        only_clean: Use clean laps only
+    """
+    race = db.query(Race).filter(Race.id == race_id).first()
+    if not race:
+        raise HTTPException(status_code=404, detail=f"Race {race_id} not found")
+
+    def compute():
+        filters = [Lap.race_id == race_id]
+        if only_clean:
+            require_classified(db, race_id=race_id)
+            filters.append(Lap.is_clean())
+
+        # One ranking per sector; the rows ranked first hold the overall bests
+        ranks = [
+            func.row_number().over(order_by=(column.is_(None), column, Lap.id)).label(f"rank{i}")
+            for i, column in enumerate(SECTOR_COLUMNS, start=1)
+        ]
+        ranked = db.query(
+            Lap.driver_id, Lap.lap_number, *SECTOR_COLUMNS, *ranks
+        ).filter(*filters).subquery()
+        leaders = db.query(
+            Driver.driver_code, ranked
+        ).join(
+            Driver, ranked.c.driver_id == Driver.id
+        ).filter(
+            or_(ranked.c.rank1 == 1, ranked.c.rank2 == 1, ranked.c.rank3 == 1)
+        ).all()
+
+        best_sectors = {}
+        for sector in (1, 2, 3):
+            for row in leaders:
+                time = getattr(row, f"sector{sector}_time_seconds")
+                if getattr(row, f"rank{sector}") == 1 and time is not None:
+                    best_sectors[f"sector{sector}"] = {
+                        "time": _seconds(time),
+                        "driver_code": row.driver_code,
+                        "lap_number": row.lap_number
+                    }
+            best_sectors.setdefault(f"sector{sector}", None)
+
+        drivers = _driver_sector_bests(db, race_id, only_clean)
+        return {
+            "race": {
+                "id": race.id,
+                "name": race.race_name
+            },
+            "best_sectors": best_sectors,
+            "drivers": [
+                {
+                    "driver_code": driver_code,
+                    "team": team,
+                    "sector1": _seconds(sector1),
+                    "sector2": _seconds(sector2),
+                    "sector3": _seconds(sector3)
+                }
+                for driver_code, team, sector1, sector2, sector3, _, _ in drivers
+            ]
+        }
+
+    return cache.get_or_compute(db, ("race_sectors", race_id, only_clean), compute, race_id=race_id)
+
+
+@router.get("/{race_id}/theoretical-best")
+@coalesce
+def get_race_theoretical_best(
+    race_id: int,
+    only_clean: bool = Query(False, description="Only clean laps: no in/out laps, lap 1, deleted, SC/VSC, red flag or inaccurate laps"),
+    db: Session = Depends(get_db)
+):
+    """
+    Get each driver's theoretical best lap (sum of best sectors)
+
+    Drivers are ordered by theoretical best; drivers missing a sector
+    time come last.
+
+    Args:
+        race_id: Race ID
+        only_clean: Use clean laps only
+    """
+    race = db.query(Race).filter(Race.id == race_id).first()
+    if not race:
+        raise HTTPException(status_code=404, detail=f"Race {race_id} not found")
+
+    def compute():
+        if only_clean:
+            require_classified(db, race_id=race_id)
+        rows = _driver_sector_bests(db, race_id, only_clean)
+        fastest = rows[0][5] if rows else None
+        return {
+            "race": {
+                "id": race.id,
+                "name": race.race_name
+            },
+            "count": len(rows),
+            "drivers": [
+                {
+                    "driver_code": driver_code,
+                    "team": team,
+                    "theoretical_best": _seconds(theoretical),
+                    "best_lap": _seconds(best_lap),
+                    "time_lost": _seconds(best_lap - theoretical)
+                        if best_lap is not None and theoretical is not None else None,
+                    "gap_to_fastest": _seconds(theoretical - fastest)
+                        if theoretical is not None and fastest is not None else None
+                }
+                for driver_code, team, _, _, _, theoretical, best_lap in rows
+            ]
+        }
+
+    return cache.get_or_compute(db, ("race_theoretical_best", race_id, only_clean), compute, race_id=race_id)
+
+
+@router.get("/{race_id}/speed-traps")
+@coalesce
+def get_race_speed_traps(race_id: int, db: Session = Depends(get_db)):
+    """
+    Get every driver's top speed at each speed trap
+
+    Traps are intermediate 1 and 2, the finish line and the speed trap
+    (km/h). Drivers are ordered by speed trap top speed.
+
+    Args:
+        race_id: Race ID
+    """
+    race = db.query(Race).filter(Race.id == race_id).first()
+    if not race:
+        raise HTTPException(status_code=404, detail=f"Race {race_id} not found")
+
+    def compute():
+        top_speeds = [func.max(column).label(name) for name, column in SPEED_TRAPS.items()]
+        rows = db.query(
+            Driver.driver_code,
+            func.min(Lap.team).label("team"),
+            *top_speeds
+        ).join(
+            Driver, Lap.driver_id == Driver.id
+        ).filter(
+            Lap.race_id == race_id
+        ).group_by(
+            Lap.driver_id
+        ).order_by(
+            top_speeds[-1].is_(None), top_speeds[-1].desc(), Driver.driver_code
+        ).all()
+
+        fastest = {}
+        for name in SPEED_TRAPS:
+            leader = max(
+                (row for row in rows if getattr(row, name) is not None),
+                key=lambda row: getattr(row, name),
+                default=None
+            )
+            fastest[name] = {
+                "driver_code": leader.driver_code,
+                "speed": getattr(leader, name)
+            } if leader else None
+
+        return {
+            "race": {
+                "id": race.id,
+                "name": race.race_name
+            },
+            "fastest": fastest,
+            "drivers": [
+                {
+                    "driver_code": row.driver_code,
+                    "team": row.team,
+                    **{name: getattr(row, name) for name in SPEED_TRAPS}
+                }
+                for row in rows
+            ]
+        }
+
+    return cache.get_or_compute(db, ("race_speed_traps", race_id), compute, race_id=race_id)
+
+
+@router.get("/{race_id}/strategy")
+@coalesce
+def get_race_strategy(race_id: int, db: Session = Depends(get_db)):
+    """
+    Get every driver's tyre stints
+
+    Stints are stored when the race is loaded. Laps count the stint's
+    first and last lap; tyre age at fit is the laps the tyres had already
+    run. Drivers are ordered by race finishing position.
+
+    Args:
+        race_id: Race ID
+    """
+    race = db.query(Race).filter(Race.id == race_id).first()
+    if not race:
+        raise HTTPException(status_code=404, detail=f"Race {race_id} not found")
+
+    def compute():
+        finish = db.query(
+            Result.driver_id,
+            Result.position
+        ).filter(
+            Result.race_id == race_id,
+            or_(Result.session_type == 'R', Result.session_type.is_(None))
+        ).subquery()
+
+        rows = db.query(
+            Driver.driver_code,
+            Team.name.label("team"),
+            Stint.stint,
+            Compound.name.label("compound"),
+            Stint.start_lap,
+            Stint.end_lap,
+            Stint.tyre_age_at_fit
+        ).select_from(Stint).join(
+            Driver, Stint.driver_id == Driver.id
+        ).join(
+            Team, Stint.team_id == Team.id
+        ).outerjoin(
+            Compound, Stint.compound_id == Compound.id
+        ).outerjoin(
+            finish, finish.c.driver_id == Stint.driver_id
+        ).filter(
+            Stint.race_id == race_id
+        ).order_by(
+            finish.c.position.is_(None), finish.c.position, Driver.driver_code, Stint.stint
+        ).all()
+
+        drivers = {}
+        for row in rows:
+            driver = drivers.setdefault(row.driver_code, {
+                "driver_code": row.driver_code,
+                "team": row.team,
+                "stints": []
+            })
+            driver["stints"].append({
+                "stint": row.stint,
+                "compound": row.compound,
+                "start_lap": row.start_lap,
+                "end_lap": row.end_lap,
+                "laps": row.end_lap - row.start_lap + 1,
+                "tyre_age_at_fit": row.tyre_age_at_fit
+            })
+
+        return {
+            "race": {
+                "id": race.id,
+                "name": race.race_name
+            },
+            "count": len(drivers),
+            "drivers": list(drivers.values())
+        }
+
+    return cache.get_or_compute(db, ("race_strategy", race_id), compute, race_id=race_id)
+
+
+@router.get("/{race_id}/telemetry/{driver_code}/{lap_number}")
+@coalesce
+def get_lap_telemetry(
+    race_id: int,
+    driver_code: str,
+    lap_number: int,
+    points: int = Query(500, ge=10, le=5000, description="Number of samples to return"),
+    db: Session = Depends(get_db)
+):
+    """
+    Get car telemetry for one lap, downsampled with LTTB
+
+    Args:
+        race_id: Race ID
+        driver_code: Driver code (e.g., VER)
+        lap_number: Lap number
+        points: Target number of samples (default: 500)
+    """
+    race = db.query(Race).filter(Race.id == race_id).first()
+    if not race:
+        raise HTTPException(status_code=404, detail=f"Race {race_id} not found")
+
+    lap = telemetry_store.read_lap(race_id, driver_code, lap_number)
+    if lap is None:
+        raise HTTPException(
+            status_code=404,
+            detail=f"No telemetry for {driver_code} lap {lap_number} in race {race_id}"
+        )
+
+    samples = len(lap["distance"])
+    channels = telemetry_store.downsample_lap(lap, points)
+
+    return {
+        "race": {
+            "id": race.id,
+            "name": race.race_name
+        },
+        "driver_code": driver_code,
+        "lap_number": lap_number,
+        "samples": samples,
+        "count": len(channels["distance"]),
+        "telemetry": channels
+    }
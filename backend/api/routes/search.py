@@ -0,0 +1,65 @@
+"""
+search.py
+Fuzzy search over drivers, teams and events
+"""
+
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+import sys
+import os
+
+# Add backend to path
+backend_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, backend_dir)
+
+from models.database import SessionLocal
+from services.search_index import get_index
+
+router = APIRouter(prefix="/search", tags=["search"])
+
+
+def get_db():
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+@router.get("/")
+def search(
+    q: str = Query(..., min_length=1, description="Search text (e.g. 'verstappen', 'red bull', 'monaco')"),
+    entity_type: str = Query(None, alias="type", pattern="^(driver|team|race)$", description="Restrict to one entity type"),
+    season: int = Query(None, description="Only entities present in this season"),
+    limit: int = Query(10, ge=1, le=50, description="Number of results"),
+    db: Session = Depends(get_db)
+):
+    """
+    Search drivers, teams and races by name, code, alias or historical name
+
+    Args:
+        q: Search text
+        type: Optional entity type (driver, team or race)
+        season: Optional season year
+        limit: Number of results to return
+    """
+    index = get_index(db)
+    matches = index.search(
+        q,
+        types=[entity_type] if entity_type else None,
+        season=season,
+        limit=limit
+    )
+
+    return {
+        "query": q,
+        "count": len(matches),
+        "results": [
+            {
+                "type": match_type,
+                "score": round(score, 1),
+                **entity
+            }
+            for score, match_type, entity in matches
+        ]
+    }
@@ -0,0 +1,262 @@
+"""
+standings.py
+Championship standings API endpoints
+"""
+
+from fastapi import APIRouter, Depends, Query, Request
+from sqlalchemy.orm import Session
+from sqlalchemy import func, and_, true
+import sys
+import os
+
+# Add backend to path
+backend_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, backend_dir)
+
+from models.database import SessionLocal, Race, Lap, Driver, Result, Team
+from models import shards
+from services import cache
+from services.coalesce import coalesce
+
+router = APIRouter(prefix="/standings", tags=["standings"])
+
+STANDINGS_TYPE_PATTERN = "^(drivers|constructors)$"
+
+
+def get_db(request: Request):
+    db = SessionLocal()
+    shards.route_request(db, request)
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def _standings_rows(db, season, standings_type):
+    """
+    Cumulative points and championship position for every competitor after
+    every round of a season, from a single windowed query
+
+    Points include sprint results. Competitors are cross joined with rounds
+    so anyone missing a race still carries their total forward.
+
+    Returns:
+        Rows of (round, race_id, race_name, event_date, competitor_id,
+        code, name, points, cumulative_points, position) ordered by round
+        and position
+    """
+    rounds = db.query(
+        Race.id.label("race_id"),
+        Race.race_name,
+        Race.event_date,
+        func.row_number().over(order_by=(Race.event_date, Race.id)).label("round")
+    ).filter(Race.year == season).cte("rounds")
+
+    if standings_type == "constructors":
+        lap_team = db.query(
+            Lap.race_id,
+            Lap.driver_id,
+            func.min(Lap.team_id).label("team_id")
+        ).join(
+            rounds, rounds.c.race_id == Lap.race_id
+        ).group_by(Lap.race_id, Lap.driver_id).cte("lap_team")
+
+        race_points = db.query(
+            Result.race_id,
+            Team.name.label("competitor_id"),
+            func.sum(func.coalesce(Result.points, 0)).label("points")
+        ).join(
+            lap_team,
+            and_(lap_team.c.race_id == Result.race_id, lap_team.c.driver_id == Result.driver_id)
+        ).join(
+            Team, Team.id == lap_team.c.team_id
+        ).group_by(Result.race_id, Team.name).cte("race_points")
+    else:
+        race_points = db.query(
+            Result.race_id,
+            Result.driver_id.label("competitor_id"),
+            func.sum(func.coalesce(Result.points, 0)).label("points")
+        ).join(
+            rounds, rounds.c.race_id == Result.race_id
+        ).group_by(Result.race_id, Result.driver_id).cte("race_points")
+
+    competitors = db.query(race_points.c.competitor_id).distinct().cte("competitors")
+
+    points = func.coalesce(race_points.c.points, 0)
+    cumulative = db.query(
+        rounds.c.round,
+        rounds.c.race_id,
+        rounds.c.race_name,
+        rounds.c.event_date,
+        competitors.c.competitor_id,
+        points.label("points"),
+        func.sum(points).over(
+            partition_by=competitors.c.competitor_id,
+            order_by=rounds.c.round
+        ).label("cumulative_points")
+    ).select_from(rounds).join(
+        competitors, true()
+    ).outerjoin(
+        race_points,
+        and_(
+            race_points.c.race_id == rounds.c.race_id,
+            race_points.c.competitor_id == competitors.c.competitor_id
+        )
+    ).cte("cumulative")
+
+    position = func.rank().over(
+        partition_by=cumulative.c.round,
+        order_by=cumulative.c.cumulative_points.desc()
+    )
+
+    if standings_type == "constructors":
+        query = db.query(
+            cumulative.c.round,
+            cumulative.c.race_id,
+            cumulative.c.race_name,
+            cumulative.c.event_date,
+            cumulative.c.competitor_id,
+            cumulative.c.competitor_id.label("code"),
+            cumulative.c.competitor_id.label("name"),
+            cumulative.c.points,
+            cumulative.c.cumulative_points,
+            position
+        )
+        name_order = cumulative.c.competitor_id
+    else:
+        query = db.query(
+            cumulative.c.round,
+            cumulative.c.race_id,
+            cumulative.c.race_name,
+            cumulative.c.event_date,
+            cumulative.c.competitor_id,
+            Driver.driver_code,
+            Driver.driver_name,
+            cumulative.c.points,
+            cumulative.c.cumulative_points,
+            position
+        ).join(Driver, Driver.id == cumulative.c.competitor_id)
+        name_order = Driver.driver_code
+
+    return query.order_by(
+        cumulative.c.round,
+        cumulative.c.cumulative_points.desc(),
+        name_order
+    ).all()
+
+
+def _cached_standings_rows(db, season, standings_type):
+    return cache.get_or_compute(
+        db,
+        ("standings_rows", season, standings_type),
+        lambda: _standings_rows(db, season, standings_type),
+        season=season
+    )
+
+
+@router.get("/")
+@coalesce
+def get_standings(
+    season: int = Query(2024, description="Season year"),
+    standings_type: str = Query(
+        "drivers", alias="type", pattern=STANDINGS_TYPE_PATTERN,
+        description="drivers or constructors"
+    ),
+    after_round: int = Query(None, ge=1, description="Standings after this round (default: latest)"),
+    db: Session = Depends(get_db)
+):
+    """
+    Get championship standings after a given round
+
+    Args:
+        season: Season year (default: 2024)
+        type: "drivers" or "constructors"
+        after_round: Round number; the latest loaded round if omitted
+    """
+    rows = _cached_standings_rows(db, season, standings_type)
+
+    if not rows:
+        return {
+            "season": season,
+            "type": standings_type,
+            "message": f"No races found for season {season}",
+            "standings": []
+        }
+
+    last_round = rows[-1][0]
+    round_number = min(after_round, last_round) if after_round else last_round
+    round_rows = [row for row in rows if row[0] == round_number]
+    _, race_id, race_name, event_date = round_rows[0][:4]
+
+    return {
+        "season": season,
+        "type": standings_type,
+        "after_round": {
+            "round": round_number,
+            "race_id": race_id,
+            "race_name": race_name,
+            "date": event_date.isoformat() if event_date else None
+        },
+        "standings": [
+            {
+                "position": position,
+                "code": code,
+                "name": name,
+                "points": round(cumulative_points or 0, 1)
+            }
+            for _, _, _, _, _, code, name, _, cumulative_points, position in round_rows
+        ]
+    }
+
+
+@router.get("/progression")
+@coalesce
+def get_standings_progression(
+    season: int = Query(2024, description="Season year"),
+    standings_type: str = Query(
+        "drivers", alias="type", pattern=STANDINGS_TYPE_PATTERN,
+        description="drivers or constructors"
+    ),
+    db: Session = Depends(get_db)
+):
+    """
+    Get cumulative points and championship position for every competitor
+    after every round of a season
+
+    Args:
+        season: Season year (default: 2024)
+        type: "drivers" or "constructors"
+    """
+    rows = _cached_standings_rows(db, season, standings_type)
+
+    rounds = []
+    competitors = {}
+    for (round_number, race_id, race_name, event_date, competitor_id, code, name,
+         points, cumulative_points, position) in rows:
+        if not rounds or rounds[-1]["round"] != round_number:
+            rounds.append({
+                "round": round_number,
+                "race_id": race_id,
+                "race_name": race_name,
+                "date": event_date.isoformat() if event_date else None
+            })
+        entry = competitors.setdefault(competitor_id, {
+            "code": code,
+            "name": name,
+            "points": [],
+            "cumulative_points": [],
+            "positions": []
+        })
+        entry["points"].append(round(points or 0, 1))
+        entry["cumulative_points"].append(round(cumulative_points or 0, 1))
+        entry["positions"].append(position)
+
+    # Order competitors by their position after the latest round
+    ordered = sorted(competitors.values(), key=lambda c: (c["positions"][-1], c["code"]))
+
+    return {
+        "season": season,
+        "type": standings_type,
+        "rounds": rounds,
+        "competitors": ordered
+    }
@@ -3,31 +3,43 @@ team.py
 Team-related API endpoints
 """
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from sqlalchemy.orm import Session
-from sqlalchemy import func, or_
+from sqlalchemy import func, or_, case, and_
+from sqlalchemy.orm import aliased
 import sys
 import os
 
 # Add backend to path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from models.database import SessionLocal, Race, Driver, Lap, Result
+from models.database import SessionLocal, Race, Driver, Lap, Result, Team, Stint, Compound
+from models import shards
+from services import cache, lap_engine
+from services.lap_classification import require_classified
+from services.search_index import resolve_team
+from services.coalesce import coalesce
 
 router = APIRouter(prefix="/team", tags=["teams"])
 
+# Season-wide endpoints covering every team at once
+teams_router = APIRouter(prefix="/teams", tags=["teams"])
+
 # Dependency
-def get_db():
+def get_db(request: Request):
     db = SessionLocal()
+    shards.route_request(db, request)
     try:
         yield db
     finally:
         db.close()
 
 @router.get("/{team}/performance")
+@coalesce
 def get_team_performance(
     team: str,
     season: int = Query(2024, description="Season year"),
+    only_clean: bool = Query(False, description="Only clean laps: no in/out laps, lap 1, deleted, SC/VSC, red flag or inaccurate laps"),
     db: Session = Depends(get_db)
 ):
     """
@@ -36,10 +48,15 @@ def get_team_performance(
     Args:
         team: Team name (e.g., "Red Bull", "Mercedes")
         season: Season year (default: 2024)
+        only_clean: Lap count and average lap time over clean laps only
     
     Returns:
         Team stats including total points, average position, races entered
     """
+    team = resolve_team(db, team, season)
+    if only_clean:
+        require_classified(db, season=season)
+
     # Get races in season
     race_ids = [race_id for (race_id,) in db.query(Race.id).filter(Race.year == season).all()]
     
@@ -51,16 +68,21 @@ def get_team_performance(
             "stats": None
         }
     
-    team_driver_ids = [
-        driver_id
-        for (driver_id,) in db.query(Lap.driver_id)
-        .filter(
-            Lap.team == team,
-            Lap.race_id.in_(race_ids)
-        )
-        .distinct()
-        .all()
-    ]
+    if lap_engine.ENABLED:
+        season_laps = lap_engine.get_season(db, season)
+        team_laps = season_laps.mask(team=team)
+        team_driver_ids = season_laps.distinct_driver_ids(team_laps)
+    else:
+        team_driver_ids = [
+            driver_id
+            for (driver_id,) in db.query(Lap.driver_id)
+            .filter(
+                Lap.team == team,
+                Lap.race_id.in_(race_ids)
+            )
+            .distinct()
+            .all()
+        ]
 
     if not team_driver_ids:
         return {
@@ -79,13 +101,19 @@ def get_team_performance(
         Result.race_id.in_(race_ids)
     ).one()
 
-    total_laps, avg_lap_time = db.query(
-        func.count(Lap.id),
-        func.avg(Lap.lap_time_seconds)
-    ).filter(
-        Lap.team == team,
-        Lap.race_id.in_(race_ids)
-    ).one()
+    if lap_engine.ENABLED:
+        if only_clean:
+            team_laps &= season_laps.mask(clean=True)
+        total_laps = season_laps.count(team_laps)
+        avg_lap_time = season_laps.mean_lap_time(team_laps)
+    else:
+        lap_filters = [Lap.team == team, Lap.race_id.in_(race_ids)]
+        if only_clean:
+            lap_filters.append(Lap.is_clean())
+        total_laps, avg_lap_time = db.query(
+            func.count(Lap.id),
+            func.avg(Lap.lap_time_seconds)
+        ).filter(*lap_filters).one()
     
     return {
         "team": team,
@@ -102,6 +130,7 @@ def get_team_performance(
 
 
 @router.get("/{team}/pit-stops")
+@coalesce
 def get_team_pit_stops(
     team: str,
     season: int = Query(2024, description="Season year"),
@@ -117,6 +146,8 @@ def get_team_pit_stops(
     Returns:
         Pit stop statistics including counts and timing
     """
+    team = resolve_team(db, team, season)
+
     # Get races in season
     race_ids = [race_id for (race_id,) in db.query(Race.id).filter(Race.year == season).all()]
     
@@ -167,6 +198,7 @@ def get_team_pit_stops(
 
 
 @router.get("/{team}/points-per-race")
+@coalesce
 def get_team_points_per_race(
     team: str,
     season: int = Query(2024, description="Season year"),
@@ -182,6 +214,8 @@ def get_team_points_per_race(
     Returns:
         List of races with total team points
     """
+    team = resolve_team(db, team, season)
+
     race_ids = [race_id for (race_id,) in db.query(Race.id).filter(Race.year == season).all()]
 
     if not race_ids:
@@ -229,4 +263,432 @@ def get_team_points_per_race(
             }
             for race_id, race_name, event_date, points in rows
         ]
-    }
\ No newline at end of file
+    }
+
+@teams_router.get("/")
+@coalesce
+def get_teams_leaderboard(
+    season: int = Query(2024, description="Season year"),
+    only_clean: bool = Query(False, description="Only clean laps: no in/out laps, lap 1, deleted, SC/VSC, red flag or inaccurate laps"),
+    db: Session = Depends(get_db)
+):
+    """
+    Get every team's season statistics and points per race
+
+    Drivers count for the team they drove for in each race, as in the
+    constructors standings. Points and average position include sprints;
+    the per-race series splits race and sprint points like
+    /team/{team}/points-per-race.
+
+    Args:
+        season: Season year (default: 2024)
+        only_clean: Lap count and average lap time over clean laps only
+
+    Returns:
+        Teams ordered by points, each with its per-race points
+    """
+    def compute():
+        if only_clean:
+            require_classified(db, season=season)
+        clean = Lap.is_clean() if only_clean else True
+        lap_time = case((clean, Lap.lap_time_seconds))
+
+        # Team, lap count and lap time totals per driver per race
+        lap_team = db.query(
+            Lap.race_id,
+            Lap.driver_id,
+            func.min(Lap.team_id).label("team_id"),
+            func.count(case((clean, Lap.id))).label("laps"),
+            func.sum(lap_time).label("lap_time_sum"),
+            func.count(lap_time).label("lap_time_count")
+        ).join(
+            Race, Lap.race_id == Race.id
+        ).filter(
+            Race.year == season
+        ).group_by(Lap.race_id, Lap.driver_id).cte("lap_team")
+
+        is_race = or_(Result.session_type == 'R', Result.session_type.is_(None))
+        entries = db.query(
+            Result.race_id,
+            Result.driver_id,
+            func.sum(case((is_race, func.coalesce(Result.points, 0)), else_=0)).label("race_points"),
+            func.sum(case((is_race, 0), else_=func.coalesce(Result.points, 0))).label("sprint_points"),
+            func.sum(Result.position).label("position_sum"),
+            func.count(Result.position).label("position_count")
+        ).join(
+            Race, Result.race_id == Race.id
+        ).filter(
+            Race.year == season
+        ).group_by(Result.race_id, Result.driver_id).cte("entries")
+
+        rows = db.query(
+            Team.name,
+            Race.id,
+            Race.race_name,
+            Race.event_date,
+            func.group_concat(Driver.driver_code),
+            func.count(entries.c.driver_id),
+            func.coalesce(func.sum(entries.c.race_points), 0),
+            func.coalesce(func.sum(entries.c.sprint_points), 0),
+            func.coalesce(func.sum(entries.c.position_sum), 0),
+            func.coalesce(func.sum(entries.c.position_count), 0),
+            func.sum(lap_team.c.laps),
+            func.coalesce(func.sum(lap_team.c.lap_time_sum), 0),
+            func.sum(lap_team.c.lap_time_count)
+        ).select_from(lap_team).join(
+            Team, Team.id == lap_team.c.team_id
+        ).join(
+            Race, Race.id == lap_team.c.race_id
+        ).join(
+            Driver, Driver.id == lap_team.c.driver_id
+        ).outerjoin(
+            entries,
+            and_(entries.c.race_id == lap_team.c.race_id, entries.c.driver_id == lap_team.c.driver_id)
+        ).group_by(
+            Team.name, Race.id
+        ).order_by(
+            Race.event_date, Race.id
+        ).all()
+
+        teams = {}
+        for (team, race_id, race_name, event_date, driver_codes, results, race_points, sprint_points,
+             position_sum, position_count, laps, lap_time_sum, lap_time_count) in rows:
+            totals = teams.setdefault(team, {
+                "team": team,
+                "drivers": set(),
+                "races_entered": 0,
+                "race_points": 0.0,
+                "sprint_points": 0.0,
+                "position_sum": 0,
+                "position_count": 0,
+                "total_laps": 0,
+                "lap_time_sum": 0.0,
+                "lap_time_count": 0,
+                "points_per_race": []
+            })
+            totals["drivers"].update(driver_codes.split(","))
+            totals["races_entered"] += 1 if results else 0
+            totals["race_points"] += race_points
+            totals["sprint_points"] += sprint_points
+            totals["position_sum"] += position_sum
+            totals["position_count"] += position_count
+            totals["total_laps"] += laps
+            totals["lap_time_sum"] += lap_time_sum
+            totals["lap_time_count"] += lap_time_count
+            totals["points_per_race"].append({
+                "race_id": race_id,
+                "race_name": race_name,
+                "date": event_date.isoformat() if event_date else None,
+                "points": float(race_points),
+                "sprint_points": float(sprint_points)
+            })
+
+        leaderboard = [
+            {
+                "team": totals["team"],
+                "total_points": round(totals["race_points"] + totals["sprint_points"], 1),
+                "sprint_points": round(totals["sprint_points"], 1),
+                "races_entered": totals["races_entered"],
+                "average_position": (
+                    round(totals["position_sum"] / totals["position_count"], 2)
+                    if totals["position_count"] else None
+                ),
+                "total_laps": totals["total_laps"],
+                "average_lap_time": (
+                    round(totals["lap_time_sum"] / totals["lap_time_count"], 3)
+                    if totals["lap_time_count"] else None
+                ),
+                "drivers": sorted(totals["drivers"]),
+                "drivers_count": len(totals["drivers"]),
+                "points_per_race": totals["points_per_race"]
+            }
+            for totals in teams.values()
+        ]
+        leaderboard.sort(key=lambda entry: (-entry["total_points"], entry["team"]))
+        for index, entry in enumerate(leaderboard):
+            previous = leaderboard[index - 1] if index else None
+            tied = previous is not None and previous["total_points"] == entry["total_points"]
+            entry["position"] = previous["position"] if tied else index + 1
+
+        return {
+            "season": season,
+            "count": len(leaderboard),
+            "teams": leaderboard
+        }
+
+    return cache.get_or_compute(db, ("teams_leaderboard", season, only_clean), compute, season=season)
+
+
+@teams_router.get("/strategy")
+@coalesce
+def get_teams_strategy(
+    season: int = Query(2024, description="Season year"),
+    db: Session = Depends(get_db)
+):
+    """
+    Get every team's tyre compound usage over a season
+
+    Built from the stints stored at load time. Per compound: stints run,
+    laps on it and their share of the team's laps, average and longest
+    stint. Average stops is stints per driver per race minus one.
+
+    Args:
+        season: Season year (default: 2024)
+    """
+    def compute():
+        stint_laps = Stint.end_lap - Stint.start_lap + 1
+        usage = db.query(
+            Team.name,
+            Compound.name,
+            func.count(Stint.id),
+            func.sum(stint_laps),
+            func.max(stint_laps)
+        ).select_from(Stint).join(
+            Race, Stint.race_id == Race.id
+        ).join(
+            Team, Stint.team_id == Team.id
+        ).outerjoin(
+            Compound, Stint.compound_id == Compound.id
+        ).filter(
+            Race.year == season
+        ).group_by(
+            Team.name, Compound.name
+        ).order_by(
+            Team.name, func.sum(stint_laps).desc(), Compound.name
+        ).all()
+
+        # Driver-race entries per team, for stops per race
+        entries = db.query(
+            Stint.team_id,
+            Stint.race_id,
+            Stint.driver_id
+        ).join(
+            Race, Stint.race_id == Race.id
+        ).filter(
+            Race.year == season
+        ).distinct().subquery()
+        entry_counts = dict(db.query(
+            Team.name,
+            func.count()
+        ).select_from(entries).join(
+            Team, Team.id == entries.c.team_id
+        ).group_by(Team.name).all())
+
+        teams = {}
+        for team, compound, stints, laps, longest in usage:
+            totals = teams.setdefault(team, {"team": team, "stints": 0, "laps": 0, "compounds": []})
+            totals["stints"] += stints
+            totals["laps"] += laps
+            totals["compounds"].append({
+                "compound": compound,
+                "stints": stints,
+                "laps": laps,
+                "average_stint_laps": round(laps / stints, 1),
+                "longest_stint_laps": longest
+            })
+
+        for totals in teams.values():
+            for compound in totals["compounds"]:
+                compound["lap_share"] = round(compound["laps"] / totals["laps"], 3) if totals["laps"] else None
+
+        return {
+            "season": season,
+            "count": len(teams),
+            "teams": [
+                {
+                    "team": totals["team"],
+                    "driver_races": entry_counts[totals["team"]],
+                    "average_stops": round(
+                        (totals["stints"] - entry_counts[totals["team"]]) / entry_counts[totals["team"]], 2
+                    ),
+                    "total_stints": totals["stints"],
+                    "total_laps": totals["laps"],
+                    "compounds": totals["compounds"]
+                }
+                for totals in teams.values()
+            ]
+        }
+
+    return cache.get_or_compute(db, ("teams_strategy", season), compute, season=season)
+
+
+def _middle_rows(row_number, count):
+    """Condition selecting the median row(s) of an ordered window"""
+    return row_number.between((count + 1) // 2, (count + 2) // 2)
+
+
+@teams_router.get("/head-to-head")
+@coalesce
+def get_teammate_head_to_head(
+    season: int = Query(2024, description="Season year"),
+    only_clean: bool = Query(False, description="Only clean laps: no in/out laps, lap 1, deleted, SC/VSC, red flag or inaccurate laps"),
+    db: Session = Depends(get_db)
+):
+    """
+    Get head-to-head stats for every teammate pairing in a season
+
+    Grid position stands in for qualifying, since only race and sprint
+    classifications are stored. Points include sprint points. The pace
+    delta is the median over shared races of driver1's median lap time
+    minus driver2's (negative means driver1 was quicker).
+
+    Args:
+        season: Season year (default: 2024)
+        only_clean: Base the pace delta on clean laps only
+    """
+    def compute():
+        if only_clean:
+            require_classified(db, season=season)
+
+        # Team per driver per race, as used by the race results endpoint
+        lap_team = db.query(
+            Lap.race_id,
+            Lap.driver_id,
+            func.min(Lap.team_id).label("team_id")
+        ).join(
+            Race, Lap.race_id == Race.id
+        ).filter(
+            Race.year == season
+        ).group_by(Lap.race_id, Lap.driver_id).cte("lap_team")
+
+        # Median lap time per driver per race
+        lap_filters = [Race.year == season, Lap.lap_time_ms.isnot(None)]
+        if only_clean:
+            lap_filters.append(Lap.is_clean())
+        ranked_laps = db.query(
+            Lap.race_id,
+            Lap.driver_id,
+            Lap.lap_time_seconds.label("lap_time"),
+            func.row_number().over(
+                partition_by=(Lap.race_id, Lap.driver_id),
+                order_by=Lap.lap_time_ms
+            ).label("rn"),
+            func.count().over(
+                partition_by=(Lap.race_id, Lap.driver_id)
+            ).label("cnt")
+        ).join(
+            Race, Lap.race_id == Race.id
+        ).filter(*lap_filters).cte("ranked_laps")
+
+        pace = db.query(
+            ranked_laps.c.race_id,
+            ranked_laps.c.driver_id,
+            func.avg(ranked_laps.c.lap_time).label("median_pace")
+        ).filter(
+            _middle_rows(ranked_laps.c.rn, ranked_laps.c.cnt)
+        ).group_by(ranked_laps.c.race_id, ranked_laps.c.driver_id).cte("pace")
+
+        # Race classification plus race and sprint points per driver per race.
+        # Non-numeric classified positions (D, E, W...) count as not classified.
+        is_race = or_(Result.session_type == 'R', Result.session_type.is_(None))
+        entries = db.query(
+            Result.race_id,
+            Result.driver_id,
+            Team.name.label("team"),
+            func.max(case(
+                (and_(is_race, func.typeof(Result.grid_position) == 'integer',
+                      Result.grid_position > 0), Result.grid_position)
+            )).label("grid"),
+            func.max(case(
+                (and_(is_race, func.typeof(Result.position) == 'integer'), Result.position)
+            )).label("position"),
+            func.coalesce(func.sum(Result.points), 0).label("points"),
+            func.max(pace.c.median_pace).label("median_pace")
+        ).join(
+            lap_team,
+            and_(lap_team.c.race_id == Result.race_id, lap_team.c.driver_id == Result.driver_id)
+        ).join(
+            Team, Team.id == lap_team.c.team_id
+        ).outerjoin(
+            pace,
+            and_(pace.c.race_id == Result.race_id, pace.c.driver_id == Result.driver_id)
+        ).group_by(Result.race_id, Result.driver_id, Team.name).cte("entries")
+
+        a = aliased(entries, name="a")
+        b = aliased(entries, name="b")
+        delta = a.c.median_pace - b.c.median_pace
+        pair_key = (a.c.team, a.c.driver_id, b.c.driver_id)
+
+        pairs = db.query(
+            a.c.team,
+            a.c.driver_id.label("driver1_id"),
+            b.c.driver_id.label("driver2_id"),
+            case((a.c.grid < b.c.grid, 1), else_=0).label("grid1"),
+            case((b.c.grid < a.c.grid, 1), else_=0).label("grid2"),
+            case((and_(a.c.position.isnot(None),
+                       or_(b.c.position.is_(None), a.c.position < b.c.position)), 1),
+                 else_=0).label("finish1"),
+            case((and_(b.c.position.isnot(None),
+                       or_(a.c.position.is_(None), b.c.position < a.c.position)), 1),
+                 else_=0).label("finish2"),
+            a.c.points.label("points1"),
+            b.c.points.label("points2"),
+            delta.label("delta"),
+            func.row_number().over(
+                partition_by=pair_key,
+                order_by=(delta.is_(None), delta)
+            ).label("rn"),
+            func.count(delta).over(partition_by=pair_key).label("cnt")
+        ).join(
+            b,
+            and_(b.c.race_id == a.c.race_id, b.c.team == a.c.team, a.c.driver_id < b.c.driver_id)
+        ).cte("pairs")
+
+        driver1 = aliased(Driver)
+        driver2 = aliased(Driver)
+        rows = db.query(
+            pairs.c.team,
+            driver1.driver_code,
+            driver1.driver_name,
+            driver2.driver_code,
+            driver2.driver_name,
+            func.count(),
+            func.sum(pairs.c.grid1),
+            func.sum(pairs.c.grid2),
+            func.sum(pairs.c.finish1),
+            func.sum(pairs.c.finish2),
+            func.sum(pairs.c.points1),
+            func.sum(pairs.c.points2),
+            func.avg(case(
+                (and_(pairs.c.delta.isnot(None), _middle_rows(pairs.c.rn, pairs.c.cnt)),
+                 pairs.c.delta)
+            ))
+        ).join(
+            driver1, driver1.id == pairs.c.driver1_id
+        ).join(
+            driver2, driver2.id == pairs.c.driver2_id
+        ).group_by(
+            pairs.c.team, pairs.c.driver1_id, pairs.c.driver2_id
+        ).order_by(
+            pairs.c.team, func.count().desc()
+        ).all()
+
+        return {
+            "season": season,
+            "count": len(rows),
+            "pairings": [
+                {
+                    "team": team,
+                    "races_together": races_together,
+                    "driver1": {
+                        "code": code1,
+                        "name": name1,
+                        "grid_ahead": grid1 or 0,
+                        "finished_ahead": finish1 or 0,
+                        "points": round(points1 or 0, 1)
+                    },
+                    "driver2": {
+                        "code": code2,
+                        "name": name2,
+                        "grid_ahead": grid2 or 0,
+                        "finished_ahead": finish2 or 0,
+                        "points": round(points2 or 0, 1)
+                    },
+                    "median_race_pace_delta": round(pace_delta, 3) if pace_delta is not None else None
+                }
+                for (team, code1, name1, code2, name2, races_together, grid1, grid2,
+                     finish1, finish2, points1, points2, pace_delta) in rows
+            ]
+        }
+
+    return cache.get_or_compute(db, ("teammate_head_to_head", season, only_clean), compute, season=season)
@@ -0,0 +1,269 @@
+"""
+compact_laps.py
+Report what the compact lap layout saves: file, table and index sizes
+and query latency, before and after migrate_database runs compact_laps
+
+Works on copies of the database. If the laps are already compact, the
+copy is first expanded back into the original layout (names on every
+lap, float lap times) so both layouts hold the same laps.
+
+    python backend/benchmarks/compact_laps.py data/benchmark.db
+"""
+
+import argparse
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+from sqlalchemy import create_engine
+
+# Add backend to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.database import Lap, migrate_database
+
+# The laps table as it was stored before compact_laps
+ORIGINAL_LAYOUT = [
+    """CREATE TABLE laps (
+        id INTEGER NOT NULL,
+        race_id INTEGER NOT NULL,
+        driver_id INTEGER NOT NULL,
+        lap_number INTEGER NOT NULL,
+        lap_time_seconds FLOAT,
+        compound VARCHAR,
+        tyre_life INTEGER,
+        stint INTEGER,
+        pit_in_time FLOAT,
+        team VARCHAR NOT NULL,
+        is_personal_best BOOLEAN,
+        lap_flags INTEGER,
+        sector1_time_seconds FLOAT,
+        sector2_time_seconds FLOAT,
+        sector3_time_seconds FLOAT,
+        speed_i1 FLOAT,
+        speed_i2 FLOAT,
+        speed_fl FLOAT,
+        speed_st FLOAT,
+        PRIMARY KEY (id),
+        FOREIGN KEY(race_id) REFERENCES races (id),
+        FOREIGN KEY(driver_id) REFERENCES drivers (id)
+    )""",
+    "CREATE INDEX ix_laps_id ON laps (id)",
+    "CREATE INDEX ix_laps_team ON laps (team)",
+    "CREATE INDEX ix_laps_race_id ON laps (race_id)",
+    "CREATE INDEX ix_laps_driver_id ON laps (driver_id)",
+    "CREATE INDEX ix_laps_clean ON laps (race_id, driver_id, lap_time_seconds) WHERE lap_flags = 0",
+    "CREATE INDEX ix_laps_sectors ON laps "
+    "(race_id, driver_id, sector1_time_seconds, sector2_time_seconds, sector3_time_seconds)",
+]
+
+_SHARED_COLUMNS = (
+    "id, race_id, driver_id, lap_number, pit_in_time, is_personal_best, lap_flags, "
+    "sector1_time_seconds, sector2_time_seconds, sector3_time_seconds, "
+    "speed_i1, speed_i2, speed_fl, speed_st"
+)
+
+_SEASON_RACES = "SELECT id FROM races WHERE year = :season"
+
+# name -> (original layout SQL, compact layout SQL); both must return the same rows
+QUERIES = {
+    "team season totals": (
+        "SELECT team, COUNT(*), ROUND(AVG(lap_time_seconds), 3) FROM laps "
+        f"WHERE race_id IN ({_SEASON_RACES}) GROUP BY team ORDER BY team",
+        "SELECT teams.name, COUNT(*), ROUND(AVG(lap_time_ms / 1000.0), 3) FROM laps "
+        "JOIN teams ON teams.id = laps.team_id "
+        f"WHERE race_id IN ({_SEASON_RACES}) GROUP BY laps.team_id ORDER BY teams.name",
+    ),
+    "team per driver per race": (
+        "SELECT race_id, driver_id, MIN(team) FROM laps "
+        f"WHERE race_id IN ({_SEASON_RACES}) GROUP BY race_id, driver_id ORDER BY race_id, driver_id",
+        "SELECT t.race_id, t.driver_id, teams.name FROM ("
+        "SELECT race_id, driver_id, MIN(team_id) AS team_id FROM laps "
+        f"WHERE race_id IN ({_SEASON_RACES}) GROUP BY race_id, driver_id"
+        ") t JOIN teams ON teams.id = t.team_id ORDER BY t.race_id, t.driver_id",
+    ),
+    "race laps with names": (
+        "SELECT lap_number, driver_id, lap_time_seconds, compound, tyre_life, stint, team "
+        "FROM laps WHERE race_id = :race_id ORDER BY lap_number, driver_id",
+        "SELECT lap_number, driver_id, lap_time_ms / 1000.0, compounds.name, tyre_life, stint, teams.name "
+        "FROM laps JOIN teams ON teams.id = laps.team_id "
+        "LEFT JOIN compounds ON compounds.id = laps.compound_id "
+        "WHERE race_id = :race_id ORDER BY lap_number, driver_id",
+    ),
+    "season fastest clean laps": (
+        "SELECT id, lap_time_seconds FROM laps "
+        f"WHERE race_id IN ({_SEASON_RACES}) AND lap_flags = 0 AND lap_time_seconds IS NOT NULL "
+        "ORDER BY lap_time_seconds, id LIMIT 20",
+        "SELECT id, lap_time_ms / 1000.0 FROM laps "
+        f"WHERE race_id IN ({_SEASON_RACES}) AND lap_flags = 0 AND lap_time_ms IS NOT NULL "
+        "ORDER BY lap_time_ms, id LIMIT 20",
+    ),
+    "clean pace per driver": (
+        "SELECT race_id, driver_id, COUNT(*), MIN(lap_time_seconds) FROM laps "
+        f"WHERE race_id IN ({_SEASON_RACES}) AND lap_flags = 0 "
+        "GROUP BY race_id, driver_id ORDER BY race_id, driver_id",
+        "SELECT race_id, driver_id, COUNT(*), MIN(lap_time_ms) / 1000.0 FROM laps "
+        f"WHERE race_id IN ({_SEASON_RACES}) AND lap_flags = 0 "
+        "GROUP BY race_id, driver_id ORDER BY race_id, driver_id",
+    ),
+}
+
+
+def _engine(path):
+    return create_engine(f"sqlite:///{path}").execution_options(isolation_level="AUTOCOMMIT")
+
+
+def _is_compact(conn):
+    return "team" not in {row[1] for row in conn.exec_driver_sql("PRAGMA table_info(laps)")}
+
+
+def expand_laps(conn):
+    """Rewrite compact laps into the original layout, in place"""
+    conn.exec_driver_sql("BEGIN")
+    conn.exec_driver_sql("ALTER TABLE laps RENAME TO laps_compact")
+    for index in conn.exec_driver_sql(
+        "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'laps_compact' AND sql IS NOT NULL"
+    ).scalars().all():
+        conn.exec_driver_sql(f"DROP INDEX {index}")
+    for statement in ORIGINAL_LAYOUT:
+        conn.exec_driver_sql(statement)
+    conn.exec_driver_sql(
+        f"INSERT INTO laps ({_SHARED_COLUMNS}, lap_time_seconds, compound, tyre_life, stint, team) "
+        f"SELECT {', '.join(f'l.{name.strip()}' for name in _SHARED_COLUMNS.split(','))}, "
+        "l.lap_time_ms / 1000.0, c.name, l.tyre_life, l.stint, t.name "
+        "FROM laps_compact l JOIN teams t ON t.id = l.team_id "
+        "LEFT JOIN compounds c ON c.id = l.compound_id"
+    )
+    conn.exec_driver_sql("DROP TABLE laps_compact")
+    conn.exec_driver_sql("DROP TABLE teams")
+    conn.exec_driver_sql("DROP TABLE compounds")
+    conn.exec_driver_sql("ANALYZE")
+    conn.exec_driver_sql("COMMIT")
+
+
+def measure_size(path):
+    """File size and the bytes used by the laps table, each laps index and the lookups"""
+    engine = _engine(path)
+    try:
+        with engine.connect() as conn:
+            conn.exec_driver_sql("VACUUM")
+            objects = conn.exec_driver_sql(
+                "SELECT name FROM sqlite_master "
+                "WHERE tbl_name IN ('laps', 'teams', 'compounds') AND type IN ('table', 'index')"
+            ).scalars().all()
+            try:
+                pages = dict(conn.exec_driver_sql(
+                    "SELECT name, SUM(pgsize) FROM dbstat GROUP BY name"
+                ).all())
+            except Exception:
+                # SQLite built without the dbstat table
+                pages = {}
+    finally:
+        engine.dispose()
+    return os.path.getsize(path), {name: pages.get(name) for name in sorted(objects)}
+
+
+def time_queries(path, compact, params, repeat):
+    """Median milliseconds and result rows per query"""
+    engine = _engine(path)
+    timings, results = {}, {}
+    try:
+        with engine.connect() as conn:
+            for name, statements in QUERIES.items():
+                sql = statements[1 if compact else 0]
+                # Warm the page cache and the statement cache
+                results[name] = [tuple(row) for row in conn.exec_driver_sql(sql, params).all()]
+                samples = []
+                for _ in range(repeat):
+                    start = time.perf_counter()
+                    conn.exec_driver_sql(sql, params).all()
+                    samples.append(time.perf_counter() - start)
+                timings[name] = statistics.median(samples) * 1000
+    finally:
+        engine.dispose()
+    return timings, results
+
+
+def _mb(n):
+    return f"{n / 2**20:8.2f} MB" if n is not None else "       n/a"
+
+
+def _change(before, after):
+    if not before or after is None:
+        return ""
+    return f"{(after - before) / before * 100:+7.1f}%"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare the original and compact lap layouts")
+    parser.add_argument("database", help="SQLite database with laps (left untouched)")
+    parser.add_argument("--repeat", type=int, default=20, help="Timed runs per query (default: 20)")
+    parser.add_argument("--keep", metavar="DIR", help="Keep the two copies in DIR")
+    args = parser.parse_args(argv)
+
+    workdir = args.keep or tempfile.mkdtemp(prefix="compact_laps_")
+    os.makedirs(workdir, exist_ok=True)
+    original = os.path.join(workdir, "original.db")
+    compact = os.path.join(workdir, "compact.db")
+    try:
+        shutil.copyfile(args.database, original)
+        engine = _engine(original)
+        try:
+            with engine.connect() as conn:
+                if _is_compact(conn):
+                    print("Laps are already compact; expanding a copy into the original layout")
+                    expand_laps(conn)
+                season = conn.exec_driver_sql("SELECT MAX(year) FROM races").scalar()
+                race_id = conn.exec_driver_sql(
+                    "SELECT MIN(race_id) FROM laps WHERE race_id IN "
+                    "(SELECT id FROM races WHERE year = ?)", (season,)
+                ).scalar()
+                laps = conn.exec_driver_sql("SELECT COUNT(*) FROM laps").scalar()
+        finally:
+            engine.dispose()
+
+        original_size, original_objects = measure_size(original)
+        shutil.copyfile(original, compact)
+        engine = create_engine(f"sqlite:///{compact}")
+        try:
+            start = time.perf_counter()
+            migrate_database(bind=engine, tables=[Lap.__table__])
+            compact_seconds = time.perf_counter() - start
+        finally:
+            engine.dispose()
+        compact_size, compact_objects = measure_size(compact)
+
+        params = {"season": season, "race_id": race_id}
+        original_times, original_rows = time_queries(original, False, params, args.repeat)
+        compact_times, compact_rows = time_queries(compact, True, params, args.repeat)
+    finally:
+        if not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"{laps} laps; migrated to the compact layout in {compact_seconds:.1f} s")
+    print(f"\n{'Size':32s} {'original':>11s} {'compact':>11s}")
+    print(f"  {'file':30s} {_mb(original_size)} {_mb(compact_size)} {_change(original_size, compact_size)}")
+    for name in sorted(set(original_objects) | set(compact_objects)):
+        before, after = original_objects.get(name), compact_objects.get(name)
+        print(f"  {name:30s} {_mb(before)} {_mb(after)} {_change(before, after)}")
+
+    print(f"\n{'Query (season ' + str(season) + ', median ms)':32s} {'original':>11s} {'compact':>11s}")
+    mismatches = []
+    for name in QUERIES:
+        before, after = original_times[name], compact_times[name]
+        print(f"  {name:30s} {before:11.2f} {after:11.2f} {_change(before, after)}")
+        if original_rows[name] != compact_rows[name]:
+            mismatches.append(name)
+
+    if mismatches:
+        print(f"\nResults differ between layouts: {', '.join(mismatches)}")
+        return 1
+    print("\nAll query results identical")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,85 @@
+"""
+compare_lap_engine.py
+Check that the in-memory lap engine returns exactly what the SQL path
+returns, and time both
+
+    F1_DATABASE_URL=sqlite:///data/benchmark.db python backend/benchmarks/compare_lap_engine.py
+"""
+
+import argparse
+import os
+import sys
+import time
+
+# Add backend and backend/api to path
+backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(backend_dir)
+sys.path.append(os.path.join(backend_dir, "api"))
+
+from fastapi.testclient import TestClient
+
+from main import app
+from models.database import SessionLocal, Race, Driver, Lap, Team
+from services import lap_engine
+
+
+def _requests(db, seasons):
+    paths = []
+    for season in seasons:
+        paths.append(f"/api/v1/laps/fastest?season={season}&limit=20")
+        paths.append(f"/api/v1/laps/fastest?season={season}&limit=20&only_clean=true")
+        teams = [team for (team,) in db.query(Team.name).join(Lap).join(Race).filter(Race.year == season).distinct()]
+        for team in teams:
+            paths.append(f"/api/v1/team/{team}/performance?season={season}")
+            paths.append(f"/api/v1/team/{team}/performance?season={season}&only_clean=true")
+        codes = [code for (code,) in db.query(Driver.driver_code).join(Lap).join(Race).filter(Race.year == season).distinct()]
+        for code in codes:
+            paths.append(f"/api/v1/drivers/{code}/stats?season={season}")
+    return paths
+
+
+def _run(client, paths, enabled):
+    lap_engine.ENABLED = enabled
+    responses = {}
+    start = time.perf_counter()
+    for path in paths:
+        responses[path] = client.get(path).json()
+    return responses, time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare lap engine and SQL results")
+    parser.add_argument("--seasons", type=int, nargs="+", help="Seasons to check (default: all)")
+    args = parser.parse_args(argv)
+
+    db = SessionLocal()
+    seasons = args.seasons or [year for (year,) in db.query(Race.year).distinct().order_by(Race.year)]
+    paths = _requests(db, seasons)
+    db.close()
+
+    client = TestClient(app)
+    # Warm both paths (engine load, SQLite page cache) before timing
+    _run(client, paths, True)
+    sql_responses, sql_seconds = _run(client, paths, False)
+    engine_responses, engine_seconds = _run(client, paths, True)
+
+    mismatches = [path for path in paths if sql_responses[path] != engine_responses[path]]
+    print(f"Checked {len(paths)} requests over seasons {seasons}")
+    print(f"  SQL path:    {sql_seconds * 1000:.1f} ms")
+    print(f"  Lap engine:  {engine_seconds * 1000:.1f} ms")
+    for season, stats in lap_engine.memory_report().items():
+        print(f"  Season {season}: {stats['rows']} laps, {stats['bytes'] / 1024:.1f} KiB")
+
+    if mismatches:
+        print(f"\n{len(mismatches)} MISMATCHES:")
+        for path in mismatches[:20]:
+            print(f"  {path}")
+            print(f"    sql:    {sql_responses[path]}")
+            print(f"    engine: {engine_responses[path]}")
+        return 1
+    print("All responses identical")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
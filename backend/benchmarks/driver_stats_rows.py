@@ -0,0 +1,135 @@
+"""
+driver_stats_rows.py
+Compare the grouped SQL driver statistics with the previous per-driver
+Python aggregation: identical output, rows transferred and time
+
+    F1_DATABASE_URL=sqlite:///data/benchmark.db python backend/benchmarks/driver_stats_rows.py --season 2024
+"""
+
+import argparse
+import os
+import sys
+import time
+
+# Add backend to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.database import SessionLocal, engine, Race, Driver, Lap, Result
+from services import instrumentation, lap_engine
+from services.driver_stats import season_driver_stats
+
+
+def _to_int_or_none(value):
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            return None
+    if isinstance(value, str):
+        stripped = value.strip()
+        return int(stripped) if stripped.isdigit() else None
+    return None
+
+
+def legacy_driver_stats(db, driver_id, season):
+    """The statistics as the driver endpoints computed them before"""
+    race_ids = [race.id for race in db.query(Race).filter(Race.year == season).all()]
+
+    results = db.query(Result).filter(
+        Result.driver_id == driver_id,
+        Result.race_id.in_(race_ids)
+    ).all()
+    laps = db.query(Lap).filter(
+        Lap.driver_id == driver_id,
+        Lap.race_id.in_(race_ids),
+        Lap.lap_time_seconds.isnot(None)
+    ).all()
+
+    total_points = sum(r.points for r in results if r.points)
+    race_results = [r for r in results if (r.session_type or 'R') == 'R']
+    finishes = []
+    for r in race_results:
+        pos = _to_int_or_none(r.position)
+        if pos is not None:
+            finishes.append(pos)
+    avg_finish = sum(finishes) / len(finishes) if finishes else None
+
+    return {
+        "races_entered": len(race_results),
+        "total_points": round(total_points, 1) if total_points else 0,
+        "average_finish_position": round(avg_finish, 2) if avg_finish else None,
+        "wins": sum(1 for pos in finishes if pos == 1),
+        "podiums": sum(1 for pos in finishes if pos <= 3),
+        "total_laps": len(laps)
+    }
+
+
+def _measure(compute):
+    with instrumentation.track_sql() as stats:
+        start = time.perf_counter()
+        output = compute()
+        elapsed = time.perf_counter() - start
+    return output, stats, elapsed
+
+
+def _report(label, stats, elapsed):
+    print(f"  {label:8s} {stats.queries:6d} queries {stats.rows:9d} rows {elapsed * 1000:9.1f} ms")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark driver season statistics")
+    parser.add_argument("--season", type=int, default=2024)
+    args = parser.parse_args(argv)
+
+    # Count fetched rows; this must happen before the first connection
+    instrumentation.instrument_engine(engine)
+    # Measure the SQL path only
+    lap_engine.ENABLED = False
+
+    db = SessionLocal()
+    driver_ids = [driver_id for (driver_id,) in db.query(Result.driver_id).join(
+        Race, Result.race_id == Race.id
+    ).filter(Race.year == args.season).distinct()]
+    if not driver_ids:
+        print(f"No results for season {args.season}")
+        return 2
+
+    # Warm the SQLite page cache
+    season_driver_stats(db, driver_ids, args.season)
+
+    legacy, legacy_stats, legacy_seconds = _measure(
+        lambda: {driver_id: legacy_driver_stats(db, driver_id, args.season) for driver_id in driver_ids}
+    )
+    # One call per driver, as the /stats endpoint does
+    grouped, grouped_stats, grouped_seconds = _measure(
+        lambda: {driver_id: season_driver_stats(db, [driver_id], args.season)[driver_id]
+                 for driver_id in driver_ids}
+    )
+    # All drivers in one call
+    batched, batched_stats, batched_seconds = _measure(
+        lambda: season_driver_stats(db, driver_ids, args.season)
+    )
+
+    print(f"Season {args.season}, {len(driver_ids)} drivers")
+    _report("legacy", legacy_stats, legacy_seconds)
+    _report("grouped", grouped_stats, grouped_seconds)
+    _report("batched", batched_stats, batched_seconds)
+
+    mismatches = [d for d in driver_ids if not (legacy[d] == grouped[d] == batched[d])]
+    if mismatches:
+        print(f"\n{len(mismatches)} MISMATCHES:")
+        for driver_id in mismatches[:20]:
+            code = db.get(Driver, driver_id).driver_code
+            print(f"  {code}: legacy {legacy[driver_id]}")
+            print(f"  {code}: grouped {grouped[driver_id]}")
+        db.close()
+        return 1
+    db.close()
+    print("All statistics identical")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,314 @@
+"""
+generate_db.py
+Build a synthetic multi-season database for benchmarking
+
+Uses the models.database schema, so the result can be served by the API
+directly:
+
+    python backend/benchmarks/generate_db.py --seasons 6 --output data/benchmark.db
+    F1_DATABASE_URL=sqlite:///data/benchmark.db uvicorn main:app
+"""
+
+import argparse
+import os
+import random
+import sys
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, insert, text
+from sqlalchemy.orm import sessionmaker
+
+# Add backend to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.database import (
+    Base, Race, Driver, Lap, Result, Team, Compound, assign_circuits, bump_dataset_version, refresh_stints,
+    seconds_to_ms, LAP_IN_LAP, LAP_OUT_LAP, LAP_FIRST_LAP, LAP_SAFETY_CAR
+)
+
+TEAMS = [
+    ("Red Bull Racing", 0.0), ("Ferrari", 0.25), ("McLaren", 0.3), ("Mercedes", 0.4),
+    ("Aston Martin", 0.9), ("Alpine", 1.2), ("Williams", 1.4), ("RB", 1.3),
+    ("Kick Sauber", 1.7), ("Haas F1 Team", 1.5),
+]
+
+DRIVER_CODES = [
+    "VER", "PER", "LEC", "SAI", "NOR", "PIA", "HAM", "RUS", "ALO", "STR",
+    "GAS", "OCO", "ALB", "SAR", "TSU", "RIC", "BOT", "ZHO", "MAG", "HUL",
+    "LAW", "COL", "BEA", "ANT", "BOR", "HAD", "DOO", "VET", "RAI", "GIO",
+]
+
+GRANDS_PRIX = [
+    ("Bahrain", "Sakhir"), ("Saudi Arabian", "Jeddah"), ("Australian", "Melbourne"),
+    ("Japanese", "Suzuka"), ("Chinese", "Shanghai"), ("Miami", "Miami"),
+    ("Emilia Romagna", "Imola"), ("Monaco", "Monaco"), ("Canadian", "Montréal"),
+    ("Spanish", "Barcelona"), ("Austrian", "Spielberg"), ("British", "Silverstone"),
+    ("Hungarian", "Budapest"), ("Belgian", "Spa-Francorchamps"), ("Dutch", "Zandvoort"),
+    ("Italian", "Monza"), ("Azerbaijan", "Baku"), ("Singapore", "Marina Bay"),
+    ("United States", "Austin"), ("Mexico City", "Mexico City"), ("São Paulo", "São Paulo"),
+    ("Las Vegas", "Las Vegas"), ("Qatar", "Lusail"), ("Abu Dhabi", "Yas Island"),
+]
+
+RACE_POINTS = [25, 18, 15, 12, 10, 8, 6, 4, 2, 1]
+SPRINT_POINTS = [8, 7, 6, 5, 4, 3, 2, 1]
+COMPOUND_DEGRADATION = {"SOFT": 0.08, "MEDIUM": 0.05, "HARD": 0.03}
+
+
+def _stints(rng, total_laps):
+    """Random 1-3 stop strategy as a list of (compound, length)"""
+    # Stops fall between lap 8 and 5 laps from the end; short sessions
+    # (sprints, small --laps) have room for fewer or none
+    window = range(8, max(total_laps - 5, 8))
+    stops = min(rng.choice([1, 1, 2, 2, 2, 3]), len(window))
+    cuts = sorted(rng.sample(window, stops))
+    bounds = [0] + cuts + [total_laps]
+    compounds = [rng.choice(["SOFT", "MEDIUM", "HARD"]) for _ in range(stops + 1)]
+    if stops and len(set(compounds)) == 1:
+        compounds[-1] = "HARD" if compounds[-1] != "HARD" else "MEDIUM"
+    return [(compounds[i], bounds[i + 1] - bounds[i]) for i in range(stops + 1)]
+
+
+def _sectors(rng, lap_time):
+    """Split a lap time into three sector times that add up to it"""
+    if lap_time is None:
+        return (None, None, None)
+    sector1 = round(lap_time * rng.uniform(0.29, 0.31), 3)
+    sector2 = round(lap_time * rng.uniform(0.39, 0.41), 3)
+    return (sector1, sector2, round(lap_time - sector1 - sector2, 3))
+
+
+def _simulate_race(rng, race_id, entries, driver_skill, total_laps, base_lap_time, compound_ids):
+    """
+    Simulate laps for every entry, given as (driver id, team id, team pace)
+
+    Returns:
+        (lap rows, {driver_id: (race_time or None, laps completed)})
+    """
+    lap_rows = []
+    outcome = {}
+    # A safety car period in about a third of the races
+    safety_car = set()
+    if rng.random() < 0.35 and total_laps >= 6:
+        start = rng.randint(2, total_laps - 4)
+        safety_car = set(range(start, start + rng.randint(2, 5)))
+
+    for driver_id, team_id, team_pace in entries:
+        retire_lap = rng.randint(1, total_laps) if rng.random() < 0.08 else None
+        pace = base_lap_time + team_pace + driver_skill[driver_id]
+        race_time = 0.0
+        best = None
+        lap_number = 0
+        driver_laps = []
+        for stint_number, (compound, length) in enumerate(_stints(rng, total_laps), start=1):
+            for tyre_life in range(1, length + 1):
+                lap_number += 1
+                if retire_lap is not None and lap_number > retire_lap:
+                    break
+                lap_time = (
+                    pace
+                    + COMPOUND_DEGRADATION[compound] * tyre_life
+                    - 0.03 * lap_number
+                    + rng.gauss(0, 0.35)
+                )
+                lap_flags = 0
+                pit_in_time = None
+                if tyre_life == length and lap_number != total_laps:
+                    pit_in_time = round(rng.uniform(19.5, 26.0), 3)
+                    lap_time += pit_in_time
+                    lap_flags |= LAP_IN_LAP
+                if tyre_life == 1 and stint_number > 1:
+                    lap_flags |= LAP_OUT_LAP
+                if lap_number == 1:
+                    lap_time += 6.0
+                    lap_flags |= LAP_FIRST_LAP
+                if lap_number in safety_car:
+                    lap_time *= 1.3
+                    lap_flags |= LAP_SAFETY_CAR
+                race_time += lap_time
+                recorded = None if (lap_number == 1 and rng.random() < 0.05) else round(lap_time, 3)
+                if recorded is not None and (best is None or recorded < best[1]):
+                    best = (len(driver_laps), recorded)
+                sectors = _sectors(rng, recorded)
+                # Slower cars are slower through the traps, more so under SC
+                top_speed = 325.0 - 8.0 * team_pace + rng.gauss(0, 3.0)
+                if lap_flags & LAP_SAFETY_CAR:
+                    top_speed *= 0.75
+                driver_laps.append({
+                    "race_id": race_id,
+                    "driver_id": driver_id,
+                    "lap_number": lap_number,
+                    "lap_time_ms": seconds_to_ms(recorded),
+                    "compound_id": compound_ids[compound],
+                    "tyre_life": tyre_life,
+                    "stint": stint_number,
+                    "pit_in_time": pit_in_time,
+                    "team_id": team_id,
+                    "is_personal_best": False,
+                    "lap_flags": lap_flags,
+                    "sector1_time_seconds": sectors[0],
+                    "sector2_time_seconds": sectors[1],
+                    "sector3_time_seconds": sectors[2],
+                    "speed_i1": round(top_speed * 0.9 + rng.gauss(0, 2.0), 1),
+                    "speed_i2": round(top_speed * 0.85 + rng.gauss(0, 2.0), 1),
+                    "speed_fl": round(top_speed * 0.92 + rng.gauss(0, 2.0), 1),
+                    "speed_st": round(top_speed, 1),
+                })
+        if best is not None:
+            driver_laps[best[0]]["is_personal_best"] = True
+        lap_rows.extend(driver_laps)
+        outcome[driver_id] = (race_time if retire_lap is None else None, len(driver_laps))
+    return lap_rows, outcome
+
+
+def _classify(race_id, outcome, grid, points_table, session_type):
+    """Result rows ordered by race time, retirements by laps completed"""
+    order = sorted(
+        outcome,
+        key=lambda d: (outcome[d][0] is None, outcome[d][0] or 0, -outcome[d][1])
+    )
+    rows = []
+    for index, driver_id in enumerate(order):
+        finished = outcome[driver_id][0] is not None
+        position = index + 1 if finished else None
+        points = points_table[index] if finished and index < len(points_table) else 0.0
+        rows.append({
+            "race_id": race_id,
+            "driver_id": driver_id,
+            "position": position,
+            "grid_position": grid[driver_id],
+            "points": float(points),
+            "status": "Finished" if finished else "Retired",
+            "session_type": session_type,
+        })
+    return rows
+
+
+def generate(output, seasons=6, first_season=2020, races_per_season=22, drivers_per_team=2,
+             laps_per_race=57, sprints_per_season=6, seed=42):
+    """
+    Generate a synthetic database
+
+    Args:
+        output: SQLite file to (re)create
+        seasons: Number of consecutive seasons
+        first_season: Year of the first season
+        races_per_season: Races per season (max len(GRANDS_PRIX))
+        drivers_per_team: Drivers per team
+        laps_per_race: Race distance in laps
+        sprints_per_season: Races per season that also get a sprint
+        seed: Random seed
+
+    Returns:
+        dict: Row counts per table
+    """
+    rng = random.Random(seed)
+    if os.path.exists(output):
+        os.remove(output)
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+
+    engine = create_engine(f"sqlite:///{output}")
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+
+    grid_size = len(TEAMS) * drivers_per_team
+    if grid_size > len(DRIVER_CODES):
+        raise ValueError(f"At most {len(DRIVER_CODES) // len(TEAMS)} drivers per team supported")
+    codes = DRIVER_CODES[:min(grid_size + 6, len(DRIVER_CODES))]
+    drivers = [
+        Driver(driver_code=code, driver_name=f"Driver {code.title()}", driver_number=i + 1)
+        for i, code in enumerate(codes)
+    ]
+    db.add_all(drivers)
+    db.flush()
+    driver_skill = {driver.id: rng.gauss(0, 0.2) for driver in drivers}
+    teams = {name: Team(name=name) for name, _ in TEAMS}
+    compounds = {name: Compound(name=name) for name in COMPOUND_DEGRADATION}
+    db.add_all(list(teams.values()) + list(compounds.values()))
+    db.flush()
+    compound_ids = {name: compound.id for name, compound in compounds.items()}
+
+    counts = {"races": 0, "results": 0, "laps": 0}
+    for year in range(first_season, first_season + seasons):
+        # Line-ups are redrawn every season
+        line_up = rng.sample(drivers, grid_size)
+        entries = [
+            (driver.id, teams[TEAMS[i // drivers_per_team][0]].id, TEAMS[i // drivers_per_team][1])
+            for i, driver in enumerate(line_up)
+        ]
+        sprint_rounds = set(rng.sample(range(races_per_season), min(sprints_per_season, races_per_season)))
+        season_start = datetime(year, 3, 2)
+
+        for round_index, (name, location) in enumerate(GRANDS_PRIX[:races_per_season]):
+            race = Race(
+                year=year,
+                race_name=f"{name} Grand Prix",
+                event_date=season_start + timedelta(days=14 * round_index),
+                location=location,
+                country=name
+            )
+            db.add(race)
+            db.flush()
+            assign_circuits(db, [race.id])
+
+            base_lap_time = rng.uniform(72.0, 105.0)
+            grid_order = sorted(entries, key=lambda e: e[2] + driver_skill[e[0]] + rng.gauss(0, 0.3))
+            grid = {driver_id: position + 1 for position, (driver_id, _, _) in enumerate(grid_order)}
+
+            lap_rows, outcome = _simulate_race(
+                rng, race.id, entries, driver_skill, laps_per_race, base_lap_time, compound_ids
+            )
+            result_rows = _classify(race.id, outcome, grid, RACE_POINTS, "R")
+            if round_index in sprint_rounds:
+                _, sprint_outcome = _simulate_race(
+                    rng, race.id, entries, driver_skill, laps_per_race // 3, base_lap_time, compound_ids
+                )
+                result_rows += _classify(race.id, sprint_outcome, grid, SPRINT_POINTS, "S")
+
+            db.execute(insert(Result), result_rows)
+            db.execute(insert(Lap), lap_rows)
+            refresh_stints(db, [race.id])
+            bump_dataset_version(db, race_id=race.id, season=year)
+
+            counts["races"] += 1
+            counts["results"] += len(result_rows)
+            counts["laps"] += len(lap_rows)
+
+        db.commit()
+        print(f"  Season {year}: {races_per_season} races generated")
+
+    # Planner statistics, so partial indexes such as ix_laps_clean are used
+    db.execute(text("ANALYZE"))
+    db.commit()
+    db.close()
+    engine.dispose()
+    return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a synthetic F1 database")
+    parser.add_argument("--output", default="data/benchmark.db", help="SQLite file to create")
+    parser.add_argument("--seasons", type=int, default=6)
+    parser.add_argument("--first-season", type=int, default=2020)
+    parser.add_argument("--races", type=int, default=22, help="Races per season")
+    parser.add_argument("--drivers-per-team", type=int, default=2)
+    parser.add_argument("--laps", type=int, default=57, help="Laps per race")
+    parser.add_argument("--sprints", type=int, default=6, help="Sprint weekends per season")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+
+    print(f"Generating {args.seasons} seasons into {args.output}")
+    counts = generate(
+        args.output,
+        seasons=args.seasons,
+        first_season=args.first_season,
+        races_per_season=min(args.races, len(GRANDS_PRIX)),
+        drivers_per_team=args.drivers_per_team,
+        laps_per_race=args.laps,
+        sprints_per_season=args.sprints,
+        seed=args.seed
+    )
+    print(f"Done: {counts['races']} races, {counts['results']} results, {counts['laps']} laps")
+
+
+if __name__ == "__main__":
+    main()
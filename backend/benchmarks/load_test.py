@@ -0,0 +1,261 @@
+"""
+load_test.py
+Concurrent latency benchmark for the /api/v1 routes
+
+Runs a weighted mix of requests against a running API at one or more
+concurrency levels and reports p50/p95/p99 latency and requests/sec per
+endpoint. Results can be saved as a baseline and later runs compared
+against it:
+
+    python backend/benchmarks/load_test.py --seasons 2023 2024 --save-baseline baseline.json
+    python backend/benchmarks/load_test.py --seasons 2023 2024 --compare baseline.json
+"""
+
+import argparse
+import json
+import math
+import random
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+API_PREFIX = "/api/v1"
+
+
+def _get(base_url, path, timeout=30):
+    """GET a path; returns (status, seconds, parsed body or None)"""
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(base_url + path, timeout=timeout) as response:
+            body = response.read()
+            status = response.status
+    except urllib.error.HTTPError as e:
+        e.read()
+        return e.code, time.perf_counter() - start, None
+    except (urllib.error.URLError, TimeoutError):
+        return 0, time.perf_counter() - start, None
+    elapsed = time.perf_counter() - start
+    try:
+        return status, elapsed, json.loads(body)
+    except ValueError:
+        return status, elapsed, None
+
+
+def discover(base_url, seasons):
+    """Collect race ids, driver codes, team names and circuit keys per season from the API"""
+    _, _, circuits = _get(base_url, f"{API_PREFIX}/circuits/")
+    circuits = (circuits or {}).get("circuits", [])
+    pools = {}
+    for season in seasons:
+        _, _, races = _get(base_url, f"{API_PREFIX}/races/?season={season}")
+        _, _, drivers = _get(base_url, f"{API_PREFIX}/drivers/?season={season}")
+        race_ids = [race["id"] for race in (races or {}).get("races", [])]
+        driver_entries = (drivers or {}).get("drivers", [])
+        if not race_ids or not driver_entries:
+            print(f"  Season {season}: no data, skipped")
+            continue
+        pools[season] = {
+            "race_ids": race_ids,
+            "drivers": [d["code"] for d in driver_entries],
+            "teams": sorted({d["team"] for d in driver_entries if d.get("team")}),
+            "circuits": [
+                c["key"] for c in circuits
+                if c["first_season"] is not None and c["first_season"] <= season <= c["last_season"]
+            ],
+        }
+    return pools
+
+
+def _quote(value):
+    return urllib.parse.quote(str(value), safe="")
+
+
+# Endpoint name -> (weight, path builder). Weights approximate dashboard traffic.
+ENDPOINTS = {
+    "drivers": (2, lambda r, s, p: "/drivers/"),
+    "drivers_by_season": (4, lambda r, s, p: f"/drivers/?season={s}"),
+    "driver": (2, lambda r, s, p: f"/drivers/{r.choice(p['drivers'])}"),
+    "driver_stats": (8, lambda r, s, p: f"/drivers/{r.choice(p['drivers'])}/stats?season={s}"),
+    "driver_races": (4, lambda r, s, p: f"/drivers/{r.choice(p['drivers'])}/races?season={s}"),
+    "driver_compare": (3, lambda r, s, p: "/drivers/compare?driver1={}&driver2={}&season={}".format(
+        *r.sample(p["drivers"], 2), s)),
+    "races": (6, lambda r, s, p: f"/races/?season={s}"),
+    "race": (6, lambda r, s, p: f"/races/{r.choice(p['race_ids'])}"),
+    "race_results": (8, lambda r, s, p: f"/races/{r.choice(p['race_ids'])}/results"),
+    "race_laps": (3, lambda r, s, p: f"/races/{r.choice(p['race_ids'])}/laps"),
+    "race_laps_driver": (3, lambda r, s, p: f"/races/{r.choice(p['race_ids'])}/laps?driver_code={r.choice(p['drivers'])}"),
+    "race_trace": (2, lambda r, s, p: f"/races/{r.choice(p['race_ids'])}/trace"),
+    "race_sectors": (2, lambda r, s, p: f"/races/{r.choice(p['race_ids'])}/sectors"),
+    "race_theoretical_best": (2, lambda r, s, p: f"/races/{r.choice(p['race_ids'])}/theoretical-best"),
+    "race_speed_traps": (1, lambda r, s, p: f"/races/{r.choice(p['race_ids'])}/speed-traps"),
+    "race_strategy": (2, lambda r, s, p: f"/races/{r.choice(p['race_ids'])}/strategy"),
+    "lap_engine": (1, lambda r, s, p: "/laps/engine"),
+    "fastest_laps": (4, lambda r, s, p: f"/laps/fastest?season={s}&limit={r.choice([8, 10, 20])}"),
+    "team_performance": (3, lambda r, s, p: f"/team/{_quote(r.choice(p['teams']))}/performance?season={s}"),
+    "team_pit_stops": (2, lambda r, s, p: f"/team/{_quote(r.choice(p['teams']))}/pit-stops?season={s}"),
+    "team_points_per_race": (3, lambda r, s, p: f"/team/{_quote(r.choice(p['teams']))}/points-per-race?season={s}"),
+    "teams_leaderboard": (2, lambda r, s, p: f"/teams/?season={s}"),
+    "teammate_head_to_head": (1, lambda r, s, p: f"/teams/head-to-head?season={s}"),
+    "teams_strategy": (1, lambda r, s, p: f"/teams/strategy?season={s}"),
+    "standings": (3, lambda r, s, p: f"/standings/?season={s}&type={r.choice(['drivers', 'constructors'])}"),
+    "standings_progression": (1, lambda r, s, p: f"/standings/progression?season={s}&type={r.choice(['drivers', 'constructors'])}"),
+    "circuits": (1, lambda r, s, p: "/circuits/"),
+    "circuit_history": (1, lambda r, s, p: f"/circuits/{r.choice(p['circuits'])}/history"),
+    "search": (2, lambda r, s, p: "/search/?q={}&season={}".format(
+        _quote(r.choice(p["drivers"] + p["teams"])[:4].lower()), s)),
+}
+
+
+def percentile(sorted_values, q):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    index = max(0, math.ceil(q / 100 * len(sorted_values)) - 1)
+    return sorted_values[index]
+
+
+def run_level(base_url, pools, concurrency, total_requests, endpoints, seed):
+    """Fire total_requests requests with the given concurrency"""
+    names = list(endpoints)
+    weights = [ENDPOINTS[name][0] for name in names]
+    seasons = list(pools)
+    samples = {name: [] for name in names}
+    errors = {name: 0 for name in names}
+    lock = threading.Lock()
+    counter = iter(range(total_requests))
+
+    def worker(worker_id):
+        rng = random.Random(seed * 1000 + worker_id)
+        while True:
+            with lock:
+                if next(counter, None) is None:
+                    return
+            name = rng.choices(names, weights)[0]
+            season = rng.choice(seasons)
+            path = API_PREFIX + ENDPOINTS[name][1](rng, season, pools[season])
+            status, elapsed, _ = _get(base_url, path)
+            with lock:
+                if status == 200:
+                    samples[name].append(elapsed)
+                else:
+                    errors[name] += 1
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(worker, range(concurrency)))
+    wall = time.perf_counter() - start
+
+    report = {}
+    for name in names:
+        latencies = sorted(samples[name])
+        if not latencies and not errors[name]:
+            continue
+        report[name] = {
+            "requests": len(latencies),
+            "errors": errors[name],
+            "p50_ms": _ms(percentile(latencies, 50)),
+            "p95_ms": _ms(percentile(latencies, 95)),
+            "p99_ms": _ms(percentile(latencies, 99)),
+            "rps": round(len(latencies) / wall, 2),
+        }
+    return {"wall_seconds": round(wall, 3), "endpoints": report}
+
+
+def _ms(seconds):
+    return round(seconds * 1000, 2) if seconds is not None else None
+
+
+def print_report(results):
+    for concurrency, level in results.items():
+        print(f"\nConcurrency {concurrency} ({level['wall_seconds']}s)")
+        print(f"  {'endpoint':26s} {'reqs':>6s} {'errs':>5s} {'p50 ms':>9s} {'p95 ms':>9s} {'p99 ms':>9s} {'req/s':>8s}")
+        for name, stats in sorted(level["endpoints"].items()):
+            print(
+                f"  {name:26s} {stats['requests']:6d} {stats['errors']:5d} "
+                f"{stats['p50_ms'] or 0:9.2f} {stats['p95_ms'] or 0:9.2f} "
+                f"{stats['p99_ms'] or 0:9.2f} {stats['rps']:8.2f}"
+            )
+
+
+def compare(results, baseline, tolerance, metric="p95_ms"):
+    """
+    List endpoints whose latency grew beyond tolerance versus a baseline
+
+    Returns:
+        list of (concurrency, endpoint, baseline value, current value)
+    """
+    regressions = []
+    for concurrency, level in results.items():
+        base_level = baseline.get("results", {}).get(str(concurrency))
+        if not base_level:
+            continue
+        for name, stats in level["endpoints"].items():
+            base_stats = base_level["endpoints"].get(name)
+            if not base_stats or not base_stats.get(metric) or stats.get(metric) is None:
+                continue
+            if stats[metric] > base_stats[metric] * (1 + tolerance):
+                regressions.append((concurrency, name, base_stats[metric], stats[metric]))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test the F1 Analytics API")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--seasons", type=int, nargs="+", default=[2024])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=500, help="Requests per concurrency level")
+    parser.add_argument("--endpoints", nargs="+", choices=sorted(ENDPOINTS), help="Subset of endpoints")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="Write the results as JSON")
+    parser.add_argument("--save-baseline", metavar="PATH", help="Store the results as a baseline")
+    parser.add_argument("--compare", metavar="PATH", help="Compare against a stored baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="Allowed p95 growth over the baseline (default: 0.25 = 25%%)")
+    args = parser.parse_args(argv)
+
+    base_url = args.base_url.rstrip("/")
+    print(f"Discovering data at {base_url} for seasons {args.seasons}")
+    pools = discover(base_url, args.seasons)
+    if not pools:
+        print("No data found; is the API running and the database loaded?")
+        return 2
+
+    endpoints = args.endpoints or list(ENDPOINTS)
+    results = {}
+    for concurrency in args.concurrency:
+        results[concurrency] = run_level(
+            base_url, pools, concurrency, args.requests, endpoints, args.seed
+        )
+    print_report(results)
+
+    document = {
+        "base_url": base_url,
+        "seasons": sorted(pools),
+        "requests_per_level": args.requests,
+        "results": {str(k): v for k, v in results.items()},
+    }
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, "w") as f:
+                json.dump(document, f, indent=2)
+            print(f"\nResults written to {path}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\nREGRESSIONS (p95 > baseline +{args.tolerance:.0%}):")
+            for concurrency, name, before, after in regressions:
+                print(f"  c={concurrency} {name}: {before:.2f} ms -> {after:.2f} ms")
+            return 1
+        print(f"\nNo p95 regressions against {args.compare}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,23 +1,34 @@
 """ Extract - Get data from FastF1 """
 import fastf1
 
-def extract_race(year, race_name):
+import fastf1_cache
+
+def extract_race(year, race_name, telemetry=True):
     """
     Extract race data from FastF1
     
     Args:
         year (int): Season year
         race_name (str): Race name (e.g., 'Monaco', 'Bahrain')
+        telemetry (bool): Load car and position data (only the telemetry store uses it)
     
     Returns:
         dict: Dictionary containing session and raw data
+
+    Raises:
+        fastf1_cache.CacheMiss: Offline, and a session is not fully cached
     """
     print(f"EXTRACT: Fetching {race_name} from FastF1") 
 
-    fastf1.Cache.enable_cache('notebook/cache')
+    fastf1_cache.enable()
 
     session = fastf1.get_session(year, race_name, 'R')
-    session.load()
+    if fastf1_cache.OFFLINE:
+        # Fail here rather than when FastF1 finds it cannot download
+        fastf1_cache.require(session, telemetry=telemetry)
+    with fastf1_cache.track(session):
+        # Race control messages are kept: lap deletions are read from them
+        session.load(telemetry=telemetry, weather=False)
 
     laps_raw = session.laps
     results_raw = session.results
@@ -25,9 +36,15 @@ def extract_race(year, race_name):
     sprint_results_raw = None
     try:
         sprint_session = fastf1.get_session(year, race_name, 'S')
-        sprint_session.load()
+        if fastf1_cache.OFFLINE:
+            fastf1_cache.require(sprint_session, laps=False)
+        with fastf1_cache.track(sprint_session):
+            # Only the classification is used
+            sprint_session.load(laps=False, telemetry=False, weather=False, messages=False)
         sprint_results_raw = sprint_session.results
         print("EXTRACT: Sprint session found and loaded")
+    except fastf1_cache.CacheMiss:
+        raise
     except Exception:
         print("EXTRACT: No sprint session for this event")
 
@@ -0,0 +1,618 @@
+"""
+fastf1_cache.py
+Size-capped FastF1 cache with LRU eviction and hit statistics
+
+FastF1 stores one pickle per API call under <year>/<event>/<session>/.
+This module enables that cache at an absolute location, records cache
+hits and misses per session, and evicts least recently used sessions
+once the cache grows past its size cap. Telemetry pickles (car and
+position data, the bulk of the cache) are evicted before any timing
+data is.
+
+In offline mode, loads are served from the cache only and are checked
+against it before they start: a session with a missing pickle raises
+CacheMiss instead of reaching the network. A fixture directory (a cache
+laid out the same way, e.g. a copy of a warmed cache) can stand in for
+the cache; nothing is evicted from it and no hit statistics are kept.
+prefetch warms the cache for whole seasons with a few downloads in
+parallel.
+
+Configuration:
+    F1_FASTF1_CACHE_DIR     cache location (default: <repo>/notebook/cache)
+    F1_FASTF1_CACHE_MAX_GB  size cap in GB (default: 20)
+    F1_FASTF1_OFFLINE       1 to read only from the cache
+    F1_FASTF1_FIXTURE_DIR   read only from this directory instead (implies offline)
+
+    python backend/data_collection/fastf1_cache.py stats --season 2024
+    python backend/data_collection/fastf1_cache.py prune --max-gb 5 --dry-run
+    python backend/data_collection/fastf1_cache.py prefetch --season 2024 --workers 4
+    python backend/data_collection/fastf1_cache.py check --season 2024 --telemetry
+"""
+
+import contextlib
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+CACHE_DIR = os.path.abspath(os.path.expanduser(
+    os.environ.get("F1_FASTF1_CACHE_DIR", os.path.join(REPO_ROOT, "notebook", "cache"))
+))
+MAX_BYTES = int(float(os.environ.get("F1_FASTF1_CACHE_MAX_GB", "20")) * 1024 ** 3)
+
+# Car and position data; evicted before timing data
+TELEMETRY_FILES = ("car_data.ff1pkl", "position_data.ff1pkl")
+HTTP_CACHE_FILE = "fastf1_http_cache.sqlite"
+STATS_FILE = "cache_stats.json"
+
+# Pickles a race load writes (laps and race control messages, no weather)
+RACE_FILES = (
+    "session_info.ff1pkl", "driver_info.ff1pkl", "session_status_data.ff1pkl", "lap_count.ff1pkl",
+    "track_status_data.ff1pkl", "_extended_timing_data.ff1pkl", "timing_app_data.ff1pkl",
+    "race_control_messages.ff1pkl",
+)
+# Pickles a classification-only load writes (the sprint)
+CLASSIFICATION_FILES = ("session_info.ff1pkl", "driver_info.ff1pkl")
+PREFETCH_WORKERS = 4
+
+FIXTURE_DIR = os.environ.get("F1_FASTF1_FIXTURE_DIR") or None
+OFFLINE = FIXTURE_DIR is not None or os.environ.get("F1_FASTF1_OFFLINE", "0") == "1"
+if FIXTURE_DIR:
+    CACHE_DIR = os.path.abspath(os.path.expanduser(FIXTURE_DIR))
+
+_lock = threading.Lock()
+_enabled = False
+
+
+class CacheMiss(Exception):
+    """Data needed offline is not in the cache"""
+
+    def __init__(self, missing):
+        self.missing = missing
+        super().__init__(f"Not in the FastF1 cache: {format_missing(missing)}")
+
+
+def format_missing(missing):
+    """'<session key> (<pickle>, ...); ...' for a {session key: pickles} dict"""
+    return "; ".join(f"{key} ({', '.join(names)})" for key, names in missing.items())
+
+
+def enable():
+    """Create the cache directory and point FastF1 at it (idempotent)"""
+    global _enabled
+    if _enabled:
+        return
+    import fastf1
+
+    if FIXTURE_DIR:
+        if not os.path.isdir(CACHE_DIR):
+            raise NotADirectoryError(f"FastF1 fixture directory {CACHE_DIR} does not exist")
+    else:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+    fastf1.Cache.enable_cache(CACHE_DIR)
+    if OFFLINE:
+        # Cached HTTP responses (schedule, classifications) are served even when expired
+        fastf1.Cache.offline_mode(True)
+    _enabled = True
+
+
+def set_offline(fixture_dir=None):
+    """
+    Read only from the cache, or from fixture_dir, from now on
+
+    Call before the first FastF1 load; the command line options of the
+    pipeline and this module use it.
+    """
+    global OFFLINE, FIXTURE_DIR, CACHE_DIR, _enabled
+    OFFLINE = True
+    if fixture_dir:
+        FIXTURE_DIR = fixture_dir
+        CACHE_DIR = os.path.abspath(os.path.expanduser(fixture_dir))
+    _enabled = False
+    enable()
+
+
+def session_dir(session):
+    """Cache directory of a FastF1 session (FastF1 drops the '/static/' prefix)"""
+    return os.path.join(CACHE_DIR, session.api_path[8:].strip("/"))
+
+
+def _session_key(path):
+    """'<year>/<event>/<session>' for a file or directory inside the cache"""
+    parts = os.path.relpath(path, CACHE_DIR).split(os.sep)
+    return "/".join(parts[:3]) if len(parts) >= 3 else None
+
+
+def _snapshot(directory):
+    try:
+        return {entry.name: entry.stat().st_mtime_ns for entry in os.scandir(directory) if entry.is_file()}
+    except FileNotFoundError:
+        return {}
+
+
+def _load_stats():
+    try:
+        with open(os.path.join(CACHE_DIR, STATS_FILE)) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def _save_stats(stats):
+    path = os.path.join(CACHE_DIR, STATS_FILE)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(stats, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def record_use(key, hits, misses):
+    """Add hit/miss counts for a session and mark it as just used"""
+    with _lock:
+        stats = _load_stats()
+        entry = stats.setdefault(key, {"hits": 0, "misses": 0})
+        entry["hits"] += hits
+        entry["misses"] += misses
+        entry["last_used"] = time.time()
+        _save_stats(stats)
+
+
+@contextlib.contextmanager
+def track(session, keep=()):
+    """
+    Count cache hits and misses of a session load, then enforce the size cap
+
+    A pickle that exists before the load and is not rewritten counts as a
+    hit; a new or rewritten pickle counts as a miss. Fixture directories
+    are left as they are.
+
+        with fastf1_cache.track(session):
+            session.load()
+    """
+    enable()
+    directory = session_dir(session)
+    before = _snapshot(directory)
+    try:
+        yield
+    finally:
+        if not FIXTURE_DIR:
+            after = _snapshot(directory)
+            if after:
+                hits = sum(1 for name, mtime in after.items() if before.get(name) == mtime)
+                misses = len(after) - hits
+                record_use(_session_key(directory), hits, misses)
+            enforce_limit(keep=[_session_key(directory), *keep])
+
+
+def required_files(laps=True, telemetry=False):
+    """Pickles a session load with these options needs"""
+    if not laps:
+        return CLASSIFICATION_FILES
+    return RACE_FILES + (TELEMETRY_FILES if telemetry else ())
+
+
+def missing_files(session, laps=True, telemetry=False):
+    """Pickles a session load with these options needs that are not cached"""
+    directory = session_dir(session)
+    return [
+        name for name in required_files(laps, telemetry)
+        if not os.path.isfile(os.path.join(directory, name))
+    ]
+
+
+def require(session, laps=True, telemetry=False):
+    """Raise CacheMiss unless the session can be loaded from the cache alone"""
+    missing = missing_files(session, laps, telemetry)
+    if missing:
+        raise CacheMiss({_session_key(session_dir(session)): missing})
+
+
+def race_sessions(year, event):
+    """
+    The sessions extract_race loads for an event
+
+    Returns:
+        list of (session, laps): The race with laps, then the sprint
+        (classification only) if the event has one
+    """
+    import fastf1
+
+    enable()
+    sessions = [(fastf1.get_session(year, event, 'R'), True)]
+    try:
+        sessions.append((fastf1.get_session(year, event, 'S'), False))
+    except ValueError:
+        # No sprint at this event
+        pass
+    return sessions
+
+
+def season_events(year):
+    """Grand prix names of a season, excluding testing"""
+    import fastf1
+
+    enable()
+    schedule = fastf1.get_event_schedule(year)
+    events = schedule[~schedule['EventName'].str.contains('Testing|Test', case=False, na=False)]
+    return events['EventName'].tolist()
+
+
+def resolve_events(year, names):
+    """
+    Schedule names (EventName) of a season's events, given as loosely as
+    fastf1.get_session accepts them ('monaco', 'Monaco GP' -> 'Monaco
+    Grand Prix'), so the same event is always queued under one name
+
+    Raises:
+        Exception: The season's schedule cannot be loaded
+    """
+    import fastf1
+
+    enable()
+    schedule = fastf1.get_event_schedule(year, include_testing=False)
+    return [schedule.get_event_by_name(name)["EventName"] for name in names]
+
+
+def check(year, events=None, telemetry=False):
+    """
+    Report which events of a season cannot be extracted from the cache
+
+    Args:
+        year (int): Season year
+        events (list): Event names, or None for the whole season
+        telemetry (bool): Also require car and position data
+
+    Returns:
+        dict: "<year> <event>" -> {session key: missing pickles}, for
+        incomplete events only. An event whose sessions cannot be resolved
+        (no cached schedule) maps to {"schedule": [error]}.
+    """
+    incomplete = {}
+    if events is None:
+        try:
+            events = season_events(year)
+        except Exception as e:
+            return {str(year): {"schedule": [str(e)]}}
+    for event in events:
+        try:
+            sessions = race_sessions(year, event)
+        except Exception as e:
+            incomplete[f"{year} {event}"] = {"schedule": [str(e)]}
+            continue
+        missing = {}
+        for session, laps in sessions:
+            names = missing_files(session, laps, telemetry and laps)
+            if names:
+                missing[_session_key(session_dir(session))] = names
+        if missing:
+            incomplete[f"{year} {event}"] = missing
+    return incomplete
+
+
+def prefetch(seasons, events=None, telemetry=False, workers=PREFETCH_WORKERS):
+    """
+    Download what extract_race needs for seasons or events into the cache
+
+    Sessions already complete in the cache are skipped, the others are
+    loaded by at most `workers` threads at a time. Nothing the events need
+    is evicted while they are prefetched, so keep the size cap above
+    their total.
+
+    Args:
+        seasons (list): Season years
+        events (list): Event names (with a single season), or None for every event
+        telemetry (bool): Also download car and position data
+        workers (int): Parallel downloads
+
+    Returns:
+        dict: "<year> <event>" -> None if complete, else the error
+    """
+    enable()
+    sessions, errors = {}, {}
+    for year in seasons:
+        for event in events if events is not None else season_events(year):
+            label = f"{year} {event}"
+            try:
+                sessions[label] = [
+                    (session, laps) for session, laps in race_sessions(year, event)
+                    if missing_files(session, laps, telemetry and laps)
+                ]
+            except Exception as e:
+                errors[label] = str(e)
+    keep = [_session_key(session_dir(s)) for pending in sessions.values() for s, _ in pending]
+
+    def fetch(label):
+        try:
+            for session, laps in sessions[label]:
+                with track(session, keep=keep):
+                    session.load(laps=laps, telemetry=telemetry and laps, weather=False, messages=laps)
+                missing = missing_files(session, laps, telemetry and laps)
+                if missing:
+                    return f"{session.name} still missing {', '.join(missing)}"
+        except (Exception, SystemExit) as e:
+            # FastF1 exits when a download it needs fails
+            return f"{type(e).__name__}: {e}"
+        return None
+
+    pending = [label for label, todo in sessions.items() if todo]
+    results = {label: None for label in sessions}
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        for label, error in zip(pending, pool.map(fetch, pending)):
+            results[label] = error
+            print(f"PREFETCH: {label}: {error or 'downloaded'}")
+    results.update(errors)
+    return results
+
+
+def scan():
+    """
+    List cached sessions
+
+    Returns:
+        dict: session key -> {"telemetry_bytes", "timing_bytes", "last_used",
+        "hits", "misses", "files"}
+    """
+    stats = _load_stats()
+    sessions = {}
+    for dirpath, _, filenames in os.walk(CACHE_DIR):
+        key = _session_key(dirpath)
+        if key is None:
+            continue
+        for name in filenames:
+            if not name.endswith(".ff1pkl"):
+                continue
+            path = os.path.join(dirpath, name)
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entry = sessions.setdefault(key, {
+                "telemetry_bytes": 0,
+                "timing_bytes": 0,
+                "last_used": 0.0,
+                "files": [],
+            })
+            entry["telemetry_bytes" if name in TELEMETRY_FILES else "timing_bytes"] += st.st_size
+            entry["last_used"] = max(entry["last_used"], st.st_mtime)
+            entry["files"].append(path)
+
+    for key, entry in sessions.items():
+        recorded = stats.get(key, {})
+        entry["last_used"] = max(entry["last_used"], recorded.get("last_used", 0.0))
+        entry["hits"] = recorded.get("hits", 0)
+        entry["misses"] = recorded.get("misses", 0)
+    return sessions
+
+
+def http_cache_bytes():
+    try:
+        return os.path.getsize(os.path.join(CACHE_DIR, HTTP_CACHE_FILE))
+    except FileNotFoundError:
+        return 0
+
+
+def total_bytes(sessions=None):
+    sessions = scan() if sessions is None else sessions
+    return http_cache_bytes() + sum(
+        entry["telemetry_bytes"] + entry["timing_bytes"] for entry in sessions.values()
+    )
+
+
+def plan_eviction(sessions, max_bytes, keep=()):
+    """
+    Choose files to delete to get under max_bytes
+
+    Telemetry pickles go first, least recently used session first; timing
+    pickles of whole sessions follow only if that is not enough. Sessions
+    in keep are never touched.
+
+    Returns:
+        list of (path, size)
+    """
+    excess = total_bytes(sessions) - max_bytes
+    if excess <= 0:
+        return []
+
+    candidates = sorted(
+        (entry["last_used"], key) for key, entry in sessions.items() if key not in keep
+    )
+    plan = []
+    for telemetry in (True, False):
+        for _, key in candidates:
+            for path in sessions[key]["files"]:
+                if (os.path.basename(path) in TELEMETRY_FILES) != telemetry:
+                    continue
+                size = os.path.getsize(path)
+                plan.append((path, size))
+                excess -= size
+            if excess <= 0:
+                return plan
+    return plan
+
+
+def prune(max_bytes=None, keep=(), dry_run=False, include_http=False):
+    """
+    Evict cached data until the cache fits in max_bytes
+
+    Args:
+        max_bytes (int): Size cap (default: MAX_BYTES)
+        keep (list): Session keys never to evict
+        dry_run (bool): Only report what would be deleted
+        include_http (bool): Also delete FastF1's HTTP request cache first
+
+    Returns:
+        list of (path, size): Files deleted (or that would be)
+    """
+    max_bytes = MAX_BYTES if max_bytes is None else max_bytes
+    deleted = []
+    if include_http and http_cache_bytes():
+        path = os.path.join(CACHE_DIR, HTTP_CACHE_FILE)
+        deleted.append((path, http_cache_bytes()))
+        if dry_run:
+            # Plan as if it were gone
+            max_bytes += deleted[0][1]
+        else:
+            os.remove(path)
+
+    sessions = scan()
+    plan = plan_eviction(sessions, max_bytes, keep)
+    if not dry_run:
+        for path, _ in plan:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(path)
+        with _lock:
+            stats = _load_stats()
+            for key, entry in sessions.items():
+                remaining = [p for p in entry["files"] if os.path.exists(p)]
+                if not remaining:
+                    stats.pop(key, None)
+            _save_stats(stats)
+    return deleted + plan
+
+
+def enforce_limit(keep=()):
+    """Evict down to MAX_BYTES if the cache has grown past it (never offline)"""
+    if OFFLINE:
+        # Evicted data could not be downloaded again
+        return []
+    evicted = prune(keep=keep)
+    if evicted:
+        freed = sum(size for _, size in evicted)
+        print(f"CACHE: Evicted {len(evicted)} files ({_format_bytes(freed)}) to stay under {_format_bytes(MAX_BYTES)}")
+    return evicted
+
+
+def summarize(sessions, by="season"):
+    """
+    Aggregate sessions per season or per event
+
+    Returns:
+        dict: season or "<season>/<event>" -> {"bytes", "telemetry_bytes",
+        "sessions", "hits", "misses", "hit_rate", "last_used"}
+    """
+    rows = {}
+    for key, entry in sessions.items():
+        parts = key.split("/")
+        group = parts[0] if by == "season" else "/".join(parts[:2])
+        row = rows.setdefault(group, {
+            "bytes": 0, "telemetry_bytes": 0, "sessions": 0,
+            "hits": 0, "misses": 0, "last_used": 0.0,
+        })
+        row["bytes"] += entry["telemetry_bytes"] + entry["timing_bytes"]
+        row["telemetry_bytes"] += entry["telemetry_bytes"]
+        row["sessions"] += 1
+        row["hits"] += entry["hits"]
+        row["misses"] += entry["misses"]
+        row["last_used"] = max(row["last_used"], entry["last_used"])
+    for row in rows.values():
+        lookups = row["hits"] + row["misses"]
+        row["hit_rate"] = round(row["hits"] / lookups, 3) if lookups else None
+    return rows
+
+
+def _format_bytes(size):
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return f"{size:.1f} {unit}" if unit != "B" else f"{size} B"
+        size /= 1024
+
+
+def _print_stats(season=None, by_event=False):
+    sessions = scan()
+    if season is not None:
+        sessions = {k: v for k, v in sessions.items() if k.split("/")[0] == str(season)}
+    rows = summarize(sessions, by="event" if by_event else "season")
+
+    print(f"FastF1 cache: {CACHE_DIR}")
+    print(f"  Total {_format_bytes(total_bytes())} of {_format_bytes(MAX_BYTES)} "
+          f"(HTTP cache {_format_bytes(http_cache_bytes())})")
+    print(f"\n  {'season/event' if by_event else 'season':48s} {'size':>10s} {'telemetry':>10s} "
+          f"{'sessions':>8s} {'hits':>6s} {'misses':>6s} {'hit rate':>8s}  last used")
+    for name, row in sorted(rows.items()):
+        hit_rate = f"{row['hit_rate']:.0%}" if row["hit_rate"] is not None else "-"
+        last_used = time.strftime("%Y-%m-%d %H:%M", time.localtime(row["last_used"]))
+        print(f"  {name:48s} {_format_bytes(row['bytes']):>10s} {_format_bytes(row['telemetry_bytes']):>10s} "
+              f"{row['sessions']:8d} {row['hits']:6d} {row['misses']:6d} {hit_rate:>8s}  {last_used}")
+
+
+def main(argv=None):
+    """Command line entry point"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Inspect and prune the FastF1 cache")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    stats_parser = commands.add_parser("stats", help="Show size and hit rate per season or event")
+    stats_parser.add_argument("--season", type=int, help="Only this season")
+    stats_parser.add_argument("--events", action="store_true", help="One row per event")
+
+    prune_parser = commands.add_parser("prune", help="Evict least recently used data")
+    prune_parser.add_argument("--max-gb", type=float,
+                              help=f"Size cap (default: F1_FASTF1_CACHE_MAX_GB, {MAX_BYTES / 1024 ** 3:g})")
+    prune_parser.add_argument("--include-http", action="store_true",
+                              help="Also delete FastF1's HTTP request cache")
+    prune_parser.add_argument("--dry-run", action="store_true", help="Only list what would be deleted")
+
+    for name, help_text in (("prefetch", "Download what the pipeline needs for seasons or events"),
+                            ("check", "List events the pipeline could not extract offline")):
+        events_parser = commands.add_parser(name, help=help_text)
+        events_parser.add_argument("--season", type=int, action="append", required=True,
+                                   help="Season (repeatable)")
+        events_parser.add_argument("--event", action="append",
+                                   help="Event name (repeatable; requires a single --season)")
+        events_parser.add_argument("--telemetry", action="store_true",
+                                   help="Include car and position data")
+        if name == "prefetch":
+            events_parser.add_argument("--workers", type=int, default=PREFETCH_WORKERS,
+                                       help=f"Parallel downloads (default: {PREFETCH_WORKERS})")
+    args = parser.parse_args(argv)
+
+    if args.command in ("prefetch", "check"):
+        if args.event and len(args.season) != 1:
+            parser.error("--event requires exactly one --season")
+        if args.command == "prefetch":
+            if OFFLINE:
+                parser.error("prefetch needs the network; unset F1_FASTF1_OFFLINE and F1_FASTF1_FIXTURE_DIR")
+            results = prefetch(args.season, args.event, telemetry=args.telemetry, workers=args.workers)
+            failed = {label: error for label, error in results.items() if error}
+            print(f"Prefetched {len(results) - len(failed)}/{len(results)} events into {CACHE_DIR}")
+            for label, error in failed.items():
+                print(f"  FAILED {label}: {error}")
+            return 1 if failed else 0
+
+        # Resolve schedules from the cache too, as an offline run would
+        set_offline(FIXTURE_DIR)
+        incomplete = {}
+        for year in args.season:
+            incomplete.update(check(year, args.event, telemetry=args.telemetry))
+        for label, missing in incomplete.items():
+            print(f"  MISSING {label}: {format_missing(missing)}")
+        print(f"{len(incomplete)} event(s) not fully cached in {CACHE_DIR}")
+        return 1 if incomplete else 0
+
+    if not os.path.isdir(CACHE_DIR):
+        print(f"No FastF1 cache at {CACHE_DIR}")
+        return 1
+
+    if args.command == "stats":
+        _print_stats(args.season, args.events)
+        return 0
+
+    max_bytes = int(args.max_gb * 1024 ** 3) if args.max_gb is not None else MAX_BYTES
+    before = total_bytes()
+    evicted = prune(max_bytes, dry_run=args.dry_run, include_http=args.include_http)
+    freed = sum(size for _, size in evicted)
+    verb = "Would delete" if args.dry_run else "Deleted"
+    for path, size in evicted:
+        print(f"  {os.path.relpath(path, CACHE_DIR)} ({_format_bytes(size)})")
+    print(f"{verb} {len(evicted)} files, {_format_bytes(freed)}: "
+          f"{_format_bytes(before)} -> {_format_bytes(before - freed)} (cap {_format_bytes(max_bytes)})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,481 @@
+"""
+live.py
+Live-timing ingestion: append laps and provisional results during a session
+
+Consumes F1 live-timing messages, either from FastF1's SignalR client as
+they arrive or from a file recorded with it, and writes completed laps
+and the running order to the database in small transactions. Each commit
+bumps only the race and season change counters, so the API recomputes
+just the payloads that depend on this race.
+
+Results are stored with status "Provisional"; running pipeline.py once
+the session is over replaces them with the classified results, fills in
+any laps missed while not connected and adds the lap flags that need
+the full session (deleted and inaccurate laps).
+"""
+
+import ast
+import json
+import os
+import sys
+import threading
+import time
+
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from load import add_race, add_driver, add_lap, add_result, PROVISIONAL_STATUS
+from models.database import (
+    SessionLocal, Driver, bump_dataset_version, refresh_stints,
+    LAP_IN_LAP, LAP_OUT_LAP, LAP_FIRST_LAP, LAP_SAFETY_CAR, LAP_VIRTUAL_SAFETY_CAR, LAP_RED_FLAG
+)
+from models import shards
+
+# Commit at least this often while messages keep arriving
+FLUSH_INTERVAL = 2.0
+# ... and whenever this many completed laps are waiting
+LAP_BATCH = 100
+
+
+def parse_message(line):
+    """
+    Decode one recorded line into (topic, payload, timestamp)
+
+    The client writes str() of [topic, payload, utc]; initial snapshots
+    carry the payload as a JSON string and no timestamp.
+    Returns None for lines that cannot be decoded.
+    """
+    line = line.strip()
+    if not line:
+        return None
+    try:
+        topic, payload, stamp = ast.literal_eval(line)
+    except (ValueError, SyntaxError, TypeError):
+        # Same repair FastF1 applies to F1's not quite JSON data
+        fixed = line.replace("'", '"').replace('True', 'true').replace('False', 'false')
+        try:
+            topic, payload, stamp = json.loads(fixed)
+        except (ValueError, TypeError):
+            return None
+
+    if isinstance(payload, str):
+        try:
+            payload = json.loads(payload)
+        except ValueError:
+            return None
+    timestamp = pd.Timestamp(stamp) if stamp else None
+    return topic, payload, timestamp
+
+
+def parse_lap_time(value):
+    """'1:32.456' or '58.123' -> seconds, '' or None -> None"""
+    if not value:
+        return None
+    try:
+        minutes, _, seconds = value.rpartition(':')
+        return round(int(minutes or 0) * 60 + float(seconds), 3)
+    except ValueError:
+        return None
+
+
+def _int_or_none(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _float_or_none(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _merge(target, update):
+    """Apply an incremental update; lists are keyed by index like later diffs"""
+    if isinstance(update, list):
+        update = {str(i): v for i, v in enumerate(update)}
+    for key, value in update.items():
+        if isinstance(value, (dict, list)):
+            existing = target.get(key)
+            if not isinstance(existing, dict):
+                existing = target[key] = {}
+            _merge(existing, value)
+        else:
+            target[key] = value
+
+
+class LiveTiming:
+    """Session state rebuilt from incremental live-timing messages"""
+
+    def __init__(self):
+        self.session_info = {}
+        self.drivers = {}    # racing number -> DriverList entry
+        self.timing = {}     # racing number -> TimingData line
+        self.app_data = {}   # racing number -> TimingAppData line (stints, grid)
+        self.track_status = "1"
+        self._laps_done = {}
+        self._lap_status = {}  # racing number -> track statuses seen during the current lap
+        self._out_lap = set()
+
+    def apply(self, topic, payload):
+        """
+        Merge one message into the state
+
+        Returns:
+            list: Laps completed by this message, as load.add_lap dicts
+            with an extra 'RacingNumber' key
+        """
+        if topic == "SessionInfo":
+            _merge(self.session_info, payload)
+        elif topic == "DriverList":
+            for number, entry in payload.items():
+                if isinstance(entry, dict):
+                    _merge(self.drivers.setdefault(number, {}), entry)
+        elif topic == "TimingAppData":
+            for number, line in payload.get("Lines", {}).items():
+                _merge(self.app_data.setdefault(number, {}), line)
+        elif topic == "TrackStatus":
+            self.track_status = str(payload.get("Status", self.track_status))
+            for seen in self._lap_status.values():
+                seen.add(self.track_status)
+        elif topic == "TimingData":
+            completed = []
+            for number, line in payload.get("Lines", {}).items():
+                state = self.timing.setdefault(number, {})
+                _merge(state, line)
+                self._lap_status.setdefault(number, {self.track_status})
+                if line.get("PitOut"):
+                    self._out_lap.add(number)
+                laps = _int_or_none(state.get("NumberOfLaps"))
+                if laps and laps > self._laps_done.get(number, 0):
+                    self._laps_done[number] = laps
+                    completed.append(self._lap(number, laps))
+                    self._lap_status[number] = {self.track_status}
+                    self._out_lap.discard(number)
+            return completed
+        return []
+
+    def _lap_flags(self, number, lap_number):
+        """Lap.lap_flags bits known from the stream"""
+        seen = self._lap_status[number]
+        flags = 0
+        if self.timing[number].get("InPit"):
+            flags |= LAP_IN_LAP
+        if number in self._out_lap and lap_number > 1:
+            flags |= LAP_OUT_LAP
+        if lap_number == 1:
+            flags |= LAP_FIRST_LAP
+        if "4" in seen:
+            flags |= LAP_SAFETY_CAR
+        if seen & {"6", "7"}:
+            flags |= LAP_VIRTUAL_SAFETY_CAR
+        if "5" in seen:
+            flags |= LAP_RED_FLAG
+        return flags
+
+    def _lap(self, number, lap_number):
+        timing = self.timing[number]
+        last_lap = timing.get("LastLapTime") or {}
+        sectors = timing.get("Sectors") or {}
+        speeds = timing.get("Speeds") or {}
+        stints = (self.app_data.get(number) or {}).get("Stints") or {}
+        stint_key = max(stints, key=int) if stints else None
+        stint = stints[stint_key] if stint_key is not None else {}
+        return {
+            'RacingNumber': number,
+            'LapNumber': lap_number,
+            'LapTimeSeconds': parse_lap_time(last_lap.get("Value")),
+            'Compound': stint.get("Compound") or None,
+            'TyreLife': _int_or_none(stint.get("TotalLaps")),
+            'Stint': int(stint_key) + 1 if stint_key is not None else None,
+            'Team': self.drivers.get(number, {}).get("TeamName"),
+            'IsPersonalBest': bool(last_lap.get("PersonalFastest")),
+            'LapFlags': self._lap_flags(number, lap_number),
+            'Sector1TimeSeconds': parse_lap_time((sectors.get("0") or {}).get("Value")),
+            'Sector2TimeSeconds': parse_lap_time((sectors.get("1") or {}).get("Value")),
+            'Sector3TimeSeconds': parse_lap_time((sectors.get("2") or {}).get("Value")),
+            'SpeedI1': _float_or_none((speeds.get("I1") or {}).get("Value")),
+            'SpeedI2': _float_or_none((speeds.get("I2") or {}).get("Value")),
+            'SpeedFL': _float_or_none((speeds.get("FL") or {}).get("Value")),
+            'SpeedST': _float_or_none((speeds.get("ST") or {}).get("Value")),
+        }
+
+    def running_order(self):
+        """Racing number -> (position, grid position); retired cars have no position"""
+        order = {}
+        for number, timing in self.timing.items():
+            retired = timing.get("Retired") or timing.get("Stopped")
+            position = None if retired else _int_or_none(timing.get("Position"))
+            grid = _int_or_none((self.app_data.get(number) or {}).get("GridPos"))
+            order[number] = (position, grid)
+        return order
+
+    def session_type(self):
+        """'R' or 'S' for races and sprints, None for other sessions or if unknown"""
+        if self.session_info.get("Type") != "Race":
+            return None
+        return 'S' if self.session_info.get("Name") == "Sprint" else 'R'
+
+    def race_info(self):
+        """Race record in the shape transform_race_data produces, or None if unknown"""
+        meeting = self.session_info.get("Meeting") or {}
+        start = self.session_info.get("StartDate")
+        if not meeting.get("Name") or not start:
+            return None
+        event_date = pd.Timestamp(start).normalize().to_pydatetime()
+        return {
+            'year': event_date.year,
+            'race_name': meeting["Name"],
+            'event_date': event_date,
+            'location': meeting.get("Location"),
+            'country': (meeting.get("Country") or {}).get("Name")
+        }
+
+
+class LiveIngestor:
+    """Feeds messages into a LiveTiming state and writes it out in small commits"""
+
+    def __init__(self, race_info=None):
+        self.state = LiveTiming()
+        self.race_info = race_info
+        self.race_id = None
+        self.season = None
+        self.pending_laps = []
+        self.laps_written = 0
+        self._driver_ids = {}
+        self._written_order = {}
+        self._warned = set()
+
+    def feed(self, topic, payload):
+        self.pending_laps.extend(self.state.apply(topic, payload))
+
+    def _warn_once(self, key, message):
+        if key not in self._warned:
+            self._warned.add(key)
+            print(f"LIVE: {message}")
+
+    def _driver_id(self, db, number):
+        """Database ID for a racing number; returns (id or None, created)"""
+        if number in self._driver_ids:
+            return self._driver_ids[number], False
+        entry = self.state.drivers.get(number) or {}
+        code = entry.get("Tla")
+        if not code:
+            return None, False
+        created = db.query(Driver.id).filter(Driver.driver_code == code).first() is None
+        driver = add_driver(db, code, _int_or_none(number), entry.get("BroadcastName"))
+        self._driver_ids[number] = driver.id
+        return driver.id, created
+
+    def flush(self):
+        """
+        Write pending laps and changed positions in one transaction
+
+        Returns:
+            bool: True if anything was committed
+        """
+        session_type = self.state.session_type()
+        race_info = self.race_info or self.state.race_info()
+        if session_type is None or race_info is None:
+            if self.state.session_info.get("Type") not in (None, "Race"):
+                self._warn_once("session", f"{self.state.session_info.get('Name')} is not a race session; nothing is stored")
+                self.pending_laps = []
+            return False
+        if session_type == 'S' and self.pending_laps:
+            # Laps are stored for the main race only
+            self.pending_laps = []
+
+        order = self.state.running_order()
+        changed = {n: v for n, v in order.items() if self._written_order.get(n) != v}
+        if not self.pending_laps and not changed:
+            return False
+
+        db = SessionLocal()
+        shards.route(db, season=race_info["year"], write=True)
+        try:
+            new_entities = False
+            if self.race_id is None:
+                race, is_new = add_race(db, race_info)
+                self.race_id, self.season = race.id, race.year
+                new_entities |= is_new
+
+            lap_count = 0
+            for lap in self.pending_laps:
+                driver_id, created = self._driver_id(db, lap['RacingNumber'])
+                new_entities |= created
+                if driver_id is None or not lap['Team']:
+                    self._warn_once(lap['RacingNumber'], f"No driver list entry for car {lap['RacingNumber']}; skipping its laps")
+                    continue
+                if add_lap(db, self.race_id, driver_id, lap) is not None:
+                    lap_count += 1
+
+            for number, (position, grid_position) in changed.items():
+                driver_id, created = self._driver_id(db, number)
+                new_entities |= created
+                if driver_id is None:
+                    continue
+                add_result(db, self.race_id, driver_id, position, grid_position,
+                           0.0, PROVISIONAL_STATUS, session_type)
+
+            if lap_count:
+                refresh_stints(db, [self.race_id])
+
+            # New races or drivers change dataset-wide payloads (search, lists)
+            bump_dataset_version(db, race_id=self.race_id, season=self.season, dataset=new_entities)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            print(f"✗ ERROR: {e}")
+            import traceback
+            traceback.print_exc()
+            return False
+        finally:
+            db.close()
+
+        self.pending_laps = []
+        self._written_order.update(changed)
+        self.laps_written += lap_count
+        print(f"LIVE: +{lap_count} laps, {len(changed)} positions updated (race {self.race_id}, {self.laps_written} laps total)")
+        return True
+
+
+def _read_lines(path, follow, is_done):
+    """Yield complete lines from a file, waiting for new ones while following"""
+    while not os.path.exists(path):
+        if not follow or is_done():
+            raise FileNotFoundError(path)
+        time.sleep(0.5)
+
+    with open(path) as f:
+        buffer = ""
+        while True:
+            chunk = f.readline()
+            if chunk:
+                buffer += chunk
+                if buffer.endswith("\n"):
+                    yield buffer
+                    buffer = ""
+                continue
+            if not follow or is_done():
+                if buffer:
+                    yield buffer
+                return
+            # Nothing new yet; let the caller flush
+            yield None
+            time.sleep(0.2)
+
+
+def ingest(path, race_info=None, follow=False, speed=0, flush_interval=FLUSH_INTERVAL, is_done=lambda: False):
+    """
+    Ingest a live-timing recording
+
+    Args:
+        path (str): File written by FastF1's SignalR client
+        race_info (dict): Race to store under; default: from SessionInfo
+        follow (bool): Keep reading as the file grows until is_done() is true
+        speed (float): Replay at this multiple of real time (0 = no delay)
+        flush_interval (float): Seconds between commits while data arrives
+        is_done (callable): Returns True once no more data will be written
+
+    Returns:
+        LiveIngestor: The ingestor, for its counters
+    """
+    ingestor = LiveIngestor(race_info)
+    last_flush = time.monotonic()
+    last_stamp = None
+
+    try:
+        for line in _read_lines(path, follow, is_done):
+            if line is not None:
+                message = parse_message(line)
+                if message is None:
+                    continue
+                topic, payload, stamp = message
+                if speed and stamp is not None:
+                    if last_stamp is not None and stamp > last_stamp:
+                        time.sleep((stamp - last_stamp).total_seconds() / speed)
+                    last_stamp = stamp
+                ingestor.feed(topic, payload)
+
+            if (line is None or len(ingestor.pending_laps) >= LAP_BATCH
+                    or time.monotonic() - last_flush >= flush_interval):
+                ingestor.flush()
+                last_flush = time.monotonic()
+    except KeyboardInterrupt:
+        print("LIVE: Interrupted")
+    finally:
+        ingestor.flush()
+
+    return ingestor
+
+
+def record(path, timeout=60, no_auth=False):
+    """
+    Start FastF1's live-timing client in a background thread, appending to path
+
+    Returns:
+        threading.Thread: Alive until the client stops receiving data
+    """
+    from fastf1.livetiming.client import SignalRClient
+
+    client = SignalRClient(path, filemode='a', timeout=timeout, no_auth=no_auth)
+    thread = threading.Thread(target=client.start, name="live-timing-client", daemon=True)
+    thread.start()
+    return thread
+
+
+def main(argv=None):
+    """Command line entry point"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Ingest F1 live timing into the database")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--record", metavar="PATH",
+                        help="Connect to the live-timing stream, save it to PATH and ingest it as it arrives")
+    source.add_argument("--replay", metavar="PATH",
+                        help="Ingest a recorded live-timing file")
+    parser.add_argument("--speed", type=float, default=0,
+                        help="Replay at this multiple of real time (default: as fast as possible)")
+    parser.add_argument("--flush-interval", type=float, default=FLUSH_INTERVAL,
+                        help=f"Seconds between commits (default: {FLUSH_INTERVAL})")
+    parser.add_argument("--season", type=int, help="Season of the race (default: from the stream)")
+    parser.add_argument("--race", help="Full event name, e.g. 'Monaco Grand Prix' (default: from the stream)")
+    parser.add_argument("--timeout", type=int, default=60,
+                        help="Stop recording after this many seconds without data")
+    parser.add_argument("--no-auth", action="store_true",
+                        help="Connect to the stream without an F1 TV login")
+    args = parser.parse_args(argv)
+
+    race_info = None
+    if args.race or args.season:
+        if not (args.race and args.season):
+            parser.error("--race and --season must be given together")
+        race_info = {'year': args.season, 'race_name': args.race,
+                     'event_date': None, 'location': None, 'country': None}
+
+    from models.database import migrate_database
+
+    # Dataset versions, and anything else introduced since the database was created
+    for change in migrate_database() + shards.migrate_shards():
+        print(f"Database migrated: {change}")
+
+    if args.replay:
+        print(f"LIVE: Replaying {args.replay}")
+        ingestor = ingest(args.replay, race_info, speed=args.speed, flush_interval=args.flush_interval)
+    else:
+        print(f"LIVE: Recording live timing to {args.record}")
+        client = record(args.record, timeout=args.timeout, no_auth=args.no_auth)
+        ingestor = ingest(args.record, race_info, follow=True, flush_interval=args.flush_interval,
+                          is_done=lambda: not client.is_alive())
+
+    print(f"LIVE: Done, {ingestor.laps_written} laps written")
+
+
+if __name__ == "__main__":
+    # Examples:
+    #   python backend/data_collection/live.py --record data/live/2024_monaco.txt
+    #   python backend/data_collection/live.py --replay data/live/2024_monaco.txt --speed 20
+    main()
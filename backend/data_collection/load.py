@@ -4,7 +4,27 @@ import pandas as pd
 
 sys.path.append('./backend/')
 
-from models.database import SessionLocal, Race, Driver, Lap, Result
+from models.database import (
+    SessionLocal, Race, Driver, Lap, Result, Stint, Team, Compound, assign_circuits, bump_dataset_version,
+    refresh_stints
+)
+from models import shards
+
+# Status of results written by live ingestion until the final load replaces them
+PROVISIONAL_STATUS = "Provisional"
+
+# Lap columns a later load fills in or corrects on an existing lap
+# (laps written live or before the column existed)
+REFRESHED_LAP_COLUMNS = {
+    'lap_flags': 'LapFlags',
+    'sector1_time_seconds': 'Sector1TimeSeconds',
+    'sector2_time_seconds': 'Sector2TimeSeconds',
+    'sector3_time_seconds': 'Sector3TimeSeconds',
+    'speed_i1': 'SpeedI1',
+    'speed_i2': 'SpeedI2',
+    'speed_fl': 'SpeedFL',
+    'speed_st': 'SpeedST',
+}
 
 def add_driver(db, driver_code, driver_number, driver_name=None):
     #check if driver exists 
@@ -43,6 +63,12 @@ def add_race(db, race_info):
 
     if existing_race:
         print(f"    Race already exists (ID: {existing_race.id}). Skipping...")
+        if existing_race.location is None and race_info['location']:
+            # Written live, before the schedule location was known
+            existing_race.location = race_info['location']
+            existing_race.country = race_info['country']
+            assign_circuits(db, [existing_race.id])
+            db.commit()
         return existing_race, False
     
     # LOAD race
@@ -54,6 +80,8 @@ def add_race(db, race_info):
         country= race_info['country']
     )
     db.add(race)
+    db.flush()
+    assign_circuits(db, [race.id])
     db.commit()
     db.refresh(race)
     
@@ -70,6 +98,14 @@ def add_result(db, race_id, driver_id, position, grid_position, points, status,
     ).first()
 
     if existing_results:
+        if existing_results.status == PROVISIONAL_STATUS:
+            # Overwrite the running order written during the session
+            existing_results.position = position
+            existing_results.grid_position = grid_position
+            existing_results.points = points
+            existing_results.status = status
+            return existing_results
+
         print(f"    Results already exists (ID: {existing_results.id}). Skipping...")
         return False
 
@@ -88,6 +124,21 @@ def add_result(db, race_id, driver_id, position, grid_position, points, status,
 
     return result
 
+def lookup_id(db, model, name):
+    """Id of a Team or Compound name, adding it if new (cached per session)"""
+    if name is None:
+        return None
+    cached = db.info.setdefault("lookup_ids", {})
+    key = (model.__tablename__, name)
+    if key not in cached:
+        row = db.query(model).filter(model.name == name).first()
+        if row is None:
+            row = model(name=name)
+            db.add(row)
+            db.flush()
+        cached[key] = row.id
+    return cached[key]
+
 def add_lap(db, race_id, driver_id, lap_data):
     # check if lap already exists
     existing_lap = db.query(Lap).filter(
@@ -97,6 +148,9 @@ def add_lap(db, race_id, driver_id, lap_data):
     ).first()
 
     if existing_lap:
+        for column, key in REFRESHED_LAP_COLUMNS.items():
+            if lap_data[key] is not None and getattr(existing_lap, column) != lap_data[key]:
+                setattr(existing_lap, column, lap_data[key])
         return None  # Skip if lap already exists
 
     # LOAD laps
@@ -105,16 +159,90 @@ def add_lap(db, race_id, driver_id, lap_data):
         driver_id=driver_id,
         lap_number=lap_data['LapNumber'],             
         lap_time_seconds=lap_data['LapTimeSeconds'],    
-        compound=lap_data['Compound'],
+        compound_id=lookup_id(db, Compound, lap_data['Compound']),
         tyre_life=lap_data['TyreLife'],              
         stint=lap_data['Stint'],                       
-        team=lap_data['Team'],
-        is_personal_best=lap_data['IsPersonalBest']
+        team_id=lookup_id(db, Team, lap_data['Team']),
+        is_personal_best=lap_data['IsPersonalBest'],
+        lap_flags=lap_data['LapFlags'],
+        sector1_time_seconds=lap_data['Sector1TimeSeconds'],
+        sector2_time_seconds=lap_data['Sector2TimeSeconds'],
+        sector3_time_seconds=lap_data['Sector3TimeSeconds'],
+        speed_i1=lap_data['SpeedI1'],
+        speed_i2=lap_data['SpeedI2'],
+        speed_fl=lap_data['SpeedFL'],
+        speed_st=lap_data['SpeedST']
     )
     db.add(lap)
     
     return lap
 
+def get_race_id(race_info):
+    """Return the database ID of a loaded race, or None"""
+    db = SessionLocal()
+    shards.route(db, season=race_info["year"])
+    try:
+        race = db.query(Race).filter(
+            Race.year == race_info["year"],
+            Race.race_name == race_info["race_name"]
+        ).first()
+        return race.id if race else None
+    finally:
+        db.close()
+
+def races_missing_stints(db, race_ids):
+    """Races whose laps have stint numbers but that have no stored stints"""
+    with_stints = {
+        race_id for (race_id,) in db.query(Stint.race_id).filter(Stint.race_id.in_(race_ids)).distinct()
+    }
+    return [
+        race_id for race_id in race_ids
+        if race_id not in with_stints
+        and db.query(Lap.id).filter(Lap.race_id == race_id, Lap.stint.isnot(None)).first() is not None
+    ]
+
+def refresh_season_stints(seasons=None, missing_only=False):
+    """
+    Rebuild the stints of every loaded race from its laps
+
+    For databases loaded before stints were stored. Runs one transaction
+    per season, routed to that season's shard.
+
+    Args:
+        seasons (list): Seasons to rebuild, or None for every loaded season
+        missing_only (bool): Only races with laps but no stints (see races_missing_stints)
+
+    Returns:
+        dict: season -> races rebuilt, for seasons with any
+    """
+    db = SessionLocal()
+    try:
+        loaded = [year for (year,) in db.query(Race.year).distinct().order_by(Race.year).all()]
+    finally:
+        db.close()
+
+    rebuilt = {}
+    for season in loaded:
+        if seasons is not None and season not in seasons:
+            continue
+        db = SessionLocal()
+        shards.route(db, season=season, write=True)
+        try:
+            race_ids = [race_id for (race_id,) in db.query(Race.id).filter(Race.year == season).all()]
+            if missing_only:
+                race_ids = races_missing_stints(db, race_ids)
+            if not race_ids:
+                continue
+            refresh_stints(db, race_ids)
+            bump_dataset_version(db, season=season, dataset=False)
+            for race_id in race_ids:
+                bump_dataset_version(db, race_id=race_id, dataset=False)
+            db.commit()
+            rebuilt[season] = len(race_ids)
+        finally:
+            db.close()
+    return rebuilt
+
 def load_race_data(transformed_data):
     """
     Load transformed data into database
@@ -132,6 +260,8 @@ def load_race_data(transformed_data):
     print(f"LOAD: Inserting {race_info['race_name']} into database")
 
     db = SessionLocal()
+    # With season shards, laps are written to this season's file only
+    shards.route(db, season=race_info["year"], write=True)
 
     try:
         # 1. LOAD race
@@ -213,7 +343,9 @@ def load_race_data(transformed_data):
                 db.commit()
                 print(f"    - {lap_count} laps loaded...")
         
-        # Final commit for remaining laps
+        # Final commit for remaining laps and the race's stints, invalidating cached API payloads
+        refresh_stints(db, [race.id])
+        bump_dataset_version(db, race_id=race.id, season=race.year)
         db.commit()
         print(f"    Loaded {lap_count} laps")
         print(f"SUCCESS: {race_info['race_name']} loaded")
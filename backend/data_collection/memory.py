@@ -0,0 +1,189 @@
+""" Memory - Per-stage accounting and a memory budget for the pipeline """
+import ctypes
+import gc
+import os
+import sys
+import time
+import tracemalloc
+
+import pandas as pd
+
+# Resident memory the pipeline should stay under; 0 means no budget
+BUDGET_BYTES = int(float(os.environ.get("F1_PIPELINE_MEMORY_MB", "0")) * 2**20)
+# How long to wait for memory to drop below the budget before a new race
+WAIT_SECONDS = float(os.environ.get("F1_PIPELINE_MEMORY_WAIT", "60"))
+# Stack depth recorded per allocation with --trace-memory
+TRACE_FRAMES = 10
+
+
+class MemoryBudgetExceeded(RuntimeError):
+    """Memory stayed above the budget; no further race is started"""
+
+
+def rss_bytes():
+    """Current resident set size (peak RSS where /proc is unavailable)"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _mb(n):
+    return f"{n / 2**20:.1f} MB"
+
+
+def set_budget(megabytes):
+    global BUDGET_BYTES
+    BUDGET_BYTES = int(megabytes * 2**20) if megabytes else 0
+
+
+def start_tracing():
+    """Record Python allocations so stages can report their largest holders"""
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(TRACE_FRAMES)
+
+
+def frame_bytes(frame):
+    """Memory held by a DataFrame or Series, including Python objects"""
+    usage = frame.memory_usage(deep=True)
+    return int(usage.sum() if isinstance(frame, pd.DataFrame) else usage)
+
+
+# (stage, RSS delta, RSS after) for the current run
+history = []
+
+
+class Stage:
+    """
+    Account for the memory a pipeline stage adds
+
+    Reports the RSS change and, for frames passed to hold(), their size.
+    With tracing on it also reports the Python allocation peak and the
+    source lines that grew the most.
+    """
+
+    def __init__(self, name, top=3):
+        self.name = name
+        self.top = top
+        self.frames = {}
+
+    def hold(self, **frames):
+        """Name the frames the stage produced, for the report"""
+        self.frames.update({k: v for k, v in frames.items() if isinstance(v, (pd.DataFrame, pd.Series))})
+
+    def __enter__(self):
+        self.rss_before = rss_bytes()
+        self.snapshot = None
+        if tracemalloc.is_tracing():
+            tracemalloc.reset_peak()
+            self.snapshot = tracemalloc.take_snapshot()
+        return self
+
+    def __exit__(self, *exc):
+        rss_after = rss_bytes()
+        delta = rss_after - self.rss_before
+        history.append((self.name, delta, rss_after))
+
+        line = f"MEMORY: {self.name} {'+' if delta >= 0 else '-'}{_mb(abs(delta))} RSS (now {_mb(rss_after)})"
+        if self.snapshot is not None:
+            line += f", Python peak {_mb(tracemalloc.get_traced_memory()[1])}"
+        print(line)
+
+        holders = sorted(((frame_bytes(f), name) for name, f in self.frames.items()), reverse=True)
+        for size, name in holders[:self.top]:
+            print(f"    {name}: {_mb(size)}")
+        if self.snapshot is not None:
+            stats = tracemalloc.take_snapshot().compare_to(self.snapshot, "lineno")
+            for stat in sorted(stats, key=lambda s: s.size_diff, reverse=True)[:self.top]:
+                if stat.size_diff >= 2**16:
+                    frame = stat.traceback[0]
+                    print(f"    +{_mb(stat.size_diff)} {frame.filename}:{frame.lineno}")
+        return False
+
+
+def _trim():
+    """Return freed heap pages to the OS (glibc only)"""
+    try:
+        ctypes.CDLL("libc.so.6").malloc_trim(0)
+    except (OSError, AttributeError):
+        pass
+
+
+def release(data, *keys):
+    """
+    Drop references held in a stage's output dict and collect
+
+    Args:
+        data (dict): e.g. the dict from extract_race()
+        keys: Keys to drop (default: all)
+    """
+    for key in keys or list(data):
+        data[key] = None
+    gc.collect()
+    _trim()
+
+
+def downcast(frame):
+    """
+    Shrink a frame in place before it is held through the load
+
+    Integer columns get the smallest integer type and string columns
+    without nulls become categoricals. Floats are left alone: lap times
+    must round-trip exactly. Values read back per row are unchanged.
+    """
+    for column in frame.columns:
+        values = frame[column]
+        if pd.api.types.is_integer_dtype(values) and not pd.api.types.is_bool_dtype(values):
+            frame[column] = pd.to_numeric(values, downcast="integer")
+        elif values.dtype == object and values.notna().all() \
+                and values.map(type).eq(str).all() and values.nunique() < len(values) / 2:
+            frame[column] = values.astype("category")
+    return frame
+
+
+def over_budget():
+    return bool(BUDGET_BYTES) and rss_bytes() > BUDGET_BYTES
+
+
+def wait_below_budget(timeout=None, poll=1.0):
+    """
+    Block until resident memory is below the budget
+
+    Raises:
+        MemoryBudgetExceeded: Still above the budget after the timeout
+    """
+    if not BUDGET_BYTES:
+        return
+    gc.collect()
+    _trim()
+    deadline = time.monotonic() + (WAIT_SECONDS if timeout is None else timeout)
+    waited = False
+    while rss_bytes() > BUDGET_BYTES:
+        if time.monotonic() >= deadline:
+            raise MemoryBudgetExceeded(
+                f"RSS {_mb(rss_bytes())} still above the {_mb(BUDGET_BYTES)} budget"
+            )
+        if not waited:
+            print(f"MEMORY: RSS {_mb(rss_bytes())} above the {_mb(BUDGET_BYTES)} budget, waiting")
+            waited = True
+        time.sleep(poll)
+        gc.collect()
+        _trim()
+
+
+def summary():
+    """Print the stages that added the most memory and the largest RSS seen"""
+    if not history:
+        return
+    print("\nMEMORY SUMMARY")
+    totals = {}
+    for name, delta, _ in history:
+        totals[name] = max(totals.get(name, 0), delta)
+    for name, delta in sorted(totals.items(), key=lambda item: item[1], reverse=True):
+        print(f"  {name:10s} largest increase {_mb(delta)}")
+    print(f"  Highest RSS after a stage: {_mb(max(rss for _, _, rss in history))}")
+    if BUDGET_BYTES:
+        print(f"  Budget: {_mb(BUDGET_BYTES)}")
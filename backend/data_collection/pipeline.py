@@ -3,18 +3,24 @@ pipeline.py
 Main ETL pipeline 
 """
 
+import os
+import sys
+
+import memory
 from extract import extract_race
 from transform import transform_race_data
-from load import load_race_data
+from load import load_race_data, get_race_id, refresh_season_stints
+from models.database import DatasetVersion, SessionLocal
 
 
-def run_etl_pipeline(year, race_name):
+def run_etl_pipeline(year, race_name, store_telemetry=False):
     """
     Run complete ETL pipeline for a race
     
     Args:
         year (int): Season year
         race_name (str): Race name
+        store_telemetry (bool): Also write per-lap car data to the telemetry store
     
     Returns:
         bool: Success status
@@ -22,16 +28,43 @@ def run_etl_pipeline(year, race_name):
     print("="*100)
     print(f"ETL PIPELINE: {year} {race_name}")
     print("="*100)
+
+    # Loads bump dataset versions; callers that did not migrate the
+    # database first may not have the table yet
+    db = SessionLocal()
+    try:
+        DatasetVersion.__table__.create(bind=db.get_bind(), checkfirst=True)
+    finally:
+        db.close()
     
     try:
         # Extract
-        extracted_data = extract_race(year, race_name)
-        
+        with memory.Stage("extract") as stage:
+            extracted_data = extract_race(year, race_name, telemetry=store_telemetry)
+            stage.hold(laps_raw=extracted_data['laps_raw'], results_raw=extracted_data['results_raw'])
+
         # Transform
-        transformed_data = transform_race_data(extracted_data)
-        
+        with memory.Stage("transform") as stage:
+            transformed_data = transform_race_data(extracted_data)
+            if not store_telemetry:
+                # Nothing reads the FastF1 session after this
+                memory.release(extracted_data)
+            if memory.BUDGET_BYTES:
+                memory.downcast(transformed_data['laps_clean'])
+            stage.hold(laps_clean=transformed_data['laps_clean'],
+                       results_clean=transformed_data['results_clean'])
+
         # Load
-        success = load_race_data(transformed_data)
+        with memory.Stage("load"):
+            success = load_race_data(transformed_data)
+
+        # Telemetry (optional)
+        if success and store_telemetry:
+            from telemetry import store_race_telemetry
+            with memory.Stage("telemetry"):
+                race_id = get_race_id(transformed_data['race_info'])
+                store_race_telemetry(extracted_data, race_id)
+        memory.release(extracted_data)
         
         print("="*100)
         if success:
@@ -51,37 +84,75 @@ def run_etl_pipeline(year, race_name):
         return False
 
 
-def run_full_season(year, races=None):
+def offline_preflight(seasons, store_telemetry=False):
+    """
+    Check that every race to load can be extracted from the FastF1 cache
+
+    Only checks when the cache is offline. Every missing session is listed
+    before anything is loaded.
+
+    Args:
+        seasons (dict): year -> list of race names, or None for all races
+        store_telemetry (bool): Car and position data are needed too
+
+    Returns:
+        bool: True if the load can go ahead
+    """
+    import fastf1_cache
+
+    if not fastf1_cache.OFFLINE:
+        return True
+    incomplete = {}
+    for year, races in seasons.items():
+        incomplete.update(fastf1_cache.check(year, races, telemetry=store_telemetry))
+    if not incomplete:
+        return True
+
+    print(f"OFFLINE: {len(incomplete)} race(s) are not in the FastF1 cache ({fastf1_cache.CACHE_DIR}); loading none")
+    for label, missing in incomplete.items():
+        print(f"  {label}: {fastf1_cache.format_missing(missing)}")
+    print("Warm the cache with: python backend/data_collection/fastf1_cache.py prefetch --season <year>")
+    return False
+
+
+def run_full_season(year, races=None, store_telemetry=False):
     """
     Load full season or specific races
     
     Args:
         year (int): Season year
         races (list): List of race names, or None for all races
+        store_telemetry (bool): Also write per-lap car data to the telemetry store
+
+    Returns:
+        list: (race name, success) per race
     """
-    import fastf1
-    
-    # Get schedule
-    fastf1.Cache.enable_cache('notebook/cache')
-    schedule = fastf1.get_event_schedule(year)
+    import fastf1_cache
     
     if races is None:
         # Load all races, excluding pre-season testing and non-GP events
-        race_events = schedule[
-            ~schedule['EventName'].str.contains('Testing|Test', case=False, na=False)
-        ]
-        race_list = race_events['EventName'].tolist()
+        race_list = fastf1_cache.season_events(year)
         print(f"Filtered to {len(race_list)} races (excluded testing/non-GP events)")
     else:
         race_list = races
+
+    if not offline_preflight({year: race_list}, store_telemetry):
+        return [(race_name, False) for race_name in race_list]
     
     print(f"\n{'='*100}")
     print(f"LOADING {len(race_list)} RACES FROM {year} SEASON")
     print(f"{'='*100}\n")
     
     results = []
-    for race_name in race_list:
-        success = run_etl_pipeline(year, race_name)
+    for index, race_name in enumerate(race_list):
+        try:
+            # Previous race's frames are gone by now; wait for the memory to be returned
+            memory.wait_below_budget()
+        except memory.MemoryBudgetExceeded as e:
+            print(f"MEMORY: {e}; not starting {len(race_list) - index} remaining race(s)")
+            results.extend((name, False) for name in race_list[index:])
+            break
+        success = run_etl_pipeline(year, race_name, store_telemetry=store_telemetry)
         results.append((race_name, success))
         print()  
     
@@ -98,13 +169,19 @@ def run_full_season(year, races=None):
         status = "SUCCESS" if success else "ERROR"
         print(f"  {status} {race_name}")
 
+    return results
+
 
-def run_all_seasons(years=None):
+def run_all_seasons(years=None, store_telemetry=False):
     """
     Load multiple seasons
     
     Args:
         years (list): List of years, or None for default [2020-2025]
+        store_telemetry (bool): Also write per-lap car data to the telemetry store
+
+    Returns:
+        list: (race name, success) per race
     """
     if years is None:
         years = [2020, 2021, 2022, 2023, 2024, 2025]
@@ -112,21 +189,125 @@ def run_all_seasons(years=None):
     print(f"\n{'='*100}")
     print(f"LOADING {len(years)} SEASONS: {years}")
     print(f"{'='*100}\n")
+
+    if not offline_preflight({year: None for year in years}, store_telemetry):
+        return [(str(year), False) for year in years]
     
+    results = []
     for year in years:
-        run_full_season(year)
-        print() 
+        results.extend(
+            (f"{year} {race_name}", success)
+            for race_name, success in run_full_season(year, store_telemetry=store_telemetry)
+        )
+        print()
+    return results
+
+
+def main(argv=None):
+    """Command line entry point"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Load F1 data from FastF1 into the database")
+    parser.add_argument("--season", type=int, action="append",
+                        help="Season to load (repeatable; default: 2020-2025)")
+    parser.add_argument("--race", action="append",
+                        help="Race to load (repeatable; requires a single --season)")
+    parser.add_argument("--telemetry", action="store_true",
+                        help="Also store per-lap car telemetry")
+    parser.add_argument("--staging", action="store_true",
+                        help="Load into a staging copy and swap it in only if every load and check passes")
+    parser.add_argument("--memory-budget", type=float, metavar="MB",
+                        help="Release and downcast data early, and do not start a race while RSS is above MB "
+                             "(default: F1_PIPELINE_MEMORY_MB)")
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="Report the source lines that allocated the most in each stage (slower)")
+    parser.add_argument("--profile", metavar="PATH",
+                        help="Sample the run and write collapsed stacks (flamegraph input) to PATH")
+    parser.add_argument("--offline", action="store_true",
+                        help="Read FastF1 data only from the cache; list uncached races and load nothing if any")
+    parser.add_argument("--fixtures", metavar="DIR",
+                        help="Read FastF1 data only from DIR, laid out like the cache (implies --offline)")
+    parser.add_argument("--refresh-stints", action="store_true",
+                        help="Rebuild the stored stints of the loaded races (or --season) from their laps and exit")
+    parser.add_argument("--migrate", action="store_true",
+                        help="Bring the database (and season shards) up to the current schema and exit")
+    args = parser.parse_args(argv)
+
+    if args.race and (not args.season or len(args.season) != 1):
+        parser.error("--race requires exactly one --season")
+    if args.memory_budget is not None:
+        memory.set_budget(args.memory_budget)
+    if args.trace_memory:
+        memory.start_tracing()
+    if args.offline or args.fixtures:
+        import fastf1_cache
+        fastf1_cache.set_offline(args.fixtures)
+
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from models.database import migrate_database
+    from models import shards
+
+    def prepare(bind=None):
+        """Migrate and backfill the database, or the staging copy bound to SessionLocal"""
+        # Add tables, columns and indexes introduced since the database was
+        # created; the API only checks for this (see models/database.py)
+        for change in migrate_database(bind=bind) + shards.migrate_shards():
+            print(f"Database migrated: {change}")
+
+        # Races loaded before stints were stored get theirs from their laps
+        rebuilt = refresh_season_stints(args.season if args.refresh_stints else None,
+                                        missing_only=not args.refresh_stints)
+        for season, races in rebuilt.items():
+            print(f"Stints rebuilt: {season} ({races} races)")
+
+    # A staging build migrates its copy instead, so production is only
+    # changed by the swap
+    if not args.staging:
+        prepare()
+        if args.refresh_stints or args.migrate:
+            return
+
+    def load():
+        if args.refresh_stints or args.migrate:
+            return []
+        if args.race:
+            return run_full_season(args.season[0], args.race, store_telemetry=args.telemetry)
+        return run_all_seasons(args.season, store_telemetry=args.telemetry)
+
+    def run():
+        """Return whether the run succeeded"""
+        try:
+            if not args.staging:
+                load()
+                return True
+            import staging
+            return staging.build_and_swap(load, prepare=prepare)
+        finally:
+            memory.summary()
+
+    if not args.profile:
+        if not run():
+            sys.exit(1)
+        return
+
+    import threading
+    from services.profiler import SamplingProfiler
+
+    with SamplingProfiler(thread_ids=[threading.get_ident()]) as profiler:
+        succeeded = run()
+    profiler.save(args.profile)
+    print(f"PROFILE: {profiler.sample_count} samples over {profiler.duration:.1f}s written to {args.profile}")
+    if not succeeded:
+        sys.exit(1)
 
 
 if __name__ == "__main__":
-    # Test single race
-    # run_etl_pipeline(2024, 'Monaco')
-    
-    # load specific races
-    # run_full_season(2024, ['Bahrain', 'Saudi Arabia', 'Australia'])
-    
-    # load full season 
-    # run_full_season(2021)
-    
-    # load all seasons
-    run_all_seasons()
+    # Examples:
+    #   python backend/data_collection/pipeline.py                     (all seasons)
+    #   python backend/data_collection/pipeline.py --season 2024 --race Monaco
+    #   python backend/data_collection/pipeline.py --season 2021 --profile season.folded
+    #   python backend/data_collection/pipeline.py --season 2024 --staging
+    #   python backend/data_collection/pipeline.py --season 2023 --memory-budget 1500
+    #   python backend/data_collection/pipeline.py --refresh-stints
+    #   python backend/data_collection/pipeline.py --season 2024 --offline
+    main()
@@ -0,0 +1,193 @@
+"""
+staging.py
+Build loads into a staging copy of the database and swap it in atomically
+
+The production file is copied with SQLite's online backup (readers keep
+working), the load runs against the copy, and the copy replaces the
+production file with one rename once it passes the checks. The API
+notices the replaced file and moves new sessions to it (see
+models/database.py); a failed or rejected build leaves production as it
+was and keeps the staging file for inspection.
+
+    python backend/data_collection/pipeline.py --season 2024 --staging
+"""
+
+import os
+import sqlite3
+import sys
+from contextlib import contextmanager
+
+from sqlalchemy import create_engine
+
+# Add backend to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.database import DATABASE_PATH, SessionLocal, engine, main_tables
+from models import shards
+
+STAGING_SUFFIX = ".staging"
+
+
+def staging_path(production=None):
+    """Staging file next to the production database"""
+    return (production or DATABASE_PATH) + STAGING_SUFFIX
+
+
+def _file_state(path):
+    """Size and modification time, to notice writes to production during a build"""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+
+
+def copy_database(source, target):
+    """Consistent copy of a SQLite database, safe while others read or write it"""
+    if os.path.exists(target):
+        os.remove(target)
+    target_conn = sqlite3.connect(target)
+    try:
+        if os.path.exists(source):
+            source_conn = sqlite3.connect(source)
+            try:
+                source_conn.backup(target_conn)
+            finally:
+                source_conn.close()
+    finally:
+        target_conn.close()
+
+
+def _per_race_counts(conn, table):
+    return dict(conn.execute(f"SELECT race_id, COUNT(*) FROM {table} GROUP BY race_id"))
+
+
+def check_database(staging, production):
+    """
+    Check a staging build before it replaces production
+
+    Loads only add or update rows, so no table and no race may have fewer
+    rows than in production, and every race the build added must have
+    results and laps (a race row alone means its load stopped half way).
+
+    Returns:
+        list: Problems found; empty if the build can be swapped in
+    """
+    problems = []
+    conn = sqlite3.connect(staging)
+    try:
+        integrity = conn.execute("PRAGMA integrity_check").fetchall()
+        if integrity != [("ok",)]:
+            problems.extend(f"integrity: {row[0]}" for row in integrity[:10])
+        for table, rowid, parent, _ in conn.execute("PRAGMA foreign_key_check").fetchall()[:10]:
+            problems.append(f"foreign key: {table} row {rowid} references missing {parent}")
+
+        tables = [table.name for table in main_tables()]
+        staged = {table: _per_race_counts(conn, table) for table in ("results", "laps")}
+        races = {race_id for (race_id,) in conn.execute("SELECT id FROM races")}
+
+        existing = set()
+        if os.path.exists(production):
+            conn.execute("ATTACH DATABASE ? AS production", (production,))
+            existing = {race_id for (race_id,) in conn.execute("SELECT id FROM production.races")}
+            in_production = {
+                name for (name,) in conn.execute("SELECT name FROM production.sqlite_master WHERE type = 'table'")
+            }
+            # Tables the build's migration created have nothing to compare with
+            tables = [table for table in tables if table in in_production]
+            staged = {table: counts for table, counts in staged.items() if table in in_production}
+            for table in tables:
+                count = conn.execute(f"SELECT COUNT(*) FROM main.{table}").fetchone()[0]
+                before = conn.execute(f"SELECT COUNT(*) FROM production.{table}").fetchone()[0]
+                if count < before:
+                    problems.append(f"{table}: {count} rows, production has {before}")
+            for table, staged_counts in staged.items():
+                for race_id, before in _per_race_counts(conn, f"production.{table}").items():
+                    if staged_counts.get(race_id, 0) < before:
+                        problems.append(
+                            f"race {race_id}: {staged_counts.get(race_id, 0)} {table}, production has {before}"
+                        )
+
+        for race_id in sorted(races - existing):
+            for table, staged_counts in staged.items():
+                if not staged_counts.get(race_id):
+                    problems.append(f"race {race_id} has no {table}")
+    finally:
+        conn.close()
+    return problems
+
+
+def swap_database(staging, production):
+    """Atomically replace the production file with the staging build"""
+    with open(staging, "rb") as f:
+        os.fsync(f.fileno())
+    os.replace(staging, production)
+    # Make the rename itself durable
+    directory = os.open(os.path.dirname(os.path.abspath(production)), os.O_RDONLY)
+    try:
+        os.fsync(directory)
+    finally:
+        os.close(directory)
+
+
+@contextmanager
+def _bound_to(path):
+    """Point SessionLocal (used by every loader) at another database file"""
+    staging_engine = create_engine(f"sqlite:///{path}")
+    SessionLocal.configure(bind=staging_engine)
+    try:
+        yield staging_engine
+    finally:
+        SessionLocal.configure(bind=engine)
+        staging_engine.dispose()
+
+
+def build_and_swap(load, prepare=None):
+    """
+    Run a load against a staging copy and swap it in if it is sound
+
+    Args:
+        load: Callable running the load; returns a list of (name, success)
+        prepare: Callable run first with the staging engine, e.g. to migrate
+            the copy, so production is only changed by the swap
+
+    Returns:
+        bool: True if the staging build replaced production
+    """
+    if DATABASE_PATH is None:
+        raise ValueError("Staging builds need a SQLite database file")
+    if shards.ENABLED:
+        raise ValueError("Staging builds do not support per-season shards (F1_SHARD_DIR)")
+
+    production = DATABASE_PATH
+    staging = staging_path(production)
+    print(f"STAGING: Copying {production} to {staging}")
+    copy_database(production, staging)
+    production_state = _file_state(production)
+
+    with _bound_to(staging) as staging_engine:
+        if prepare is not None:
+            prepare(staging_engine)
+        results = load()
+
+    failed = [name for name, success in results if not success]
+    if failed:
+        print(f"STAGING: {len(failed)} load(s) failed ({', '.join(failed)}); production unchanged, "
+              f"staging build kept at {staging}")
+        return False
+
+    problems = check_database(staging, production)
+    if problems:
+        print(f"STAGING: Checks failed; production unchanged, staging build kept at {staging}")
+        for problem in problems:
+            print(f"  - {problem}")
+        return False
+
+    if _file_state(production) != production_state:
+        print(f"STAGING: {production} changed during the build; not replacing it "
+              f"(staging build kept at {staging})")
+        return False
+
+    swap_database(staging, production)
+    print(f"STAGING: Checks passed; {production} replaced")
+    return True
@@ -0,0 +1,49 @@
+""" Telemetry - Store per-lap car data (optional pipeline stage) """
+import sys
+import pandas as pd
+
+sys.path.append('./backend/')
+
+from services.telemetry_store import CHANNELS, write_race_telemetry
+
+
+def _iter_lap_telemetry(session):
+    """Yield (driver_code, lap_number, channels) for every timed lap"""
+    for _, lap in session.laps.iterlaps():
+        if pd.isna(lap['LapNumber']):
+            continue
+        try:
+            car_data = lap.get_car_data().add_distance()
+        except Exception:
+            # Laps without car data (e.g. retirements mid-lap) are skipped
+            continue
+        if car_data.empty:
+            continue
+
+        channels = {}
+        for name, (column, _) in CHANNELS.items():
+            values = car_data[column]
+            if column == 'Time':
+                values = values.dt.total_seconds()
+            channels[name] = values.to_numpy()
+
+        yield lap['Driver'], int(lap['LapNumber']), channels
+
+
+def store_race_telemetry(extracted_data, race_id):
+    """
+    Write car telemetry of every lap to the columnar telemetry store
+
+    Args:
+        extracted_data (dict): Dictionary from extract_race()
+        race_id (int): Database ID of the loaded race
+
+    Returns:
+        int: Number of laps stored
+    """
+    print(f"TELEMETRY: Storing car data for race {race_id}")
+
+    lap_count = write_race_telemetry(race_id, _iter_lap_telemetry(extracted_data['session']))
+
+    print(f"    Stored telemetry for {lap_count} laps")
+    return lap_count
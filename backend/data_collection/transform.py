@@ -1,7 +1,54 @@
 """ Transform - Clean and format """
 
+import os
+import sys
+
 import pandas as pd
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.database import (
+    LAP_IN_LAP, LAP_OUT_LAP, LAP_FIRST_LAP, LAP_DELETED, LAP_SAFETY_CAR,
+    LAP_VIRTUAL_SAFETY_CAR, LAP_RED_FLAG, LAP_INACCURATE
+)
+
+def classify_laps(laps_raw):
+    """
+    Compute Lap.lap_flags bits from FastF1's lap columns
+
+    TrackStatus lists every status seen during the lap ('4' safety car,
+    '5' red flag, '6'/'7' VSC deployed/ending). Columns missing from the
+    source leave their bits unset.
+
+    Args:
+        laps_raw (DataFrame): FastF1 laps
+
+    Returns:
+        Series: int flags per lap
+    """
+    flags = pd.Series(0, index=laps_raw.index, dtype='int64')
+
+    def add(condition, bit):
+        flags[condition.fillna(False).astype(bool)] |= bit
+
+    if 'PitInTime' in laps_raw:
+        add(laps_raw['PitInTime'].notna(), LAP_IN_LAP)
+    if 'PitOutTime' in laps_raw:
+        # Lap 1 starts from the grid, or from the pit lane with a PitOutTime
+        add(laps_raw['PitOutTime'].notna() & (laps_raw['LapNumber'] > 1), LAP_OUT_LAP)
+    add(laps_raw['LapNumber'] == 1, LAP_FIRST_LAP)
+    if 'Deleted' in laps_raw:
+        add(laps_raw['Deleted'] == True, LAP_DELETED)  # noqa: E712 (object column with NaN)
+    if 'TrackStatus' in laps_raw:
+        track_status = laps_raw['TrackStatus'].fillna('').astype(str)
+        add(track_status.str.contains('4', regex=False), LAP_SAFETY_CAR)
+        add(track_status.str.contains('[67]'), LAP_VIRTUAL_SAFETY_CAR)
+        add(track_status.str.contains('5', regex=False), LAP_RED_FLAG)
+    if 'IsAccurate' in laps_raw:
+        add(laps_raw['IsAccurate'] != True, LAP_INACCURATE)  # noqa: E712
+
+    return flags
+
 def transform_race_data(extracted_data):
     """
     Transform raw race data
@@ -19,18 +66,22 @@ def transform_race_data(extracted_data):
     laps_raw = extracted_data['laps_raw']
     session = extracted_data['session']
     
-    # Convert timedeltas to seconds
-    laps_raw = laps_raw.copy()
-    laps_raw['LapTimeSeconds'] = laps_raw['LapTime'].dt.total_seconds()
-
-    # Select needed columns
+    # Select needed columns; derived ones are computed from laps_raw so the
+    # full raw frame is never copied
     laps_clean = laps_raw[[
-        'Driver', 'DriverNumber', 'LapNumber', 'LapTimeSeconds',
-        'Compound', 'TyreLife', 'Stint', 'Team', 'IsPersonalBest'
+        'Driver', 'DriverNumber', 'LapNumber', 'Compound', 'TyreLife', 'Stint',
+        'Team', 'IsPersonalBest', 'SpeedI1', 'SpeedI2', 'SpeedFL', 'SpeedST'
     ]].copy()
+    # Convert timedeltas to seconds
+    laps_clean.insert(3, 'LapTimeSeconds', laps_raw['LapTime'].dt.total_seconds())
+    laps_clean.insert(9, 'LapFlags', classify_laps(laps_raw))
+    for position, sector in enumerate(['Sector1', 'Sector2', 'Sector3'], start=10):
+        laps_clean.insert(position, f'{sector}TimeSeconds', laps_raw[f'{sector}Time'].dt.total_seconds())
 
     # Handle nulls
-    for col in ['LapTimeSeconds', 'Compound', 'TyreLife', 'Stint']:
+    for col in ['LapTimeSeconds', 'Compound', 'TyreLife', 'Stint',
+                'Sector1TimeSeconds', 'Sector2TimeSeconds', 'Sector3TimeSeconds',
+                'SpeedI1', 'SpeedI2', 'SpeedFL', 'SpeedST']:
         if col in laps_clean.columns:
             laps_clean[col] = laps_clean[col].astype(object).where(pd.notna(laps_clean[col]), None)
 
@@ -67,6 +118,7 @@ def transform_race_data(extracted_data):
     # laps_clean['TyreLife'] = laps_clean['TyreLife'].astype(int)  
     # laps_clean['Stint'] = laps_clean['Stint'].astype(int)
     laps_clean['IsPersonalBest'] = laps_clean['IsPersonalBest'].astype(bool)
+    laps_clean['LapFlags'] = laps_clean['LapFlags'].astype(int)
     # Convert nullable integers - handle NA values properly
     laps_clean['TyreLife'] = laps_clean['TyreLife'].apply(
         lambda x: int(x) if pd.notna(x) else None
@@ -0,0 +1,210 @@
+"""
+worker.py
+ETL workers: run queued (season, event) loads from the jobs table
+
+Any number of worker processes, on this host or others sharing the
+database, can run at once; each job is claimed by one worker under a
+lease that a heartbeat thread renews while the load runs (see
+services/job_queue.py). A job for a whole season is expanded into one job
+per event from the FastF1 schedule.
+
+    python backend/data_collection/worker.py submit --season 2024
+    python backend/data_collection/worker.py submit --season 2024 --event Monaco --event Bahrain
+    python backend/data_collection/worker.py run --processes 4
+    python backend/data_collection/worker.py status
+"""
+
+import multiprocessing
+import os
+import socket
+import sys
+import threading
+import time
+
+# Add backend to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.database import SessionLocal, engine
+from services import job_queue
+
+# Seconds between claims while the queue is empty
+POLL_INTERVAL = float(os.environ.get("F1_JOB_POLL_INTERVAL", "5"))
+
+
+def _heartbeat(job_id, worker, stop, lost):
+    """Renew the lease every third of its length until stop is set"""
+    while not stop.wait(job_queue.LEASE_SECONDS / 3):
+        db = SessionLocal()
+        try:
+            if not job_queue.renew(db, job_id, worker):
+                lost.set()
+                return
+        except Exception as e:
+            # Keep trying: the lease is still valid until it expires
+            print(f"WORKER {worker}: could not renew the lease of job {job_id}: {e}")
+        finally:
+            db.close()
+
+
+def run_job(job, worker):
+    """
+    Run a claimed job and record its outcome
+
+    Returns:
+        bool: True if the job succeeded
+    """
+    from pipeline import run_etl_pipeline
+
+    stop, lost = threading.Event(), threading.Event()
+    heartbeat = threading.Thread(
+        target=_heartbeat, args=(job.id, worker, stop, lost), name=f"job-{job.id}-lease", daemon=True
+    )
+    heartbeat.start()
+    error = None
+    try:
+        if job.event is None:
+            import fastf1_cache
+
+            events = fastf1_cache.season_events(job.year)
+            db = SessionLocal()
+            try:
+                job_queue.submit(db, job.year, events, telemetry=job.telemetry, max_attempts=job.max_attempts)
+            finally:
+                db.close()
+            print(f"WORKER {worker}: job {job.id} queued {len(events)} events of {job.year}")
+        elif not run_etl_pipeline(job.year, job.event, store_telemetry=job.telemetry):
+            error = "ETL pipeline failed; see the worker log"
+    except (Exception, SystemExit) as e:
+        # FastF1 exits when a download fails or it is rate limited; that
+        # must fail the job, not end the worker
+        error = f"{type(e).__name__}: {e}"
+    finally:
+        stop.set()
+        heartbeat.join()
+
+    if lost.is_set():
+        print(f"WORKER {worker}: lost the lease of job {job.id} while it ran; another worker may repeat it")
+
+    db = SessionLocal()
+    try:
+        if error is None:
+            job_queue.complete(db, job.id, worker)
+            return True
+        status = job_queue.fail(db, job.id, worker, error)
+        print(f"WORKER {worker}: job {job.id} failed ({error}); now {status}")
+        return False
+    finally:
+        db.close()
+
+
+def run_worker(name=None, once=False):
+    """
+    Claim and run jobs until stopped
+
+    Args:
+        name (str): Worker name (default: <host>:<pid>)
+        once (bool): Return when the queue has nothing available instead of polling
+    """
+    # Connections inherited from the parent process must not be reused
+    engine.dispose(close=False)
+    worker = name or f"{socket.gethostname()}:{os.getpid()}"
+    print(f"WORKER {worker}: started")
+    while True:
+        db = SessionLocal()
+        try:
+            job = job_queue.claim(db, worker)
+        finally:
+            db.close()
+        if job is None:
+            if once:
+                print(f"WORKER {worker}: queue empty, stopping")
+                return
+            time.sleep(POLL_INTERVAL)
+            continue
+        print(f"WORKER {worker}: job {job.id} {job.year} {job.event or '(season)'} (attempt {job.attempts}/{job.max_attempts})")
+        run_job(job, worker)
+
+
+def run_workers(processes=1, once=False):
+    """Run a pool of worker processes until they all stop"""
+    if processes == 1:
+        run_worker(once=once)
+        return
+    workers = [
+        multiprocessing.Process(target=run_worker, kwargs={"once": once}, name=f"etl-worker-{index}")
+        for index in range(processes)
+    ]
+    for process in workers:
+        process.start()
+    try:
+        for process in workers:
+            process.join()
+    except KeyboardInterrupt:
+        for process in workers:
+            process.terminate()
+
+
+def main(argv=None):
+    """Command line entry point"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Queue and run ETL jobs")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    submit_parser = commands.add_parser("submit", help="Queue loads for a season or some of its events")
+    submit_parser.add_argument("--season", type=int, required=True)
+    submit_parser.add_argument("--event", action="append", help="Event name (repeatable; default: every event)")
+    submit_parser.add_argument("--telemetry", action="store_true", help="Also store per-lap car telemetry")
+    submit_parser.add_argument("--max-attempts", type=int,
+                               help=f"Attempts per job (default: F1_JOB_MAX_ATTEMPTS, {job_queue.MAX_ATTEMPTS})")
+
+    run_parser = commands.add_parser("run", help="Run workers")
+    run_parser.add_argument("--processes", type=int, default=1, help="Worker processes (default: 1)")
+    run_parser.add_argument("--once", action="store_true", help="Stop when no job is available")
+
+    commands.add_parser("status", help="Show queue counts and throughput")
+    args = parser.parse_args(argv)
+
+    from models.database import migrate_database
+    from models import shards
+    from load import refresh_season_stints
+
+    # The jobs table, and anything else introduced since the database was created
+    for change in migrate_database() + shards.migrate_shards():
+        print(f"Database migrated: {change}")
+    for season, races in refresh_season_stints(missing_only=True).items():
+        print(f"Stints rebuilt: {season} ({races} races)")
+
+    if args.command == "run":
+        run_workers(args.processes, once=args.once)
+        return 0
+
+    db = SessionLocal()
+    try:
+        if args.command == "submit":
+            import fastf1_cache
+
+            events = fastf1_cache.resolve_events(args.season, args.event) if args.event else None
+            for job, created in job_queue.submit(db, args.season, events, telemetry=args.telemetry,
+                                                 max_attempts=args.max_attempts):
+                print(f"  {'queued' if created else 'already ' + job.status:16s} job {job.id}: "
+                      f"{job.year} {job.event or '(every event)'}")
+            return 0
+
+        summary = job_queue.stats(db)
+        print("  " + "  ".join(f"{status} {count}" for status, count in summary["counts"].items()))
+        for season in summary["seasons"]:
+            print(f"  {season['season']}: " + ", ".join(
+                f"{season[status]} {status}" for status in job_queue.STATUSES if season[status]
+            ))
+        print(f"  Workers: {', '.join(summary['workers']) or 'none'}")
+        print(f"  Last {summary['window_minutes']} min: {summary['succeeded_in_window']} succeeded, "
+              f"{summary['failed_in_window']} failed, {summary['jobs_per_hour']} jobs/h, "
+              f"average {summary['average_duration_seconds'] or '-'} s")
+        return 0
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,18 +1,117 @@
+import os
+import re
+import unicodedata
+
 from sqlalchemy import (
-    Column, Integer, Float, String, Boolean, ForeignKey, DateTime, Index, create_engine
+    Column, Integer, SmallInteger, Float, String, Boolean, ForeignKey, DateTime, Index,
+    create_engine, event, exc, func, insert, inspect, literal_column, select, text, type_coerce
 )
-from sqlalchemy.orm import declarative_base, relationship, sessionmaker
+from sqlalchemy.sql import operators
+from sqlalchemy.ext.hybrid import Comparator, hybrid_property
+from sqlalchemy.orm import declarative_base, object_session, relationship, sessionmaker
 
 #SCHEMA
 Base = declarative_base()
 
+# Lap.lap_flags bits, set at transform time. A lap with no bits set is a
+# clean, representative lap; NULL means it has not been classified.
+LAP_IN_LAP = 1
+LAP_OUT_LAP = 2
+LAP_FIRST_LAP = 4
+LAP_DELETED = 8
+LAP_SAFETY_CAR = 16
+LAP_VIRTUAL_SAFETY_CAR = 32
+LAP_RED_FLAG = 64
+LAP_INACCURATE = 128
+
+def seconds_to_ms(seconds):
+    """Lap time in seconds to the integer milliseconds stored in laps.lap_time_ms"""
+    return None if seconds is None else int(round(seconds * 1000))
+
+
+class Team(Base):
+    """Team names, referenced by laps.team_id"""
+    __tablename__ = "teams"
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String, unique=True, nullable=False)
+
+    def __repr__(self):
+        return f"<Team {self.name}>"
+
+
+class Compound(Base):
+    """Tyre compound names, referenced by laps.compound_id"""
+    __tablename__ = "compounds"
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String, unique=True, nullable=False)
+
+    def __repr__(self):
+        return f"<Compound {self.name}>"
+
+
+def lookup_name(db, model, id_):
+    """
+    Name of a Team or Compound id (cached per session)
+
+    The lookup tables only ever grow and are small, so a miss reloads
+    the whole table.
+    """
+    if id_ is None:
+        return None
+    names = db.info.setdefault("lookup_names", {}).setdefault(model.__tablename__, {})
+    if id_ not in names:
+        names.update(db.query(model.id, model.name).all())
+    return names.get(id_)
+
+
+class _NameComparator(Comparator):
+    """
+    SQL side of Lap.team and Lap.compound
+
+    Selecting or grouping uses the looked-up name; comparing with a name
+    compares the id column instead, so filters keep using its index.
+    """
+
+    def __init__(self, id_column, lookup):
+        self.id_column = id_column
+        self.lookup = lookup
+        super().__init__(
+            select(lookup.name).where(lookup.id == id_column).scalar_subquery().label(None)
+        )
+
+    def _ids(self, names):
+        return select(self.lookup.id).where(self.lookup.name.in_(names)).scalar_subquery()
+
+    def operate(self, op, *other, **kwargs):
+        if op is operators.eq and isinstance(other[0], str):
+            return self.id_column == self._ids([other[0]])
+        if op is operators.in_op and isinstance(other[0], (list, tuple, set)):
+            return self.id_column.in_(self._ids(list(other[0])))
+        if op in (operators.is_, operators.is_not):
+            return op(self.id_column, *other, **kwargs)
+        return op(self.expression, *other, **kwargs)
+
+
 class Lap(Base):        
     """Stores individual lap data"""    
     __tablename__ = "laps"
     __table_args__ = (
-        Index("ix_laps_team", "team"),
+        Index("ix_laps_team_id", "team_id"),
         Index("ix_laps_race_id", "race_id"),
         Index("ix_laps_driver_id", "driver_id"),
+        Index(
+            "ix_laps_clean", "race_id", "driver_id", "lap_time_ms",
+            sqlite_where=text("lap_flags = 0")
+        ),
+        # Covers the per-race sector aggregates
+        Index(
+            "ix_laps_sectors", "race_id", "driver_id",
+            "sector1_time_seconds", "sector2_time_seconds", "sector3_time_seconds"
+        ),
+        # Laps loaded before classification; empty once every race is reloaded
+        Index("ix_laps_unclassified", "race_id", sqlite_where=text("lap_flags IS NULL")),
     )
 
     id = Column(Integer, primary_key=True, index= True)
@@ -20,29 +119,116 @@ class Lap(Base):
     driver_id = Column(ForeignKey("drivers.id"), nullable= False)
 
     lap_number = Column(Integer, nullable= False)
-    lap_time_seconds = Column(Float, nullable= True)
-    compound = Column(String, nullable= True)
-    tyre_life = Column(Integer, nullable= True)
-    stint = Column(Integer, nullable= True)
+    # Timing is to the millisecond; read it as Lap.lap_time_seconds
+    lap_time_ms = Column(Integer, nullable= True)
+    compound_id = Column(ForeignKey("compounds.id"), nullable= True)
+    tyre_life = Column(SmallInteger, nullable= True)
+    stint = Column(SmallInteger, nullable= True)
     pit_in_time = Column(Float, nullable=True)
 
-    team = Column(String, nullable= False)
+    team_id = Column(ForeignKey("teams.id"), nullable= False)
     is_personal_best = Column(Boolean, default= False)
+    lap_flags = Column(Integer, nullable=True)
+
+    sector1_time_seconds = Column(Float, nullable=True)
+    sector2_time_seconds = Column(Float, nullable=True)
+    sector3_time_seconds = Column(Float, nullable=True)
+    # Speed traps in km/h: intermediate 1 and 2, finish line, speed trap
+    speed_i1 = Column(Float, nullable=True)
+    speed_i2 = Column(Float, nullable=True)
+    speed_fl = Column(Float, nullable=True)
+    speed_st = Column(Float, nullable=True)
 
     # Relationships
     driver = relationship("Driver", back_populates="laps")
     race = relationship("Race", back_populates="laps")
 
+    @hybrid_property
+    def lap_time_seconds(self):
+        return self.lap_time_ms / 1000 if self.lap_time_ms is not None else None
+
+    @lap_time_seconds.inplace.setter
+    def _lap_time_seconds_setter(self, seconds):
+        self.lap_time_ms = seconds_to_ms(seconds)
+
+    @lap_time_seconds.inplace.expression
+    @classmethod
+    def _lap_time_seconds_expression(cls):
+        return type_coerce(cls.lap_time_ms / literal_column("1000.0", Float), Float)
+
+    @hybrid_property
+    def team(self):
+        return lookup_name(object_session(self), Team, self.team_id)
+
+    @team.inplace.comparator
+    @classmethod
+    def _team_comparator(cls):
+        return _NameComparator(cls.team_id, Team)
+
+    @hybrid_property
+    def compound(self):
+        return lookup_name(object_session(self), Compound, self.compound_id)
+
+    @compound.inplace.comparator
+    @classmethod
+    def _compound_comparator(cls):
+        return _NameComparator(cls.compound_id, Compound)
+
+    @classmethod
+    def is_clean(cls):
+        """Filter on clean laps, matching the ix_laps_clean partial index"""
+        return cls.lap_flags == literal_column("0")
+
+    @classmethod
+    def is_unclassified(cls):
+        """Filter on laps never classified, matching the ix_laps_unclassified partial index"""
+        return cls.lap_flags.is_(None)
+
     def __repr__(self):
         return f"<Lap Race:{self.race_id} Driver:{self.driver_id} Lap:{self.lap_number}>"
 
 
 
+class Circuit(Base):
+    """Venues, so a circuit's races can be followed across seasons and event names"""
+    __tablename__ = "circuits"
+
+    id = Column(Integer, primary_key=True)
+    # Slug of the FastF1 schedule's Location, see circuit_key
+    circuit_key = Column(String, unique=True, nullable=False)
+    name = Column(String, nullable=False)
+    country = Column(String, nullable=True)
+
+    def __repr__(self):
+        return f"<Circuit {self.circuit_key}>"
+
+
+# Locations the schedule has spelled differently over the seasons
+CIRCUIT_ALIASES = {
+    "abu-dhabi": "yas-marina",
+    "yas-island": "yas-marina",
+    "losail": "lusail",
+    "monte-carlo": "monaco",
+    "montmelo": "barcelona",
+    "spa": "spa-francorchamps",
+}
+
+
+def circuit_key(location):
+    """Stable circuit key of a schedule Location, e.g. 'São Paulo' -> 'sao-paulo'"""
+    ascii_name = unicodedata.normalize("NFKD", location).encode("ascii", "ignore").decode()
+    key = re.sub(r"[^a-z0-9]+", "-", ascii_name.lower()).strip("-")
+    return CIRCUIT_ALIASES.get(key, key)
+
+
 class Race(Base):
     """Stores information about each Grand Prix"""
     __tablename__ = "races"
     __table_args__ = (
         Index("ix_races_year", "year"),
+        Index("ix_races_circuit_id_year", "circuit_id", "year"),
+        # A second load of the same event fails instead of adding a copy
+        Index("ix_races_year_race_name", "year", "race_name", unique=True),
     )
 
     id = Column(Integer, primary_key=True, index= True)
@@ -52,6 +238,7 @@ class Race(Base):
     event_date = Column(DateTime, nullable= True)
     location = Column(String, nullable= True)
     country = Column(String, nullable= True)
+    circuit_id = Column(Integer, ForeignKey("circuits.id"), nullable= True)
 
     # Relationships
     laps = relationship("Lap", back_populates="race")
@@ -102,21 +289,449 @@ class Result(Base):
     def __repr__(self):
         return f"<Result Race:{self.race_id} P{self.position} Driver:{self.driver_id}>"
 
+class Stint(Base):
+    """Tyre stints per driver per race, derived from the laps at load time"""
+    __tablename__ = "stints"
+    __table_args__ = (
+        Index("ix_stints_race_id", "race_id"),
+    )
+
+    id = Column(Integer, primary_key=True)
+
+    race_id = Column(ForeignKey("races.id"), nullable= False)
+    driver_id = Column(ForeignKey("drivers.id"), nullable= False)
+    team_id = Column(ForeignKey("teams.id"), nullable= False)
+    # Lap.stint: 1 for the tyres the driver started on
+    stint = Column(SmallInteger, nullable= False)
+    compound_id = Column(ForeignKey("compounds.id"), nullable= True)
+    start_lap = Column(SmallInteger, nullable= False)
+    end_lap = Column(SmallInteger, nullable= False)
+    # Laps already run on the tyres when they were fitted
+    tyre_age_at_fit = Column(SmallInteger, nullable= True)
+
+    def __repr__(self):
+        return f"<Stint Race:{self.race_id} Driver:{self.driver_id} Stint:{self.stint}>"
+
+class DatasetVersion(Base):
+    """Change counters used to invalidate cached API payloads"""
+    __tablename__ = "dataset_versions"
+
+    # "dataset", "season:<year>" or "race:<id>"
+    scope = Column(String, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, nullable=True)
+
+    def __repr__(self):
+        return f"<DatasetVersion {self.scope} v{self.version}>"
+
+class Job(Base):
+    """ETL jobs: one (season, event) load each, claimed by workers under a lease"""
+    __tablename__ = "jobs"
+    __table_args__ = (
+        Index("ix_jobs_status_available", "status", "available_at"),
+        Index("ix_jobs_year_event", "year", "event"),
+        # At most one queued or running job per event, and per whole season
+        Index(
+            "ix_jobs_active_event", "year", "event", unique=True,
+            sqlite_where=text("status IN ('queued', 'running')")
+        ),
+        Index(
+            "ix_jobs_active_season", "year", unique=True,
+            sqlite_where=text("status IN ('queued', 'running') AND event IS NULL")
+        ),
+    )
+
+    id = Column(Integer, primary_key=True)
+
+    year = Column(Integer, nullable= False)
+    # NULL: every event of the season (expanded into one job per event)
+    event = Column(String, nullable= True)
+    telemetry = Column(Boolean, nullable= False, default= False)
+    # "queued", "running", "succeeded", "failed" or "cancelled"
+    status = Column(String, nullable= False, default= "queued")
+    attempts = Column(Integer, nullable= False, default= 0)
+    max_attempts = Column(Integer, nullable= False, default= 3)
+    # Not claimed before this time (retry backoff)
+    available_at = Column(DateTime, nullable= False)
+    lease_owner = Column(String, nullable= True)
+    lease_expires_at = Column(DateTime, nullable= True)
+    created_at = Column(DateTime, nullable= False)
+    started_at = Column(DateTime, nullable= True)
+    finished_at = Column(DateTime, nullable= True)
+    last_error = Column(String, nullable= True)
+
+    def __repr__(self):
+        return f"<Job {self.id} {self.year} {self.event or '(season)'} {self.status}>"
+
 
 
 
 # DATABASE SETUP
-DATABASE_URL = "sqlite:///data/database.db"
+DATABASE_URL = os.environ.get("F1_DATABASE_URL", "sqlite:///data/database.db")
 engine = create_engine(DATABASE_URL, echo=False)
 
+def _file_identity(path):
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (stat.st_dev, stat.st_ino)
+
+# A staging build swaps a new database file into place (see
+# data_collection/staging.py). Pooled connections still hold the old file,
+# so drop them at checkout once the path points at a different file.
+if engine.dialect.name == "sqlite" and engine.url.database not in (None, "", ":memory:"):
+    DATABASE_PATH = engine.url.database
+
+    @event.listens_for(engine, "connect")
+    def _remember_database_file(dbapi_connection, connection_record):
+        connection_record.info["database_file"] = _file_identity(DATABASE_PATH)
+
+    @event.listens_for(engine, "checkout")
+    def _check_database_file(dbapi_connection, connection_record, connection_proxy):
+        if connection_record.info.get("database_file") != _file_identity(DATABASE_PATH):
+            # The pool reconnects this record and retries the checkout
+            raise exc.DisconnectionError("Database file was replaced")
+else:
+    DATABASE_PATH = None
+
+# Optional directory of per-season lap files (see models/shards.py)
+SHARD_DIR = os.environ.get("F1_SHARD_DIR") or None
+
 # CREATE SessionLocal
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+def main_tables():
+    """Tables stored in the main database file (laps live in shards when sharded)"""
+    return [
+        table for table in Base.metadata.sorted_tables
+        if not (SHARD_DIR and table is Lap.__table__)
+    ]
+
 def init_database():
     """Create all tables"""
-    Base.metadata.create_all(bind=engine)
+    Base.metadata.create_all(bind=engine, tables=main_tables())
     print("Database tables created successfully")
 
+def compact_laps(conn, lookups="main"):
+    """
+    Rewrite a laps table stored in the original layout into the compact one
+
+    The original layout repeats the team and compound names on every lap
+    and stores lap times as floats. Names are added to the teams and
+    compounds tables in the `lookups` schema and laps are copied with
+    their ids into a new table holding the ids and integer milliseconds;
+    the indexes are rebuilt and analyzed. Runs as one transaction, so the
+    connection must be in AUTOCOMMIT mode (the sqlite driver otherwise
+    commits each DDL statement on its own). SQLite only. VACUUM afterwards
+    to return the freed pages to the filesystem.
+
+    Args:
+        conn: AUTOCOMMIT connection to the database holding the laps table
+        lookups: Schema holding the teams and compounds tables
+
+    Returns:
+        int: Laps rewritten, or None if the table is not in the original layout
+    """
+    columns = {row[1] for row in conn.exec_driver_sql("PRAGMA main.table_info(laps)")}
+    if "team" not in columns:
+        return None
+
+    conn.exec_driver_sql("BEGIN IMMEDIATE")
+    try:
+        for (index,) in conn.exec_driver_sql(
+            "SELECT name FROM main.sqlite_master WHERE type = 'index' AND tbl_name = 'laps' AND sql IS NOT NULL"
+        ).all():
+            conn.exec_driver_sql(f"DROP INDEX main.{index}")
+        conn.exec_driver_sql("ALTER TABLE main.laps RENAME TO laps_original")
+        Lap.__table__.create(conn)
+
+        conn.exec_driver_sql(
+            f"INSERT OR IGNORE INTO {lookups}.teams (name) SELECT DISTINCT team FROM laps_original"
+        )
+        conn.exec_driver_sql(
+            f"INSERT OR IGNORE INTO {lookups}.compounds (name) "
+            "SELECT DISTINCT compound FROM laps_original WHERE compound IS NOT NULL"
+        )
+        converted = {
+            "team_id": "t.id",
+            "compound_id": "c.id",
+            "lap_time_ms": "CAST(ROUND(l.lap_time_seconds * 1000) AS INTEGER)",
+            "tyre_life": "CAST(l.tyre_life AS INTEGER)",
+            "stint": "CAST(l.stint AS INTEGER)",
+        }
+        # Columns added after the laps were written are left NULL
+        copied = [
+            column.name for column in Lap.__table__.columns
+            if column.name in columns and column.name not in converted
+        ]
+        conn.exec_driver_sql(
+            f"INSERT INTO main.laps ({', '.join(copied + list(converted))}) "
+            f"SELECT {', '.join([f'l.{name}' for name in copied] + list(converted.values()))} "
+            f"FROM laps_original l "
+            f"JOIN {lookups}.teams t ON t.name = l.team "
+            f"LEFT JOIN {lookups}.compounds c ON c.name = l.compound"
+        )
+
+        before = conn.exec_driver_sql("SELECT COUNT(*) FROM laps_original").scalar()
+        after = conn.exec_driver_sql("SELECT COUNT(*) FROM main.laps").scalar()
+        if after != before:
+            raise RuntimeError(f"Compacting laps copied {after} of {before} rows")
+        conn.exec_driver_sql("DROP TABLE laps_original")
+        # The rebuilt indexes need statistics for the planner to keep its choices
+        conn.exec_driver_sql("ANALYZE main.laps")
+        conn.exec_driver_sql("COMMIT")
+    except BaseException:
+        conn.exec_driver_sql("ROLLBACK")
+        raise
+    return after
+
+def vacuum(bind=None):
+    """Rebuild a SQLite file, returning free pages to the filesystem"""
+    with (bind or engine).connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.exec_driver_sql("VACUUM")
+
+def pending_migrations(bind=None, tables=None):
+    """
+    Describe what migrate_database would change, without changing anything
+
+    Args:
+        bind: Engine to check (default: the main database)
+        tables: Tables to check (default: main_tables())
+
+    Returns:
+        list: Descriptions of the pending changes; empty if up to date
+    """
+    bind = bind or engine
+    tables = tables if tables is not None else main_tables()
+    inspector = inspect(bind)
+    existing_tables = set(inspector.get_table_names())
+    pending = []
+    races_linkable = False
+
+    for table in tables:
+        if table.name not in existing_tables:
+            pending.append(f"create table {table.name}")
+            continue
+        existing_columns = {c["name"] for c in inspector.get_columns(table.name)}
+        if table is Lap.__table__ and "team" in existing_columns:
+            # Columns and indexes are replaced with the table
+            pending.append("compact laps stored in the original layout")
+            continue
+        if table is Race.__table__:
+            races_linkable = "circuit_id" in existing_columns
+        pending.extend(
+            f"add column {table.name}.{column.name}"
+            for column in table.columns if column.name not in existing_columns
+        )
+        existing_indexes = {i["name"] for i in inspector.get_indexes(table.name)}
+        pending.extend(
+            f"create index {index.name}"
+            for index in table.indexes if index.name not in existing_indexes
+        )
+
+    if races_linkable:
+        with bind.connect() as conn:
+            unlinked = conn.execute(
+                select(func.count()).select_from(Race).where(
+                    Race.circuit_id.is_(None), Race.location.isnot(None)
+                )
+            ).scalar()
+        if unlinked:
+            pending.append(f"assign circuits to {unlinked} races")
+    return pending
+
+def _require_unique_races(conn):
+    """Refuse to migrate a database that stores an event twice; its rows need a person to merge them"""
+    duplicates = conn.execute(text(
+        "SELECT year, race_name, GROUP_CONCAT(id, ', ') FROM races "
+        "GROUP BY year, race_name HAVING COUNT(*) > 1 ORDER BY year, race_name"
+    )).all()
+    if duplicates:
+        raise RuntimeError(
+            "Races stored more than once (delete the extra races with their results, laps and "
+            "stints, then migrate again): "
+            + "; ".join(f"{year} {race_name} (ids {ids})" for year, race_name, ids in duplicates)
+        )
+
+def _cancel_duplicate_jobs(conn):
+    """
+    Cancel all but one queued or running job per (season, event), keeping a
+    running one over queued ones, so the active-job indexes can be created
+
+    Returns:
+        int: Number of jobs cancelled
+    """
+    from datetime import datetime
+
+    return conn.execute(text(
+        "UPDATE jobs SET status = 'cancelled', finished_at = :now, lease_owner = NULL, "
+        "lease_expires_at = NULL, last_error = 'Duplicate of another queued or running job' "
+        "WHERE id IN (SELECT id FROM ("
+        "  SELECT id, ROW_NUMBER() OVER ("
+        "    PARTITION BY year, event ORDER BY status = 'running' DESC, id"
+        "  ) AS n FROM jobs WHERE status IN ('queued', 'running')"
+        ") WHERE n > 1)"
+    ), {"now": datetime.utcnow()}).rowcount
+
+def migrate_database(bind=None, tables=None):
+    """
+    Bring an existing database up to the current schema
+
+    Creates missing tables, converts laps stored in the original layout
+    (see compact_laps), adds missing columns (as nullable, without
+    defaults) and creates missing indexes, then refreshes planner
+    statistics and links races without a circuit to one. Safe to run
+    repeatedly.
+
+    Args:
+        bind: Engine to migrate (default: the main database)
+        tables: Tables to migrate (default: main_tables())
+
+    Returns:
+        list: Descriptions of the changes made
+    """
+    bind = bind or engine
+    tables = tables if tables is not None else main_tables()
+    Base.metadata.create_all(bind=bind, tables=tables)
+    changes = []
+
+    compacted = None
+    if Lap.__table__ in tables and bind.dialect.name == "sqlite":
+        Base.metadata.create_all(bind=bind, tables=[Team.__table__, Compound.__table__])
+        with bind.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            compacted = compact_laps(conn)
+        if compacted is not None:
+            changes.append(f"compacted {compacted} laps")
+
+    inspector = inspect(bind)
+    with bind.begin() as conn:
+        for table in tables:
+            existing_columns = {c["name"] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing_columns:
+                    column_type = column.type.compile(dialect=bind.dialect)
+                    conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"))
+                    changes.append(f"added column {table.name}.{column.name}")
+
+            existing_indexes = {i["name"] for i in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in existing_indexes:
+                    if index.name == "ix_races_year_race_name":
+                        _require_unique_races(conn)
+                    elif index.name in ("ix_jobs_active_event", "ix_jobs_active_season"):
+                        cancelled = _cancel_duplicate_jobs(conn)
+                        if cancelled:
+                            changes.append(f"cancelled {cancelled} duplicate queued or running jobs")
+                    index.create(conn)
+                    changes.append(f"created index {index.name}")
+
+        # SQLite only picks partial indexes over plain ones with statistics
+        if changes and bind.dialect.name == "sqlite":
+            conn.execute(text("ANALYZE"))
+
+    if Race.__table__ in tables:
+        # Races loaded before circuits existed
+        with sessionmaker(bind=bind)() as db:
+            assigned = assign_circuits(db)
+            db.commit()
+        if assigned:
+            changes.append(f"assigned circuits to {assigned} races")
+
+    if compacted is not None:
+        vacuum(bind)
+    return changes
+
+def bump_dataset_version(db, race_id=None, season=None, dataset=True):
+    """
+    Increment the change counters touched by a load
+
+    The global "dataset" counter is bumped unless dataset=False (live
+    appends that add no new races or drivers); season and race counters
+    only when given. Caller is responsible for committing.
+    """
+    from datetime import datetime
+
+    scopes = ["dataset"] if dataset else []
+    if season is not None:
+        scopes.append(f"season:{season}")
+    if race_id is not None:
+        scopes.append(f"race:{race_id}")
+
+    now = datetime.utcnow()
+    for scope in scopes:
+        row = db.get(DatasetVersion, scope)
+        if row is None:
+            db.add(DatasetVersion(scope=scope, version=1, updated_at=now))
+        else:
+            row.version += 1
+            row.updated_at = now
+
+def assign_circuits(db, race_ids=None):
+    """
+    Link the given races (default: every race) without a circuit to one
+
+    The circuit comes from the race's schedule location (see circuit_key)
+    and is added if new. Races without a location are left unlinked.
+    Caller is responsible for committing.
+
+    Returns:
+        int: Number of races linked
+    """
+    db.flush()
+    races = db.query(Race).filter(Race.circuit_id.is_(None), Race.location.isnot(None))
+    if race_ids is not None:
+        races = races.filter(Race.id.in_(race_ids))
+
+    circuits = {}
+    assigned = 0
+    for race in races.order_by(Race.year, Race.id).all():
+        key = circuit_key(race.location)
+        if key not in circuits:
+            circuit = db.query(Circuit).filter(Circuit.circuit_key == key).first()
+            if circuit is None:
+                circuit = Circuit(circuit_key=key, name=race.location, country=race.country)
+                db.add(circuit)
+                db.flush()
+            circuits[key] = circuit.id
+        race.circuit_id = circuits[key]
+        assigned += 1
+    db.flush()
+    return assigned
+
+def refresh_stints(db, race_ids=None):
+    """
+    Rebuild the stints of the given races (default: every race) from their laps
+
+    One grouped query over the laps: a stint spans its first to last lap
+    number, and its tyre age at fit is the lowest tyre life in the stint
+    minus one (tyre life counts the lap being run). Laps without a stint
+    number are left out. Caller is responsible for committing.
+    """
+    db.flush()
+    stale = db.query(Stint)
+    stint_laps = select(
+        Lap.race_id,
+        Lap.driver_id,
+        func.min(Lap.team_id),
+        Lap.stint,
+        func.min(Lap.compound_id),
+        func.min(Lap.lap_number),
+        func.max(Lap.lap_number),
+        func.min(Lap.tyre_life) - 1
+    ).where(
+        Lap.stint.isnot(None)
+    ).group_by(Lap.race_id, Lap.driver_id, Lap.stint)
+    if race_ids is not None:
+        stale = stale.filter(Stint.race_id.in_(race_ids))
+        stint_laps = stint_laps.where(Lap.race_id.in_(race_ids))
+
+    stale.delete(synchronize_session=False)
+    db.execute(insert(Stint).from_select(
+        ["race_id", "driver_id", "team_id", "stint", "compound_id", "start_lap", "end_lap", "tyre_age_at_fit"],
+        stint_laps
+    ))
+
 def get_db():
     """Get database session (for later use)"""
     from sqlalchemy.orm import sessionmaker
@@ -127,10 +742,16 @@ def get_db():
     finally:
         db.close()
 
+if SHARD_DIR and __name__ != "__main__":
+    # Registers the session hooks that route lap queries to season shards
+    from models import shards  # noqa: E402,F401
+
 if __name__ == "__main__":
     # Test for database creation
     print("Creating database...")
     init_database()
+    for change in migrate_database():
+        print(f"Migrated: {change}")
     
     # Verify tables were created
     from sqlalchemy import inspect
@@ -0,0 +1,432 @@
+"""
+shards.py
+Optional per-season lap storage: one SQLite file per season
+
+With F1_SHARD_DIR set, laps are stored in <F1_SHARD_DIR>/laps_<year>.db
+instead of the main database, which keeps races, drivers, results and
+dataset versions. Every SessionLocal session is routed when its
+transaction begins: the shards it needs are ATTACHed to the pooled
+connection and a TEMP VIEW named laps selects from them, so the existing
+ORM queries on Lap read only the routed seasons. A one-season view is
+flattened by SQLite and uses the shard's own indexes. Sessions routed to
+no season or race attach every shard, but only once a statement reads
+laps; at most MAX_ATTACHED fit on a connection, so queries across more
+seasons run in batches (see season_batches).
+
+Read routes attach shards read-only; seasons before
+F1_SHARD_IMMUTABLE_BEFORE are attached with immutable=1, which skips file
+locking and change detection, so those files must not be rewritten while
+the API is running. Write routes attach a single shard read-write with no
+view: inserts and deletes resolve to that file, and loading or reloading
+a season touches only its shard and the small tables in the main file.
+
+Lap ids are unique within a shard; laps moved by split keep their ids.
+A view over several seasons exposes id * 10000 + season instead, so the
+ORM never takes laps of two shards for the same row.
+
+    F1_SHARD_DIR=data/seasons python backend/models/shards.py split
+    F1_SHARD_DIR=data/seasons python backend/models/shards.py status
+"""
+
+import argparse
+import os
+import re
+import sys
+from urllib.parse import quote
+
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import Pool
+
+# Add backend to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.database import (
+    Base, Compound, DATABASE_PATH, Lap, SessionLocal, SHARD_DIR, Team,
+    compact_laps, engine, migrate_database, pending_migrations, vacuum
+)
+
+ENABLED = SHARD_DIR is not None
+IMMUTABLE_BEFORE = int(os.environ.get("F1_SHARD_IMMUTABLE_BEFORE", "0")) or None
+# SQLite's default compile-time limit on attached databases
+MAX_ATTACHED = int(os.environ.get("F1_SHARD_MAX_ATTACHED", "10"))
+
+_SHARD_FILE = re.compile(r"^laps_(\d{4})\.db$")
+# Statements that may read the laps view (or a column labelled laps, which is harmless)
+_READS_LAPS = re.compile(r"\blaps\b", re.IGNORECASE)
+# Explicit column list: shards migrated at different times may order columns differently
+_COLUMNS = ", ".join(column.name for column in Lap.__table__.columns)
+
+
+def shard_path(season):
+    """Path of a season's shard file"""
+    return os.path.join(SHARD_DIR, f"laps_{season}.db")
+
+
+def shard_seasons():
+    """Seasons that have a shard file, ascending"""
+    if not ENABLED or not os.path.isdir(SHARD_DIR):
+        return []
+    matches = (_SHARD_FILE.match(name) for name in os.listdir(SHARD_DIR))
+    return sorted(int(match.group(1)) for match in matches if match)
+
+
+def create_shard(season):
+    """
+    Create a season's shard, or bring it up to the current lap schema
+
+    Returns:
+        list: Descriptions of the changes made
+    """
+    os.makedirs(SHARD_DIR, exist_ok=True)
+    shard_engine = create_engine(f"sqlite:///{shard_path(season)}")
+    try:
+        changes = []
+        with shard_engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            has_laps = conn.exec_driver_sql(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'laps'"
+            ).first() is not None
+            if has_laps:
+                # Team and compound names go to the lookup tables in the main file
+                Base.metadata.create_all(bind=engine, tables=[Team.__table__, Compound.__table__])
+                conn.exec_driver_sql("ATTACH DATABASE ? AS lookups", (os.path.abspath(DATABASE_PATH),))
+                try:
+                    compacted = compact_laps(conn, lookups="lookups")
+                finally:
+                    conn.exec_driver_sql("DETACH DATABASE lookups")
+                if compacted is not None:
+                    changes.append(f"compacted {compacted} laps")
+        if changes:
+            vacuum(shard_engine)
+        return changes + migrate_database(bind=shard_engine, tables=[Lap.__table__])
+    finally:
+        shard_engine.dispose()
+
+
+def migrate_shards():
+    """Migrate every existing shard; a no-op unless sharding is enabled"""
+    changes = []
+    for season in shard_seasons():
+        changes.extend(f"shard {season}: {change}" for change in create_shard(season))
+    return changes
+
+
+def pending_shard_migrations():
+    """Describe what migrate_shards would change, without changing anything"""
+    pending = []
+    for season in shard_seasons():
+        shard_engine = create_engine(f"sqlite:///{shard_path(season)}")
+        try:
+            pending.extend(
+                f"shard {season}: {change}"
+                for change in pending_migrations(bind=shard_engine, tables=[Lap.__table__])
+            )
+        finally:
+            shard_engine.dispose()
+    return pending
+
+
+def route(db, season=None, race_id=None, write=False, seasons=None):
+    """
+    Route a session's lap queries to season shards
+
+    Takes effect when the session's next transaction begins, so call it
+    before the first query or right after a commit. Unrouted sessions read
+    every shard, attached when a statement first reads laps.
+
+    Args:
+        db: Session from SessionLocal
+        season: Season year
+        race_id: Race whose season to use when no season is given
+        write: Attach the season's shard read-write, creating it if needed
+        seasons: Several seasons to read, at most MAX_ATTACHED
+    """
+    if write and season is None:
+        raise ValueError("A write route needs a season")
+    db.info["shard_route"] = (season, race_id, write, tuple(seasons) if seasons is not None else None)
+
+
+def _default_season(request):
+    """Default of the endpoint's season query parameter, e.g. Query(2024)"""
+    endpoint = request.scope.get("route")
+    for param in getattr(getattr(endpoint, "dependant", None), "query_params", ()):
+        if param.name == "season" and isinstance(param.field_info.default, int):
+            return param.field_info.default
+    return None
+
+
+def route_request(db, request):
+    """Route an API session by its season query (or default) or race_id path parameter"""
+    season = request.query_params.get("season", "")
+    race_id = str(request.path_params.get("race_id", ""))
+    route(
+        db,
+        season=int(season) if season.isdigit() else _default_season(request),
+        race_id=int(race_id) if race_id.isdigit() else None
+    )
+
+
+def season_batches(db, seasons):
+    """
+    Route db to groups of seasons in turn, for queries across more seasons
+    than fit on one connection
+
+    Yields each group after routing db to it; queries on laps in the loop
+    body read that group only. Between groups the session's transaction is
+    rolled back, which expires loaded objects. The session is routed as
+    before once the loop finishes.
+
+    Args:
+        db: Session from SessionLocal, without pending changes
+        seasons: Season years
+    """
+    seasons = sorted(set(seasons))
+    if not ENABLED:
+        yield seasons
+        return
+    previous = db.info.get("shard_route")
+    try:
+        for start in range(0, len(seasons), MAX_ATTACHED):
+            db.rollback()
+            route(db, seasons=seasons[start:start + MAX_ATTACHED])
+            yield seasons[start:start + MAX_ATTACHED]
+    finally:
+        db.rollback()
+        if previous is None:
+            db.info.pop("shard_route", None)
+        else:
+            db.info["shard_route"] = previous
+
+
+def _read_mode(season):
+    return "immutable" if IMMUTABLE_BEFORE and season < IMMUTABLE_BEFORE else "ro"
+
+
+def _attach(connection, state, season, mode):
+    path = os.path.abspath(shard_path(season))
+    if mode != "rw":
+        path = f"file:{quote(path)}?mode=ro" + ("&immutable=1" if mode == "immutable" else "")
+    connection.exec_driver_sql(f"ATTACH DATABASE ? AS season_{season}", (path,))
+    state["attached"][season] = mode
+
+
+def _detach(connection, state, season):
+    connection.exec_driver_sql(f"DETACH DATABASE season_{season}")
+    del state["attached"][season]
+
+
+def _set_view(connection, state, seasons):
+    if state["view"] == seasons:
+        return
+    connection.exec_driver_sql("DROP VIEW IF EXISTS temp.laps")
+    state["view"] = None
+    if seasons is None:
+        return
+    columns = _COLUMNS
+    if len(seasons) > 1:
+        columns = ", ".join(
+            f"id * 10000 + {{season}} AS id" if column.name == "id" else column.name
+            for column in Lap.__table__.columns
+        )
+    selects = [f"SELECT {columns.format(season=season)} FROM season_{season}.laps" for season in seasons]
+    if not selects:
+        empty = ", ".join(f"NULL AS {column.name}" for column in Lap.__table__.columns)
+        selects = [f"SELECT {empty} WHERE 0"]
+    connection.exec_driver_sql(f"CREATE TEMP VIEW laps AS {' UNION ALL '.join(selects)}")
+    state["view"] = seasons
+
+
+def _route_write(connection, state, season):
+    if state["main_has_laps"]:
+        raise RuntimeError(
+            "The main database still has a laps table; run shards.py split before loading"
+        )
+    _set_view(connection, state, None)
+    for attached, mode in list(state["attached"].items()):
+        if attached != season or mode != "rw":
+            _detach(connection, state, attached)
+    if season not in state["attached"]:
+        if not os.path.exists(shard_path(season)):
+            create_shard(season)
+        _attach(connection, state, season, "rw")
+
+
+def _route_read(connection, state, seasons):
+    if len(seasons) > MAX_ATTACHED:
+        raise RuntimeError(
+            f"Query needs {len(seasons)} season shards but at most {MAX_ATTACHED} can be attached; "
+            "query them in season_batches"
+        )
+    for attached, mode in list(state["attached"].items()):
+        if mode != _read_mode(attached):
+            _detach(connection, state, attached)
+    missing = [season for season in seasons if season not in state["attached"]]
+    if len(state["attached"]) + len(missing) > MAX_ATTACHED:
+        # Make room, dropping the view first since it references them
+        _set_view(connection, state, None)
+        for attached in list(state["attached"]):
+            if attached not in seasons:
+                _detach(connection, state, attached)
+    for season in missing:
+        _attach(connection, state, season, _read_mode(season))
+    _set_view(connection, state, tuple(seasons))
+
+
+def _prepare(session, transaction, connection):
+    """Attach the routed shards to the connection before the first statement"""
+    season, race_id, write, seasons = session.info.get("shard_route", (None, None, False, None))
+    state = connection.connection.info.get("shards")
+    if state is None:
+        main_has_laps = connection.exec_driver_sql(
+            "SELECT 1 FROM main.sqlite_master WHERE type = 'table' AND name = 'laps'"
+        ).first() is not None
+        state = {"attached": {}, "view": None, "main_has_laps": main_has_laps}
+        connection.connection.info["shards"] = state
+    state["pending"] = False
+
+    if write:
+        _route_write(connection, state, season)
+        return
+
+    if season is None and race_id is not None:
+        season = connection.execute(
+            text("SELECT year FROM races WHERE id = :race_id"), {"race_id": race_id}
+        ).scalar()
+        # Unknown race: route to no shards, the endpoint answers 404
+        seasons = [season] if season is not None else []
+    elif season is not None:
+        seasons = [season]
+    elif seasons is None:
+        # Every shard, once a statement needs them (see _attach_pending)
+        state["pending"] = True
+        return
+    _route_read(connection, state, [s for s in seasons if os.path.exists(shard_path(s))])
+
+
+def _attach_pending(connection, cursor, statement, parameters, context, executemany):
+    """Attach every shard to an unrouted session's connection when it first reads laps"""
+    state = connection.info.get("shards")
+    if state is None or not state.get("pending") or not _READS_LAPS.search(statement):
+        return
+    state["pending"] = False
+    _route_read(connection, state, shard_seasons())
+
+
+def _clear_pending(dbapi_connection, connection_record):
+    state = connection_record.info.get("shards")
+    if state is not None:
+        state["pending"] = False
+
+
+# models.database imports this module when sharding is enabled; when run as
+# a script, that import is the copy that registers the hooks. The engine
+# and pool hooks are registered on the classes, so staging builds
+# (data_collection/staging.py) are routed too.
+if ENABLED and __name__ != "__main__":
+    event.listen(SessionLocal, "after_begin", _prepare)
+    event.listen(Engine, "before_cursor_execute", _attach_pending)
+    event.listen(Pool, "checkin", _clear_pending)
+
+
+def split():
+    """
+    Move the laps of a single-file database into per-season shards
+
+    Copies each season's laps (keeping their ids), checks the row counts,
+    then drops the laps table from the main database and vacuums it.
+
+    Returns:
+        dict: season -> laps moved
+    """
+    with engine.connect() as conn:
+        has_laps = conn.exec_driver_sql(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'laps'"
+        ).first() is not None
+        if not has_laps:
+            return {}
+    # Shards are created with the current schema; bring the source up to it
+    migrate_database(tables=[Lap.__table__])
+    with engine.connect() as conn:
+        seasons = conn.execute(text("SELECT DISTINCT year FROM races ORDER BY year")).scalars().all()
+
+    moved = {}
+    for season in seasons:
+        create_shard(season)
+        with engine.connect() as conn:
+            conn.exec_driver_sql("ATTACH DATABASE ? AS shard", (os.path.abspath(shard_path(season)),))
+            try:
+                season_laps = "FROM main.laps WHERE race_id IN (SELECT id FROM races WHERE year = ?)"
+                conn.exec_driver_sql("DELETE FROM shard.laps")
+                conn.exec_driver_sql(
+                    f"INSERT INTO shard.laps ({_COLUMNS}) SELECT {_COLUMNS} {season_laps}", (season,)
+                )
+                conn.commit()
+                expected = conn.exec_driver_sql(f"SELECT COUNT(*) {season_laps}", (season,)).scalar()
+                copied = conn.exec_driver_sql("SELECT COUNT(*) FROM shard.laps").scalar()
+                if copied != expected:
+                    raise RuntimeError(f"Season {season}: copied {copied} of {expected} laps")
+                conn.exec_driver_sql("ANALYZE shard")
+                conn.commit()
+            finally:
+                conn.exec_driver_sql("DETACH DATABASE shard")
+        moved[season] = copied
+        print(f"  {season}: {copied} laps -> {shard_path(season)}")
+
+    with engine.connect() as conn:
+        conn.exec_driver_sql("DROP TABLE laps")
+        conn.commit()
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.exec_driver_sql("VACUUM")
+    return moved
+
+
+def status():
+    """Shard files with their size, lap count and read mode"""
+    rows = []
+    for season in shard_seasons():
+        path = shard_path(season)
+        shard_engine = create_engine(f"sqlite:///{path}")
+        try:
+            with shard_engine.connect() as conn:
+                laps = conn.exec_driver_sql("SELECT COUNT(*) FROM laps").scalar()
+        finally:
+            shard_engine.dispose()
+        rows.append({
+            "season": season,
+            "path": path,
+            "bytes": os.path.getsize(path),
+            "laps": laps,
+            "mode": _read_mode(season)
+        })
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manage per-season lap shards")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("split", help="Move laps from the main database into season shards")
+    subparsers.add_parser("migrate", help="Bring every shard up to the current schema")
+    subparsers.add_parser("status", help="List shards")
+    args = parser.parse_args(argv)
+
+    if not ENABLED:
+        print("Set F1_SHARD_DIR to the directory holding the season shards")
+        return 2
+
+    if args.command == "split":
+        moved = split()
+        if not moved:
+            print("No laps table in the main database; nothing to split")
+        else:
+            print(f"Moved {sum(moved.values())} laps into {len(moved)} shards")
+    elif args.command == "migrate":
+        for change in migrate_shards():
+            print(f"Migrated: {change}")
+    else:
+        for row in status():
+            print(f"  {row['season']}  {row['laps']:9d} laps  {row['bytes'] / 1e6:8.1f} MB  {row['mode']:9s}  {row['path']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,213 @@
+"""
+admission.py
+Per-route concurrency limits with bounded wait queues
+
+Expensive routes are grouped into cost classes; each class (or a single
+route given its own limit) lets a fixed number of requests run at once
+and up to a fixed number wait on the event loop, without holding a
+worker thread. Requests beyond that, or that wait longer than
+F1_API_QUEUE_TIMEOUT seconds, get an immediate 503 with Retry-After, so
+a spike on heavy routes cannot take every worker thread from cheap ones.
+Routes in no class are never limited.
+
+F1_API_CONCURRENCY overrides the limits as comma-separated
+name=limit:queue entries, where name is a cost class or a route
+template, or disables admission control with "off":
+
+    F1_API_CONCURRENCY="heavy=4:8,/api/v1/races/{race_id}/laps=2:4"
+"""
+
+import asyncio
+import collections
+import math
+import os
+import time
+
+from starlette.routing import Match
+
+from services.metrics import Counter, Gauge, Histogram
+
+# Routes that fan out into many queries or return many rows
+ROUTE_CLASSES = {
+    "/api/v1/drivers/": "heavy",
+    "/api/v1/races/{race_id}/laps": "heavy",
+    "/api/v1/races/{race_id}/telemetry/{driver_code}/{lap_number}": "heavy",
+    "/api/v1/team/{team}/points-per-race": "heavy",
+    "/api/v1/teams/": "heavy",
+    "/api/v1/teams/head-to-head": "heavy",
+    "/api/v1/standings/progression": "heavy",
+    "/api/v1/circuits/{circuit}/history": "heavy",
+    "/api/v1/search/": "heavy",
+}
+
+# name -> (concurrent requests, waiting requests)
+DEFAULT_LIMITS = {
+    "heavy": (8, 16),
+}
+
+QUEUE_TIMEOUT = float(os.environ.get("F1_API_QUEUE_TIMEOUT", "5"))
+
+ADMISSION_IN_FLIGHT = Gauge(
+    "f1_api_admission_in_flight",
+    "Requests running under a concurrency limit",
+    labels=("limiter",),
+)
+ADMISSION_QUEUE_DEPTH = Gauge(
+    "f1_api_admission_queue_depth",
+    "Requests waiting for a concurrency slot",
+    labels=("limiter",),
+)
+ADMISSION_REJECTED = Counter(
+    "f1_api_admission_rejected_total",
+    "Requests rejected with 503 by admission control",
+    labels=("limiter", "reason"),
+)
+ADMISSION_WAIT = Histogram(
+    "f1_api_admission_wait_seconds",
+    "Time admitted requests waited for a concurrency slot",
+    labels=("limiter",),
+)
+
+
+def parse_limits(spec):
+    """
+    Parse an F1_API_CONCURRENCY value
+
+    Returns:
+        dict: name -> (limit, queue), or None if admission control is off
+    """
+    limits = dict(DEFAULT_LIMITS)
+    spec = (spec or "").strip()
+    if spec.lower() == "off":
+        return None
+    for entry in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, value = entry.rpartition("=")
+        limit, _, queue = value.partition(":")
+        if not name or not limit.isdigit() or not (queue or "0").isdigit() or int(limit) < 1:
+            raise ValueError(f"Invalid F1_API_CONCURRENCY entry {entry!r}; expected name=limit:queue")
+        limits[name] = (int(limit), int(queue or 0))
+    return limits
+
+
+class Limiter:
+    """Concurrency limit with a bounded FIFO of waiters, used on one event loop"""
+
+    def __init__(self, name, limit, queue):
+        self.name = name
+        self.limit = limit
+        self.queue = queue
+        self.active = 0
+        self._waiters = collections.deque()
+        # Smoothed time a request holds a slot, for Retry-After
+        self._hold_seconds = 0.1
+
+    @property
+    def waiting(self):
+        return len(self._waiters)
+
+    def retry_after(self):
+        """Seconds until a slot is likely free, rounded up"""
+        return max(1, math.ceil(self._hold_seconds * (self.waiting + 1) / self.limit))
+
+    async def acquire(self, timeout):
+        """
+        Take a slot, waiting in line if needed
+
+        Returns:
+            str: None if acquired, else the rejection reason
+        """
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            return None
+        if len(self._waiters) >= self.queue:
+            return "queue_full"
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        ADMISSION_QUEUE_DEPTH.set(self.waiting, limiter=self.name)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), timeout)
+            return None
+        except asyncio.TimeoutError:
+            if waiter.done():
+                # Handed a slot just as the wait timed out
+                return None
+            return "timeout"
+        except asyncio.CancelledError:
+            # Client went away; pass on a slot handed to it meanwhile
+            if waiter.done():
+                self.release(0.0)
+            raise
+        finally:
+            if not waiter.done():
+                waiter.cancel()
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+            ADMISSION_QUEUE_DEPTH.set(self.waiting, limiter=self.name)
+
+    def release(self, held_seconds):
+        """Give the slot to the next waiter, or free it"""
+        self._hold_seconds += 0.2 * (held_seconds - self._hold_seconds)
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                # The slot passes straight to the waiter; active is unchanged
+                waiter.set_result(True)
+                return
+        self.active -= 1
+
+
+def _match_route(app, scope):
+    for route in app.router.routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return route
+    return None
+
+
+def install(app, spec=None):
+    """
+    Register the admission control middleware on a FastAPI app
+
+    Register it before the request accounting middleware, so rejected
+    requests still show up in the latency metrics under their route.
+    """
+    from fastapi.responses import JSONResponse
+
+    limits = parse_limits(os.environ.get("F1_API_CONCURRENCY") if spec is None else spec)
+    if limits is None:
+        return {}
+    limiters = {name: Limiter(name, limit, queue) for name, (limit, queue) in limits.items()}
+
+    def limiter_for(template):
+        return limiters.get(template) or limiters.get(ROUTE_CLASSES.get(template))
+
+    @app.middleware("http")
+    async def _admit_request(request, call_next):
+        route = _match_route(app, request.scope)
+        limiter = limiter_for(route.path) if route is not None else None
+        if limiter is None:
+            return await call_next(request)
+        # Lets the accounting middleware label rejected requests by route
+        request.scope.setdefault("route", route)
+
+        start = time.perf_counter()
+        reason = await limiter.acquire(QUEUE_TIMEOUT)
+        if reason is not None:
+            ADMISSION_REJECTED.inc(limiter=limiter.name, reason=reason)
+            return JSONResponse(
+                {"detail": f"Server busy ({limiter.name} requests), retry shortly"},
+                status_code=503,
+                headers={"Retry-After": str(limiter.retry_after())}
+            )
+
+        admitted = time.perf_counter()
+        ADMISSION_WAIT.observe(admitted - start, limiter=limiter.name)
+        ADMISSION_IN_FLIGHT.set(limiter.active, limiter=limiter.name)
+        try:
+            return await call_next(request)
+        finally:
+            limiter.release(time.perf_counter() - admitted)
+            ADMISSION_IN_FLIGHT.set(limiter.active, limiter=limiter.name)
+
+    return limiters
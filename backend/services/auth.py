@@ -0,0 +1,25 @@
+"""
+auth.py
+Shared-secret check for admin-only API features
+"""
+
+import hmac
+import os
+
+from fastapi import Header, HTTPException
+
+# Admin features are disabled unless a token is configured
+ADMIN_TOKEN = os.environ.get("F1_ADMIN_TOKEN")
+
+
+def is_admin_token(token):
+    """Check a presented token against F1_ADMIN_TOKEN"""
+    if not ADMIN_TOKEN or not token:
+        return False
+    return hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode())
+
+
+def require_admin(x_admin_token: str = Header(None)):
+    """Dependency rejecting requests without a valid X-Admin-Token header"""
+    if not is_admin_token(x_admin_token):
+        raise HTTPException(status_code=403, detail="Admin token required")
@@ -0,0 +1,90 @@
+"""
+cache.py
+In-process cache for computed API payloads
+
+Entries are tagged with the version counter of the scope they depend on
+(a race, a season or the whole dataset). The pipeline bumps those
+counters after every load, so a stale entry is simply recomputed on the
+next read.
+"""
+
+import threading
+from collections import OrderedDict
+import sys
+import os
+
+# Add backend to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.database import DatasetVersion
+
+MAX_ENTRIES = 512
+# F1_API_CACHE=0 computes every payload afresh (for debugging and benchmarks)
+ENABLED = os.environ.get("F1_API_CACHE", "1") != "0"
+
+_entries = OrderedDict()
+_lock = threading.Lock()
+
+
+def _scope_for(race_id=None, season=None):
+    if race_id is not None:
+        return f"race:{race_id}"
+    if season is not None:
+        return f"season:{season}"
+    return "dataset"
+
+
+def get_version(db, race_id=None, season=None):
+    """Return the current change counter for a scope (0 if never loaded)"""
+    version = db.query(DatasetVersion.version).filter(
+        DatasetVersion.scope == _scope_for(race_id, season)
+    ).scalar()
+    return version or 0
+
+
+def get_or_compute(db, key, compute, race_id=None, season=None):
+    """
+    Return a cached value or compute and store it
+
+    Args:
+        db: Database session used to read the scope version
+        key: Hashable cache key (usually endpoint name + parameters)
+        compute: Zero-argument callable producing the value
+        race_id: Scope the entry to a single race
+        season: Scope the entry to a season (ignored if race_id is given)
+    """
+    if not ENABLED:
+        return compute()
+
+    scope = _scope_for(race_id, season)
+    version = get_version(db, race_id, season)
+    cache_key = (scope, key)
+
+    with _lock:
+        entry = _entries.get(cache_key)
+        if entry is not None and entry[0] == version:
+            _entries.move_to_end(cache_key)
+            return entry[1]
+
+    value = compute()
+
+    with _lock:
+        _entries[cache_key] = (version, value)
+        _entries.move_to_end(cache_key)
+        while len(_entries) > MAX_ENTRIES:
+            _entries.popitem(last=False)
+
+    return value
+
+
+def invalidate(race_id=None, season=None):
+    """
+    Drop cached entries for a scope, or everything when no scope is given
+    """
+    with _lock:
+        if race_id is None and season is None:
+            _entries.clear()
+            return
+        scope = _scope_for(race_id, season)
+        for cache_key in [k for k in _entries if k[0] == scope]:
+            del _entries[cache_key]
@@ -0,0 +1,120 @@
+"""
+coalesce.py
+Single-flight execution of identical concurrent API requests
+
+Concurrent calls to a decorated endpoint with the same parameters share
+one execution: the first caller runs the handler and the others wait for
+it and receive the same result (or exception). Nothing is kept once the
+execution finishes, so this is independent of the payload cache and
+never serves a result computed before the request arrived.
+
+The database session and request objects FastAPI injects are not part of
+the key; followers simply do not use theirs.
+"""
+
+import asyncio
+import functools
+import inspect
+import threading
+
+from fastapi import Request, Response
+from sqlalchemy.orm import Session
+
+from services.metrics import Counter
+
+COALESCED = Counter(
+    "f1_api_coalesced_total",
+    "Handler executions saved by joining an identical in-flight request",
+    labels=("endpoint",),
+)
+EXECUTIONS = Counter(
+    "f1_api_coalesce_executions_total",
+    "Handler executions run by single-flight endpoints",
+    labels=("endpoint",),
+)
+
+_IGNORED_TYPES = (Session, Request, Response)
+
+
+def _hashable(value):
+    if isinstance(value, (list, tuple, set)):
+        return tuple(_hashable(item) for item in value)
+    if isinstance(value, dict):
+        return tuple(sorted((k, _hashable(v)) for k, v in value.items()))
+    return value
+
+
+def _key(func, args, kwargs):
+    params = tuple(sorted(
+        (name, _hashable(value)) for name, value in kwargs.items()
+        if not isinstance(value, _IGNORED_TYPES)
+    ))
+    positional = tuple(_hashable(value) for value in args if not isinstance(value, _IGNORED_TYPES))
+    return (func.__module__, func.__qualname__, positional, params)
+
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+def coalesce(func):
+    """Decorate a sync or async endpoint so identical concurrent calls run it once"""
+    name = func.__name__
+
+    if inspect.iscoroutinefunction(func):
+        tasks = {}
+
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            # Tasks can only be awaited on the loop that runs them
+            key = (id(asyncio.get_running_loop()), _key(func, args, kwargs))
+            task = tasks.get(key)
+            if task is None:
+                EXECUTIONS.inc(endpoint=name)
+                task = asyncio.ensure_future(func(*args, **kwargs))
+                tasks[key] = task
+                task.add_done_callback(lambda _: tasks.pop(key, None))
+            else:
+                COALESCED.inc(endpoint=name)
+            # Shielded: a caller going away does not cancel the shared execution
+            return await asyncio.shield(task)
+
+        return async_wrapper
+
+    calls = {}
+    lock = threading.Lock()
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        key = _key(func, args, kwargs)
+        with lock:
+            call = calls.get(key)
+            leader = call is None
+            if leader:
+                call = calls[key] = _Call()
+
+        if not leader:
+            COALESCED.inc(endpoint=name)
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        EXECUTIONS.inc(endpoint=name)
+        try:
+            call.result = func(*args, **kwargs)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with lock:
+                del calls[key]
+            call.done.set()
+
+    return wrapper
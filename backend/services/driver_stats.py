@@ -0,0 +1,98 @@
+"""
+driver_stats.py
+Season statistics for drivers computed with grouped SQL
+
+Returns the same figures the driver endpoints used to compute in Python
+from hydrated Result and Lap objects, but only one aggregate row per
+driver leaves the database.
+"""
+
+from sqlalchemy import Integer, and_, case, cast, func, or_
+
+from models.database import Race, Lap, Result
+from services import lap_engine
+
+
+def _empty_stats():
+    return {
+        "races_entered": 0,
+        "total_points": 0,
+        "average_finish_position": None,
+        "wins": 0,
+        "podiums": 0,
+        "total_laps": 0
+    }
+
+
+def season_driver_stats(db, driver_ids, season):
+    """
+    Compute season statistics for several drivers at once
+
+    Points include sprints; races entered, finishing positions, wins and
+    podiums count main races only. Non-numeric classified positions
+    (D, E, W, ...) are ignored, as are laps without a lap time.
+
+    Args:
+        db: Database session
+        driver_ids: Driver database IDs
+        season: Season year
+
+    Returns:
+        dict: driver_id -> stats dict
+    """
+    driver_ids = list(driver_ids)
+    stats = {driver_id: _empty_stats() for driver_id in driver_ids}
+    if not driver_ids:
+        return stats
+
+    is_race = or_(Result.session_type == 'R', Result.session_type.is_(None))
+    finish = case(
+        (and_(is_race, func.typeof(Result.position).in_(("integer", "real"))),
+         cast(Result.position, Integer))
+    )
+
+    result_rows = db.query(
+        Result.driver_id,
+        func.sum(Result.points),
+        func.count(case((is_race, 1))),
+        func.avg(finish),
+        func.count(case((finish == 1, 1))),
+        func.count(case((finish <= 3, 1)))
+    ).join(
+        Race, Result.race_id == Race.id
+    ).filter(
+        Race.year == season,
+        Result.driver_id.in_(driver_ids)
+    ).group_by(Result.driver_id).all()
+
+    for driver_id, total_points, races_entered, avg_finish, wins, podiums in result_rows:
+        stats[driver_id].update({
+            "races_entered": races_entered,
+            "total_points": round(total_points, 1) if total_points else 0,
+            "average_finish_position": round(avg_finish, 2) if avg_finish else None,
+            "wins": wins,
+            "podiums": podiums
+        })
+
+    if lap_engine.ENABLED:
+        season_laps = lap_engine.get_season(db, season)
+        for driver_id in driver_ids:
+            stats[driver_id]["total_laps"] = season_laps.count(
+                season_laps.mask(driver_id=driver_id, timed=True)
+            )
+    else:
+        lap_rows = db.query(
+            Lap.driver_id,
+            func.count(Lap.id)
+        ).join(
+            Race, Lap.race_id == Race.id
+        ).filter(
+            Race.year == season,
+            Lap.driver_id.in_(driver_ids),
+            Lap.lap_time_seconds.isnot(None)
+        ).group_by(Lap.driver_id).all()
+
+        for driver_id, total_laps in lap_rows:
+            stats[driver_id]["total_laps"] = total_laps
+
+    return stats
@@ -0,0 +1,168 @@
+"""
+instrumentation.py
+Per-request SQL accounting and request latency metrics
+
+SQLAlchemy engine events count statements and SQL time; a counting
+DBAPI cursor counts fetched rows. Totals are kept in a context variable
+for the duration of each HTTP request.
+"""
+
+import contextlib
+import contextvars
+import logging
+import os
+import sqlite3
+import time
+
+from sqlalchemy import event
+
+from services.metrics import Counter, Histogram
+
+# Expose per-request SQL totals as X-SQL-* response headers
+DEBUG = os.environ.get("F1_API_DEBUG", "") == "1"
+# Log a warning when a single request issues more statements than this
+QUERY_WARN_THRESHOLD = int(os.environ.get("F1_QUERY_WARN_THRESHOLD", "50"))
+
+logger = logging.getLogger(__name__)
+
+REQUEST_LATENCY = Histogram(
+    "f1_api_request_duration_seconds",
+    "HTTP request latency by route",
+    labels=("method", "route", "status"),
+)
+REQUEST_SQL_QUERIES = Histogram(
+    "f1_api_request_sql_queries",
+    "SQL statements executed per request",
+    labels=("method", "route"),
+    buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500),
+)
+REQUEST_SQL_TIME = Histogram(
+    "f1_api_request_sql_duration_seconds",
+    "Total SQL time per request",
+    labels=("method", "route"),
+)
+SQL_ROWS_FETCHED = Counter(
+    "f1_api_sql_rows_fetched_total",
+    "Rows fetched from the database",
+    labels=("method", "route"),
+)
+
+
+class RequestStats:
+    """SQL totals for one request"""
+
+    __slots__ = ("queries", "sql_time", "rows")
+
+    def __init__(self):
+        self.queries = 0
+        self.sql_time = 0.0
+        self.rows = 0
+
+
+_current = contextvars.ContextVar("f1_request_stats", default=None)
+
+
+def current_stats():
+    """Return the stats object of the request being served, if any"""
+    return _current.get()
+
+
+@contextlib.contextmanager
+def track_sql():
+    """Collect SQL totals for a block of code outside a request"""
+    stats = RequestStats()
+    token = _current.set(stats)
+    try:
+        yield stats
+    finally:
+        _current.reset(token)
+
+
+class _CountingCursor(sqlite3.Cursor):
+    def _count(self, rows):
+        stats = _current.get()
+        if stats is not None:
+            stats.rows += len(rows)
+        return rows
+
+    def fetchone(self):
+        row = super().fetchone()
+        if row is not None:
+            stats = _current.get()
+            if stats is not None:
+                stats.rows += 1
+        return row
+
+    def fetchmany(self, *args, **kwargs):
+        return self._count(super().fetchmany(*args, **kwargs))
+
+    def fetchall(self):
+        return self._count(super().fetchall())
+
+
+class _CountingConnection(sqlite3.Connection):
+    def cursor(self, factory=_CountingCursor):
+        return super().cursor(factory)
+
+
+def instrument_engine(engine):
+    """Attach query counting hooks to an engine (call before first connect)"""
+
+    @event.listens_for(engine, "do_connect")
+    def _use_counting_connection(dialect, conn_rec, cargs, cparams):
+        if engine.dialect.name == "sqlite":
+            cparams.setdefault("factory", _CountingConnection)
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_start"].pop()
+        stats = _current.get()
+        if stats is not None:
+            stats.queries += 1
+            stats.sql_time += elapsed
+
+
+def _route_template(request):
+    route = request.scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
+def install(app):
+    """Register the request accounting middleware on a FastAPI app"""
+
+    @app.middleware("http")
+    async def _account_request(request, call_next):
+        stats = RequestStats()
+        token = _current.set(stats)
+        start = time.perf_counter()
+        try:
+            response = await call_next(request)
+        finally:
+            _current.reset(token)
+        elapsed = time.perf_counter() - start
+
+        route = _route_template(request)
+        method = request.method
+        REQUEST_LATENCY.observe(elapsed, method=method, route=route, status=response.status_code)
+        REQUEST_SQL_QUERIES.observe(stats.queries, method=method, route=route)
+        REQUEST_SQL_TIME.observe(stats.sql_time, method=method, route=route)
+        SQL_ROWS_FETCHED.inc(stats.rows, method=method, route=route)
+
+        if stats.queries > QUERY_WARN_THRESHOLD:
+            logger.warning(
+                "%s %s issued %d SQL queries (threshold %d, %.1f ms SQL, %d rows)",
+                method, request.url.path, stats.queries, QUERY_WARN_THRESHOLD,
+                stats.sql_time * 1000, stats.rows
+            )
+
+        if DEBUG:
+            response.headers["X-SQL-Queries"] = str(stats.queries)
+            response.headers["X-SQL-Time-Ms"] = f"{stats.sql_time * 1000:.2f}"
+            response.headers["X-SQL-Rows"] = str(stats.rows)
+            response.headers["X-Response-Time-Ms"] = f"{elapsed * 1000:.2f}"
+
+        return response
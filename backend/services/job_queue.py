@@ -0,0 +1,350 @@
+"""
+job_queue.py
+Persistent ETL job queue with lease-based claiming
+
+Jobs are rows of the jobs table in the main database, one (season, event)
+load each. A worker claims the oldest available job with a
+compare-and-set UPDATE, so workers in other processes or on other hosts
+sharing the database never hold the same job, and keeps it by renewing a
+short lease while the load runs. A job whose lease runs out (its worker
+died) can be claimed again. Every claim counts as an attempt; failed
+attempts are retried after an exponential backoff, and a job that fails
+or is abandoned max_attempts times stays failed.
+
+Configuration:
+    F1_JOB_LEASE_SECONDS  lease length (default: 120)
+    F1_JOB_MAX_ATTEMPTS   attempts per job (default: 3)
+    F1_JOB_RETRY_DELAY    seconds before the first retry, doubled per attempt (default: 30)
+"""
+
+import os
+import sys
+from datetime import datetime, timedelta
+
+from sqlalchemy import and_, func, or_
+from sqlalchemy.exc import IntegrityError
+
+# Add backend to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.database import Job
+
+LEASE_SECONDS = int(os.environ.get("F1_JOB_LEASE_SECONDS", "120"))
+MAX_ATTEMPTS = int(os.environ.get("F1_JOB_MAX_ATTEMPTS", "3"))
+RETRY_DELAY = int(os.environ.get("F1_JOB_RETRY_DELAY", "30"))
+
+STATUSES = ("queued", "running", "succeeded", "failed", "cancelled")
+# A (season, event) with a job in one of these is not queued again
+ACTIVE = ("queued", "running")
+
+
+def _now():
+    return datetime.utcnow()
+
+
+def _active_for(year, event):
+    """Queued or running jobs of a (season, event); event None is the whole season"""
+    return and_(
+        Job.year == year,
+        Job.event == event if event is not None else Job.event.is_(None),
+        Job.status.in_(ACTIVE)
+    )
+
+
+def _lease_end(now, lease_seconds=None):
+    return now + timedelta(seconds=LEASE_SECONDS if lease_seconds is None else lease_seconds)
+
+
+def _claimable(now):
+    """Queued jobs past their backoff, and running jobs whose lease ran out"""
+    return or_(
+        and_(Job.status == "queued", Job.available_at <= now),
+        and_(Job.status == "running", Job.lease_expires_at < now, Job.attempts < Job.max_attempts)
+    )
+
+
+def submit(db, year, events=None, telemetry=False, max_attempts=None):
+    """
+    Queue loads for a season's events
+
+    An event that already has a queued or running job keeps that job
+    instead of getting a second one; ix_jobs_active_event enforces this
+    against concurrent submits. Event names are compared as given, so
+    resolve them against the schedule first (fastf1_cache.resolve_events).
+
+    Args:
+        db: Database session
+        year (int): Season year
+        events (list): Event names, or None for one job covering the whole
+            season (the worker expands it into a job per event)
+        telemetry (bool): Also store per-lap car telemetry
+        max_attempts (int): Attempts before the job stays failed (default: MAX_ATTEMPTS)
+
+    Returns:
+        list: (job, created) per event
+    """
+    now = _now()
+    jobs = []
+    for event in events or [None]:
+        while True:
+            existing = db.query(Job).filter(_active_for(year, event)).order_by(Job.id).first()
+            if existing is not None:
+                jobs.append((existing, False))
+                break
+            job = Job(
+                year=year,
+                event=event,
+                telemetry=telemetry,
+                status="queued",
+                attempts=0,
+                max_attempts=max_attempts or MAX_ATTEMPTS,
+                available_at=now,
+                created_at=now
+            )
+            db.add(job)
+            try:
+                db.commit()
+            except IntegrityError:
+                # Another submit queued it since the check; return that job
+                db.rollback()
+                continue
+            jobs.append((job, True))
+            break
+    return jobs
+
+
+def claim(db, worker, lease_seconds=None):
+    """
+    Take the next available job under a lease
+
+    Jobs abandoned on their last attempt are marked failed first.
+
+    Args:
+        db: Database session
+        worker (str): Worker name, stored as the lease owner
+        lease_seconds (int): Lease length (default: LEASE_SECONDS)
+
+    Returns:
+        Job: The claimed job, or None if none is available
+    """
+    now = _now()
+    db.query(Job).filter(
+        Job.status == "running",
+        Job.lease_expires_at < now,
+        Job.attempts >= Job.max_attempts
+    ).update({
+        "status": "failed",
+        "finished_at": now,
+        "lease_owner": None,
+        "lease_expires_at": None,
+        "last_error": "Lease expired on the last attempt (worker stopped or lost)"
+    }, synchronize_session=False)
+    db.commit()
+
+    candidates = db.query(Job.id).filter(
+        _claimable(now)
+    ).order_by(Job.available_at, Job.id).limit(8).all()
+    for (job_id,) in candidates:
+        # Another worker may have taken it since the select
+        claimed = db.query(Job).filter(
+            Job.id == job_id,
+            _claimable(now)
+        ).update({
+            "status": "running",
+            "attempts": Job.attempts + 1,
+            "lease_owner": worker,
+            "lease_expires_at": _lease_end(now, lease_seconds),
+            "started_at": now,
+            "finished_at": None
+        }, synchronize_session=False)
+        db.commit()
+        if claimed:
+            return db.get(Job, job_id)
+    return None
+
+
+def _owned(db, job_id, worker):
+    return db.query(Job).filter(
+        Job.id == job_id,
+        Job.status == "running",
+        Job.lease_owner == worker
+    )
+
+
+def renew(db, job_id, worker, lease_seconds=None):
+    """
+    Extend a held lease
+
+    Returns:
+        bool: False if the worker no longer holds the job
+    """
+    renewed = _owned(db, job_id, worker).update({
+        "lease_expires_at": _lease_end(_now(), lease_seconds)
+    }, synchronize_session=False)
+    db.commit()
+    return renewed == 1
+
+
+def complete(db, job_id, worker):
+    """
+    Mark a held job succeeded
+
+    Returns:
+        bool: False if the worker no longer held the job
+    """
+    completed = _owned(db, job_id, worker).update({
+        "status": "succeeded",
+        "finished_at": _now(),
+        "lease_owner": None,
+        "lease_expires_at": None,
+        "last_error": None
+    }, synchronize_session=False)
+    db.commit()
+    return completed == 1
+
+
+def fail(db, job_id, worker, error):
+    """
+    Record a failed attempt of a held job
+
+    The job is queued again after RETRY_DELAY * 2^(attempts - 1) seconds,
+    or stays failed once it has used max_attempts.
+
+    Returns:
+        str: The job's new status, or None if the worker no longer held it
+    """
+    job = _owned(db, job_id, worker).first()
+    if job is None:
+        return None
+    now = _now()
+    job.last_error = error
+    job.lease_owner = None
+    job.lease_expires_at = None
+    if job.attempts < job.max_attempts:
+        job.status = "queued"
+        job.available_at = now + timedelta(seconds=RETRY_DELAY * 2 ** (job.attempts - 1))
+    else:
+        job.status = "failed"
+        job.finished_at = now
+    db.commit()
+    return job.status
+
+
+def retry(db, job_id):
+    """
+    Queue a failed or cancelled job again with fresh attempts
+
+    Returns:
+        Job: The job, or None if it does not exist, is not failed or
+        cancelled, or its event has been queued again since
+    """
+    job = db.get(Job, job_id)
+    if job is None or job.status not in ("failed", "cancelled"):
+        return None
+    if db.query(Job.id).filter(_active_for(job.year, job.event)).first() is not None:
+        return None
+    job.status = "queued"
+    job.attempts = 0
+    job.available_at = _now()
+    job.finished_at = None
+    try:
+        db.commit()
+    except IntegrityError:
+        # Queued again by a concurrent submit or retry
+        db.rollback()
+        return None
+    return job
+
+
+def cancel(db, job_id):
+    """
+    Cancel a queued job (a running load cannot be interrupted)
+
+    Returns:
+        Job: The job, or None if it does not exist or is not queued
+    """
+    cancelled = db.query(Job).filter(
+        Job.id == job_id,
+        Job.status == "queued"
+    ).update({"status": "cancelled", "finished_at": _now()}, synchronize_session=False)
+    db.commit()
+    return db.get(Job, job_id) if cancelled else None
+
+
+def job_dict(job):
+    """API representation of a job"""
+    def timestamp(value):
+        return value.isoformat() if value else None
+
+    duration = None
+    if job.started_at and job.finished_at and job.status in ("succeeded", "failed"):
+        duration = round((job.finished_at - job.started_at).total_seconds(), 1)
+    return {
+        "id": job.id,
+        "season": job.year,
+        "event": job.event,
+        "telemetry": job.telemetry,
+        "status": job.status,
+        "attempts": job.attempts,
+        "max_attempts": job.max_attempts,
+        "worker": job.lease_owner,
+        "lease_expires_at": timestamp(job.lease_expires_at),
+        "available_at": timestamp(job.available_at),
+        "created_at": timestamp(job.created_at),
+        "started_at": timestamp(job.started_at),
+        "finished_at": timestamp(job.finished_at),
+        "duration_seconds": duration,
+        "last_error": job.last_error
+    }
+
+
+def stats(db, window_minutes=60):
+    """
+    Queue depth, progress per season and recent throughput
+
+    Args:
+        db: Database session
+        window_minutes (int): Window for throughput and durations
+
+    Returns:
+        dict: Counts per status and per season, live workers, and the jobs
+        finished, jobs per hour and average load time within the window
+    """
+    now = _now()
+    since = now - timedelta(minutes=window_minutes)
+
+    counts = {status: 0 for status in STATUSES}
+    seasons = {}
+    for year, status, count in db.query(
+        Job.year, Job.status, func.count()
+    ).group_by(Job.year, Job.status).order_by(Job.year).all():
+        counts[status] = counts.get(status, 0) + count
+        seasons.setdefault(year, {"season": year, **{s: 0 for s in STATUSES}})[status] = count
+
+    workers = [owner for (owner,) in db.query(Job.lease_owner).filter(
+        Job.status == "running",
+        Job.lease_expires_at >= now
+    ).distinct().order_by(Job.lease_owner).all()]
+
+    finished = db.query(Job.status, Job.started_at, Job.finished_at).filter(
+        Job.finished_at >= since,
+        Job.status.in_(("succeeded", "failed"))
+    ).all()
+    succeeded = [
+        (finished_at - started_at).total_seconds()
+        for status, started_at, finished_at in finished
+        if status == "succeeded" and started_at is not None
+    ]
+    oldest_queued = db.query(func.min(Job.created_at)).filter(Job.status == "queued").scalar()
+
+    return {
+        "counts": counts,
+        "seasons": list(seasons.values()),
+        "workers": workers,
+        "oldest_queued_at": oldest_queued.isoformat() if oldest_queued else None,
+        "window_minutes": window_minutes,
+        "succeeded_in_window": len(succeeded),
+        "failed_in_window": len(finished) - len(succeeded),
+        "jobs_per_hour": round(len(succeeded) * 60 / window_minutes, 2),
+        "average_duration_seconds": round(sum(succeeded) / len(succeeded), 1) if succeeded else None
+    }
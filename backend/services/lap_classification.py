@@ -0,0 +1,55 @@
+"""
+lap_classification.py
+Guard for only_clean queries over laps loaded before lap classification
+
+Lap flags are computed at transform time from FastF1 columns that are not
+stored (track status, deletions, pit out times, timing accuracy), so laps
+loaded before classification keep lap_flags NULL until their race is
+loaded again. A clean-lap filter would silently skip them; endpoints call
+require_classified instead, so the answer is an explicit 409.
+"""
+
+import os
+import sys
+
+from fastapi import HTTPException
+
+# Add backend to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.database import Lap, Race
+
+
+def unclassified_races(db, season=None, race_id=None):
+    """Names of the season's races (or the race) with unclassified laps, from ix_laps_unclassified"""
+    laps = db.query(Lap.race_id).filter(Lap.is_unclassified())
+    if race_id is not None:
+        laps = laps.filter(Lap.race_id == race_id)
+    else:
+        laps = laps.filter(Lap.race_id.in_(db.query(Race.id).filter(Race.year == season)))
+    return [
+        race_name for (race_name,) in db.query(Race.race_name).filter(
+            Race.id.in_(laps.distinct())
+        ).order_by(Race.event_date, Race.id).all()
+    ]
+
+
+def require_classified(db, season=None, race_id=None):
+    """
+    Raise 409 if a season's (or a race's) laps are not all classified
+
+    Args:
+        db: Database session
+        season: Season year
+        race_id: Race ID, instead of a season
+    """
+    races = unclassified_races(db, season=season, race_id=race_id)
+    if races:
+        scope = f"race {race_id}" if race_id is not None else f"season {season}"
+        raise HTTPException(
+            status_code=409,
+            detail=(
+                f"only_clean needs classified laps, but laps of {scope} were loaded before lap "
+                f"classification ({', '.join(races)}); load those races again to classify them"
+            )
+        )
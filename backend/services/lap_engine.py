@@ -0,0 +1,252 @@
+"""
+lap_engine.py
+Optional in-memory columnar engine for season lap aggregations
+
+Each season's laps are held as NumPy arrays (struct of arrays): integer
+codes for driver, team and compound, float32 lap times and int16 lap
+number, tyre life, stint and lap flags. Lap-heavy endpoints answer filters,
+group-bys and top-N queries from memory instead of scanning SQLite.
+
+Lap times are stored with millisecond resolution, so values read back
+from float32 are rounded to 3 decimals and match the database exactly.
+A season is reloaded when its dataset version changes.
+
+Enable with F1_LAP_ENGINE=1.
+"""
+
+import os
+import threading
+
+import numpy as np
+
+from models.database import Race, Lap, Team, Compound
+from services import cache
+from services.metrics import Gauge
+
+ENABLED = os.environ.get("F1_LAP_ENGINE", "") == "1"
+
+MISSING = -1
+
+ENGINE_BYTES = Gauge(
+    "f1_lap_engine_bytes",
+    "Memory held by the in-memory lap engine",
+    labels=("season",),
+)
+ENGINE_ROWS = Gauge(
+    "f1_lap_engine_rows",
+    "Laps held by the in-memory lap engine",
+    labels=("season",),
+)
+
+
+def _encode(values):
+    """Dictionary-encode a column; None becomes MISSING"""
+    dictionary = sorted({v for v in values if v is not None})
+    lookup = {value: code for code, value in enumerate(dictionary)}
+    codes = np.fromiter(
+        (lookup[v] if v is not None else MISSING for v in values),
+        dtype=np.int32,
+        count=len(values)
+    )
+    return dictionary, codes
+
+
+def _small_ints(values):
+    return np.fromiter(
+        (v if v is not None else MISSING for v in values),
+        dtype=np.int16,
+        count=len(values)
+    )
+
+
+def lap_seconds(values):
+    """Convert stored float32 lap times back to the millisecond values in the database"""
+    return np.round(np.asarray(values, dtype=np.float64), 3)
+
+
+class SeasonLaps:
+    """Column arrays for every lap of one season, ordered by lap id"""
+
+    def __init__(self, season, version, rows):
+        self.season = season
+        self.version = version
+
+        (lap_ids, race_ids, driver_ids, teams, compounds,
+         lap_times, lap_numbers, tyre_lives, stints, lap_flags) = zip(*rows) if rows else ([],) * 10
+
+        self.lap_id = np.asarray(lap_ids, dtype=np.int32)
+        self.race_id = np.asarray(race_ids, dtype=np.int32)
+
+        self.drivers, driver_codes = _encode(driver_ids)
+        self.driver = driver_codes.astype(np.int16)
+        self.teams, team_codes = _encode(teams)
+        self.team = team_codes.astype(np.int16)
+        self.compounds, compound_codes = _encode(compounds)
+        self.compound = compound_codes.astype(np.int8)
+
+        self.lap_time = np.array(
+            [t if t is not None else np.nan for t in lap_times], dtype=np.float32
+        )
+        self.lap_number = _small_ints(lap_numbers)
+        self.tyre_life = _small_ints(tyre_lives)
+        self.stint = _small_ints(stints)
+        # Unclassified laps (NULL) become MISSING, so they never count as clean
+        self.flags = _small_ints(lap_flags)
+
+        self._driver_lookup = {value: code for code, value in enumerate(self.drivers)}
+        self._team_lookup = {value: code for code, value in enumerate(self.teams)}
+        self._compound_lookup = {value: code for code, value in enumerate(self.compounds)}
+
+    @property
+    def rows(self):
+        return len(self.lap_id)
+
+    @property
+    def nbytes(self):
+        return sum(
+            array.nbytes for array in (
+                self.lap_id, self.race_id, self.driver, self.team, self.compound,
+                self.lap_time, self.lap_number, self.tyre_life, self.stint, self.flags
+            )
+        )
+
+    def mask(self, driver_id=None, team=None, compound=None, race_id=None, timed=False, clean=False):
+        """
+        Boolean row filter
+
+        Args:
+            driver_id: Keep one driver (database ID)
+            team: Keep one team (Lap.team string)
+            compound: Keep one compound
+            race_id: Keep one race
+            timed: Keep only laps with a lap time
+            clean: Keep only laps without classification flags
+        """
+        selected = np.ones(self.rows, dtype=bool)
+        for value, lookup, column in (
+            (driver_id, self._driver_lookup, self.driver),
+            (team, self._team_lookup, self.team),
+            (compound, self._compound_lookup, self.compound),
+        ):
+            if value is not None:
+                code = lookup.get(value)
+                if code is None:
+                    return np.zeros(self.rows, dtype=bool)
+                selected &= column == code
+        if race_id is not None:
+            selected &= self.race_id == race_id
+        if timed:
+            selected &= ~np.isnan(self.lap_time)
+        if clean:
+            selected &= self.flags == 0
+        return selected
+
+    def count(self, selected):
+        return int(np.count_nonzero(selected))
+
+    def mean_lap_time(self, selected):
+        """Average lap time of the selected rows, ignoring laps without a time"""
+        times = lap_seconds(self.lap_time[selected & ~np.isnan(self.lap_time)])
+        return float(times.mean()) if len(times) else None
+
+    def distinct_driver_ids(self, selected):
+        return [int(self.drivers[code]) for code in np.unique(self.driver[selected])]
+
+    def group_by(self, key, selected=None):
+        """
+        Lap count and mean lap time per driver, team or compound
+
+        Returns:
+            dict: key value -> (laps, timed laps, mean lap time or None)
+        """
+        column, dictionary = {
+            "driver": (self.driver, self.drivers),
+            "team": (self.team, self.teams),
+            "compound": (self.compound, self.compounds),
+        }[key]
+        if selected is None:
+            selected = np.ones(self.rows, dtype=bool)
+        codes = column[selected].astype(np.int64)
+        times = lap_seconds(self.lap_time[selected])
+        timed = ~np.isnan(times)
+
+        # MISSING (-1) codes are shifted to slot 0
+        size = len(dictionary) + 1
+        laps = np.bincount(codes + 1, minlength=size)
+        timed_laps = np.bincount(codes[timed] + 1, minlength=size)
+        totals = np.bincount(codes[timed] + 1, weights=times[timed], minlength=size)
+
+        result = {}
+        for slot in np.nonzero(laps)[0]:
+            value = dictionary[slot - 1] if slot else None
+            mean = float(totals[slot] / timed_laps[slot]) if timed_laps[slot] else None
+            result[value] = (int(laps[slot]), int(timed_laps[slot]), mean)
+        return result
+
+    def fastest(self, limit, selected=None):
+        """
+        Row indices of the fastest timed laps, ties broken by lap id
+        (the same order as the SQL path)
+        """
+        if selected is None:
+            selected = np.ones(self.rows, dtype=bool)
+        rows = np.nonzero(selected & ~np.isnan(self.lap_time))[0]
+        order = np.lexsort((self.lap_id[rows], self.lap_time[rows]))
+        return rows[order[:limit]]
+
+
+_seasons = {}
+_lock = threading.Lock()
+
+
+def _load(db, season, version):
+    rows = db.query(
+        Lap.id,
+        Lap.race_id,
+        Lap.driver_id,
+        Team.name,
+        Compound.name,
+        Lap.lap_time_seconds,
+        Lap.lap_number,
+        Lap.tyre_life,
+        Lap.stint,
+        Lap.lap_flags
+    ).join(
+        Race, Lap.race_id == Race.id
+    ).join(
+        Team, Lap.team_id == Team.id
+    ).outerjoin(
+        Compound, Lap.compound_id == Compound.id
+    ).filter(
+        Race.year == season
+    ).order_by(Lap.id).all()
+    return SeasonLaps(season, version, rows)
+
+
+def get_season(db, season):
+    """Return the in-memory laps of a season, (re)loading them if stale"""
+    version = cache.get_version(db, season=season)
+    loaded = _seasons.get(season)
+    if loaded is not None and loaded.version == version:
+        return loaded
+
+    with _lock:
+        loaded = _seasons.get(season)
+        if loaded is None or loaded.version != version:
+            loaded = _load(db, season, version)
+            _seasons[season] = loaded
+            ENGINE_BYTES.set(loaded.nbytes, season=season)
+            ENGINE_ROWS.set(loaded.rows, season=season)
+        return loaded
+
+
+def memory_report():
+    """Rows and bytes held per loaded season"""
+    return {
+        season: {
+            "rows": loaded.rows,
+            "bytes": loaded.nbytes,
+            "version": loaded.version,
+        }
+        for season, loaded in sorted(_seasons.items())
+    }
@@ -0,0 +1,182 @@
+"""
+profiler.py
+Low-overhead sampling profiler producing collapsed (folded) stacks
+
+The output is one "frame;frame;frame count" line per unique stack, which
+flamegraph.pl, speedscope and inferno read directly.
+"""
+
+import contextvars
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+DEFAULT_INTERVAL = 0.005
+
+# Stacks whose innermost frame is in one of these files are idle threads
+# (thread pool workers waiting for work, the event loop in select, ...)
+_IDLE_FILES = {"threading.py", "queue.py", "selectors.py"}
+
+# (profiler, ids of the worker threads that joined it) of the request being
+# served; context variables follow the request into the worker threads that
+# run its dependencies and handler
+_active = contextvars.ContextVar("f1_request_profiler", default=None)
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    """
+    Periodically samples the Python stacks of running threads
+
+    Args:
+        interval: Seconds between samples
+        thread_ids: Only sample these threads (default: every thread); more
+            can be added to profiler.thread_ids while it runs
+    """
+
+    def __init__(self, interval=DEFAULT_INTERVAL, thread_ids=None):
+        self.interval = interval
+        self.thread_ids = set(thread_ids) if thread_ids is not None else None
+        self.samples = Counter()
+        self.sample_count = 0
+        self.duration = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+        self._started_at = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def start(self):
+        self._started_at = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.duration = time.perf_counter() - self._started_at
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            self.sample_count += 1
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                if self.thread_ids is not None and thread_id not in self.thread_ids:
+                    continue
+                if os.path.basename(frame.f_code.co_filename) in _IDLE_FILES:
+                    continue
+
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                self.samples[";".join(reversed(stack))] += 1
+
+    def collapsed(self):
+        """Return the profile in collapsed stack format"""
+        return "".join(
+            f"{stack} {count}\n"
+            for stack, count in self.samples.most_common()
+        )
+
+    def save(self, path):
+        """Write the collapsed stacks to a file"""
+        with open(path, "w") as f:
+            f.write(self.collapsed())
+        return path
+
+
+def _join_profile():
+    """Add the calling thread to the profile of the request it is serving, if any"""
+    active = _active.get()
+    if active is not None:
+        profiler, workers = active
+        thread_id = threading.get_ident()
+        if thread_id not in profiler.thread_ids:
+            workers.add(thread_id)
+            profiler.thread_ids.add(thread_id)
+
+
+def _profile_dependencies():
+    """Join the request's profile, and take its workers out of it at teardown"""
+    _join_profile()
+    try:
+        yield
+    finally:
+        active = _active.get()
+        if active is not None:
+            profiler, workers = active
+            profiler.thread_ids.difference_update(workers)
+            workers.clear()
+
+
+def install(app, path_prefix="/api/v1", engine=None):
+    """
+    Let admins profile a single API request with ?profile=1
+
+    The response body is replaced by the collapsed stacks of the request.
+    Sampled are the event loop thread for the whole request, and each
+    worker thread from the moment it runs one of the request's
+    dependencies or, with engine given, issues one of its SQL statements
+    (FastAPI may run the handler on a different worker than its
+    dependencies) until the dependencies are torn down after the handler.
+    The event loop is shared, and a worker can be handed another request
+    while this one waits, so profile on an otherwise idle server: stacks
+    of concurrent requests show up otherwise.
+
+    Only call this when profiling is enabled, and before the routers are
+    included; nothing is registered otherwise, so disabled profiling costs
+    nothing per request.
+    """
+    from fastapi import Depends
+    from fastapi.responses import JSONResponse, PlainTextResponse
+    from services.auth import is_admin_token
+
+    # Applies to every route included after this
+    app.router.dependencies.append(Depends(_profile_dependencies))
+    if engine is not None:
+        from sqlalchemy import event
+        event.listen(engine, "before_cursor_execute", lambda *_: _join_profile())
+
+    @app.middleware("http")
+    async def _profile_request(request, call_next):
+        if request.query_params.get("profile") != "1" or not request.url.path.startswith(path_prefix):
+            return await call_next(request)
+        if not is_admin_token(request.headers.get("x-admin-token")):
+            return JSONResponse({"detail": "Admin token required"}, status_code=403)
+
+        profiler = SamplingProfiler(thread_ids=[threading.get_ident()])
+        token = _active.set((profiler, set()))
+        try:
+            with profiler:
+                response = await call_next(request)
+                # Include serialization/streaming of the body in the profile
+                async for _ in response.body_iterator:
+                    pass
+        finally:
+            _active.reset(token)
+
+        filename = request.url.path.strip("/").replace("/", "_") or "root"
+        return PlainTextResponse(
+            profiler.collapsed(),
+            headers={
+                "Content-Disposition": f'attachment; filename="{filename}.folded"',
+                "X-Profile-Samples": str(profiler.sample_count),
+                "X-Profile-Duration-Ms": f"{profiler.duration * 1000:.2f}",
+                "X-Profiled-Status": str(response.status_code),
+            }
+        )
@@ -0,0 +1,247 @@
+"""
+search_index.py
+In-memory fuzzy search over drivers, teams and events
+
+The index is built from the database on first use (and at API startup)
+and rebuilt whenever the dataset version changes. Matching uses RapidFuzz
+over pre-processed alias strings, so lookups stay well under a
+millisecond for a full multi-season dataset.
+"""
+
+import threading
+
+from rapidfuzz import fuzz, process, utils
+
+from models.database import SessionLocal, Race, Driver, Lap, Result, Team
+from models import shards
+from services import cache
+
+ENTITY_TYPES = ("driver", "team", "race")
+
+# Aliases this short (driver codes, numbers, "RB") are compared as whole
+# strings; partial matching would make them match almost any query
+SHORT_ALIAS_LENGTH = 3
+
+# Minimum score for a tolerant lookup to accept a match
+RESOLVE_CUTOFF = 80
+
+TEAM_ALIASES = {
+    "Red Bull Racing": ["Red Bull", "RBR", "Oracle Red Bull Racing"],
+    "Ferrari": ["Scuderia Ferrari"],
+    "Mercedes": ["Mercedes-AMG", "Mercedes AMG Petronas"],
+    "Aston Martin": ["AMR", "Aston Martin Aramco"],
+    "Alpine": ["Alpine F1 Team", "BWT Alpine"],
+    "Williams": ["Williams Racing"],
+    "RB": ["Visa Cash App RB", "VCARB", "Racing Bulls"],
+    "Kick Sauber": ["Sauber", "Stake"],
+    "Haas F1 Team": ["Haas"],
+}
+
+# Successive names of the same entry, oldest first
+TEAM_LINEAGES = [
+    ["Toro Rosso", "AlphaTauri", "RB", "Racing Bulls"],
+    ["Force India", "Racing Point", "Aston Martin"],
+    ["Renault", "Alpine"],
+    ["Sauber", "Alfa Romeo Racing", "Alfa Romeo", "Kick Sauber"],
+]
+
+
+class SearchIndex:
+    """Alias lists per entity type, each alias pointing to an entity"""
+
+    def __init__(self, version):
+        self.version = version
+        self.entities = {entity_type: [] for entity_type in ENTITY_TYPES}
+        # (entity_type, is_short) -> processed aliases / owning entity positions
+        self._aliases = {}
+        self._owners = {}
+        self._lineage = {}
+        for group_index, group in enumerate(TEAM_LINEAGES):
+            for name in group:
+                self._lineage[name.lower()] = group_index
+
+    def add(self, entity_type, entity, aliases):
+        """Register an entity (a JSON-ready dict) under its aliases"""
+        position = len(self.entities[entity_type])
+        self.entities[entity_type].append(entity)
+        for alias in dict.fromkeys(a for a in aliases if a):
+            processed = utils.default_process(str(alias))
+            if processed:
+                key = (entity_type, len(processed) <= SHORT_ALIAS_LENGTH)
+                self._aliases.setdefault(key, []).append(processed)
+                self._owners.setdefault(key, []).append(position)
+
+    def search(self, query, types=None, season=None, limit=10, score_cutoff=75):
+        """
+        Fuzzy search across entity types
+
+        Returns:
+            list of (score, entity_type, entity), best first
+        """
+        processed = utils.default_process(query or "")
+        if not processed:
+            return []
+
+        best = {}
+        for entity_type in types or ENTITY_TYPES:
+            for is_short, scorer in ((False, fuzz.WRatio), (True, fuzz.ratio)):
+                key = (entity_type, is_short)
+                if key not in self._aliases:
+                    continue
+                matches = process.extract(
+                    processed,
+                    self._aliases[key],
+                    scorer=scorer,
+                    processor=None,
+                    limit=None,
+                    score_cutoff=score_cutoff
+                )
+                for _, score, alias_index in matches:
+                    self._keep_best(best, entity_type, self._owners[key][alias_index], score, season)
+
+        ranked = sorted(best.values(), key=lambda match: (-match[0], match[1]))
+        return ranked[:limit]
+
+    def _keep_best(self, best, entity_type, position, score, season):
+        entity = self.entities[entity_type][position]
+        if season is not None and season not in entity["seasons"]:
+            return
+        key = (entity_type, position)
+        if score > best.get(key, (0,))[0]:
+            best[key] = (score, entity_type, entity)
+
+    def resolve(self, entity_type, query, season=None):
+        """Best single match above RESOLVE_CUTOFF, or None"""
+        matches = self.search(query, types=[entity_type], limit=1, score_cutoff=RESOLVE_CUTOFF)
+        if not matches:
+            return None
+        entity = matches[0][2]
+        if season is None or season in entity["seasons"]:
+            return entity
+        if entity_type == "team":
+            return self._team_in_season(entity["name"], season)
+        return None
+
+    def _team_in_season(self, name, season):
+        """Follow a team's lineage to the name it raced under in a season"""
+        group = self._lineage.get(name.lower())
+        if group is None:
+            return None
+        for entity in self.entities["team"]:
+            if self._lineage.get(entity["name"].lower()) == group and season in entity["seasons"]:
+                return entity
+        return None
+
+
+def build_index(db):
+    """Build a search index from the current database contents"""
+    index = SearchIndex(cache.get_version(db))
+
+    driver_seasons = {}
+    for driver_id, year in db.query(Result.driver_id, Race.year).join(
+        Race, Result.race_id == Race.id
+    ).distinct():
+        driver_seasons.setdefault(driver_id, set()).add(year)
+
+    for driver in db.query(Driver).all():
+        name_parts = (driver.driver_name or "").split()
+        index.add("driver", {
+            "id": driver.id,
+            "code": driver.driver_code,
+            "name": driver.driver_name,
+            "number": driver.driver_number,
+            "seasons": sorted(driver_seasons.get(driver.id, ())),
+        }, [
+            driver.driver_code,
+            driver.driver_name,
+            name_parts[-1] if name_parts else None,
+            str(driver.driver_number) if driver.driver_number is not None else None,
+        ])
+
+    # Laps may span more season shards than fit on one connection
+    team_seasons = {}
+    seasons = [year for (year,) in db.query(Race.year).distinct()]
+    for batch in shards.season_batches(db, seasons):
+        for team, year in db.query(Team.name, Race.year).select_from(Lap).join(
+            Race, Lap.race_id == Race.id
+        ).join(
+            Team, Lap.team_id == Team.id
+        ).filter(
+            Race.year.in_(batch)
+        ).group_by(Lap.team_id, Race.year):
+            team_seasons.setdefault(team, set()).add(year)
+
+    for team, seasons in sorted(team_seasons.items()):
+        historical = []
+        for group in TEAM_LINEAGES:
+            if team in group:
+                historical.extend(name for name in group if name not in team_seasons)
+        index.add("team", {
+            "name": team,
+            "seasons": sorted(seasons),
+        }, [team] + TEAM_ALIASES.get(team, []) + historical)
+
+    for race in db.query(Race).order_by(Race.year, Race.event_date).all():
+        short_name = race.race_name.replace("Grand Prix", "").strip()
+        index.add("race", {
+            "id": race.id,
+            "year": race.year,
+            "name": race.race_name,
+            "date": race.event_date.isoformat() if race.event_date else None,
+            "location": race.location,
+            "country": race.country,
+            "seasons": [race.year],
+        }, [
+            race.race_name,
+            short_name,
+            f"{race.year} {short_name}",
+            race.location,
+            race.country,
+        ])
+
+    return index
+
+
+_index = None
+_lock = threading.Lock()
+
+
+def get_index(db):
+    """Return the current index, rebuilding it if the dataset changed"""
+    global _index
+    version = cache.get_version(db)
+    if _index is not None and _index.version == version:
+        return _index
+    with _lock:
+        if _index is None or _index.version != version:
+            # Own session: the caller's may be routed to a single season shard
+            index_db = SessionLocal()
+            try:
+                _index = build_index(index_db)
+            finally:
+                index_db.close()
+        return _index
+
+
+def resolve_driver(db, driver_code):
+    """
+    Look up a driver by exact code, falling back to a fuzzy match on code,
+    name or number
+    """
+    driver = db.query(Driver).filter(Driver.driver_code == driver_code).first()
+    if driver:
+        return driver
+    entity = get_index(db).resolve("driver", driver_code)
+    if entity is None:
+        return None
+    return db.get(Driver, entity["id"])
+
+
+def resolve_team(db, team, season=None):
+    """
+    Map a loosely written team name to the stored Lap.team string, following
+    renames when a season is given. Returns the input unchanged if nothing
+    matches.
+    """
+    entity = get_index(db).resolve("team", team, season)
+    return entity["name"] if entity else team
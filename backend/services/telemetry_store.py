@@ -0,0 +1,242 @@
+"""
+telemetry_store.py
+Compressed columnar storage for per-lap car telemetry
+
+Each race is stored as two files under TELEMETRY_DIR:
+    race_<id>.bin   zlib-compressed column chunks, one per channel per lap,
+                    followed by the write's generation id
+    race_<id>.json  index mapping (driver, lap) to chunk offsets, with the
+                    generation id
+
+Reads memory-map the .bin file and decompress only the chunks of the
+requested lap. A rewrite replaces the two files one after the other, so
+a reader only uses a pair whose generation ids match.
+"""
+
+import json
+import mmap
+import os
+import threading
+import time
+import zlib
+
+import numpy as np
+
+TELEMETRY_DIR = os.environ.get("F1_TELEMETRY_DIR", "data/telemetry")
+
+# Channel name -> (FastF1 car data column, storage dtype)
+CHANNELS = {
+    "time": ("Time", np.float32),
+    "distance": ("Distance", np.float32),
+    "speed": ("Speed", np.float32),
+    "throttle": ("Throttle", np.int16),
+    "brake": ("Brake", np.uint8),
+    "gear": ("nGear", np.int8),
+    "rpm": ("RPM", np.float32),
+    "drs": ("DRS", np.uint8),
+}
+
+COMPRESSION_LEVEL = 6
+
+GENERATION_BYTES = 16
+# Attempts to open a matching data file and index while a rewrite is swapping them
+OPEN_ATTEMPTS = 50
+
+_open_files = {}
+_lock = threading.Lock()
+
+
+def _race_paths(race_id):
+    base = os.path.join(TELEMETRY_DIR, f"race_{race_id}")
+    return base + ".bin", base + ".json"
+
+
+def _lap_key(driver_code, lap_number):
+    return f"{driver_code}:{int(lap_number)}"
+
+
+def write_race_telemetry(race_id, laps):
+    """
+    Write all telemetry of a race, replacing any previous file
+
+    Args:
+        race_id: Race ID
+        laps: Iterable of (driver_code, lap_number, channels) where channels
+            maps channel name to a 1-D array-like of equal length
+
+    Returns:
+        int: Number of laps written
+    """
+    os.makedirs(TELEMETRY_DIR, exist_ok=True)
+    data_path, index_path = _race_paths(race_id)
+    tmp_data_path = data_path + ".tmp"
+    tmp_index_path = index_path + ".tmp"
+
+    generation = os.urandom(GENERATION_BYTES)
+    index = {"race_id": race_id, "generation": generation.hex(), "laps": {}}
+    offset = 0
+    with open(tmp_data_path, "wb") as f:
+        for driver_code, lap_number, channels in laps:
+            entry = {"samples": None, "chunks": {}}
+            for name, (_, dtype) in CHANNELS.items():
+                values = np.asarray(channels[name], dtype=dtype)
+                if entry["samples"] is None:
+                    entry["samples"] = int(values.shape[0])
+                chunk = zlib.compress(values.tobytes(), COMPRESSION_LEVEL)
+                f.write(chunk)
+                entry["chunks"][name] = [offset, len(chunk)]
+                offset += len(chunk)
+            index["laps"][_lap_key(driver_code, lap_number)] = entry
+        f.write(generation)
+
+    with open(tmp_index_path, "w") as f:
+        json.dump(index, f)
+
+    # Readers retry until the generations of the two files match
+    os.replace(tmp_data_path, data_path)
+    os.replace(tmp_index_path, index_path)
+    return len(index["laps"])
+
+
+def _same_generation(mapped, index):
+    generation = index.get("generation")
+    if generation is None:
+        # Written before generations were recorded
+        return True
+    return len(mapped) >= GENERATION_BYTES and mapped[-GENERATION_BYTES:] == bytes.fromhex(generation)
+
+
+def _open_race(race_id):
+    """Return (mmap, index) for a race, reopening if the files were replaced"""
+    data_path, index_path = _race_paths(race_id)
+    for _ in range(OPEN_ATTEMPTS):
+        try:
+            stamp = (os.stat(data_path).st_mtime_ns, os.stat(index_path).st_mtime_ns)
+        except FileNotFoundError:
+            return None
+
+        with _lock:
+            cached = _open_files.get(race_id)
+            if cached is not None and cached[0] == stamp:
+                return cached[1], cached[2]
+
+            with open(index_path) as f:
+                index = json.load(f)
+            with open(data_path, "rb") as f:
+                # Zero-length files cannot be mapped
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if os.fstat(f.fileno()).st_size else b""
+
+            if _same_generation(mapped, index):
+                # The previous mapping is left for the garbage collector, since
+                # other threads may still be reading from it
+                _open_files[race_id] = (stamp, mapped, index)
+                return mapped, index
+
+        # Caught between the writer's two replaces
+        time.sleep(0.01)
+    raise RuntimeError(f"Telemetry of race {race_id} is being rewritten; its data and index do not match")
+
+
+def has_race(race_id):
+    """Check whether telemetry has been stored for a race"""
+    return all(os.path.exists(path) for path in _race_paths(race_id))
+
+
+def read_lap(race_id, driver_code, lap_number, channels=None):
+    """
+    Read one lap of telemetry
+
+    Args:
+        race_id: Race ID
+        driver_code: Driver code (e.g., VER)
+        lap_number: Lap number
+        channels: Optional subset of channel names (default: all)
+
+    Returns:
+        dict: channel name -> numpy array, or None if the lap is not stored
+    """
+    opened = _open_race(race_id)
+    if opened is None:
+        return None
+    mapped, index = opened
+
+    entry = index["laps"].get(_lap_key(driver_code, lap_number))
+    if entry is None:
+        return None
+
+    result = {}
+    for name in channels or CHANNELS:
+        offset, length = entry["chunks"][name]
+        raw = zlib.decompress(mapped[offset:offset + length])
+        result[name] = np.frombuffer(raw, dtype=CHANNELS[name][1])
+    return result
+
+
+def lttb_indices(x, y, threshold):
+    """
+    Largest-Triangle-Three-Buckets downsampling
+
+    Args:
+        x: Monotonic x values
+        y: Values whose visual shape should be preserved
+        threshold: Number of points to keep
+
+    Returns:
+        numpy array of selected indices (always includes first and last)
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+
+    # Interior points are split into threshold - 2 buckets
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], max(edges[i + 1], edges[i] + 1)
+
+        # Average of the next bucket (or the last point)
+        if i + 2 < len(edges):
+            next_start, next_end = edges[i + 1], max(edges[i + 2], edges[i + 1] + 1)
+            avg_x = x[next_start:next_end].mean()
+            avg_y = y[next_start:next_end].mean()
+        else:
+            avg_x, avg_y = x[n - 1], y[n - 1]
+
+        areas = np.abs(
+            (x[a] - avg_x) * (y[start:end] - y[a])
+            - (x[a] - x[start:end]) * (avg_y - y[a])
+        )
+        a = start + int(np.argmax(areas))
+        selected[i + 1] = a
+
+    return selected
+
+
+def downsample_lap(lap, points):
+    """
+    Downsample every channel of a lap with LTTB on speed over distance
+
+    Args:
+        lap: dict returned by read_lap()
+        points: Target number of samples
+
+    Returns:
+        dict: channel name -> list of values
+    """
+    indices = lttb_indices(lap["distance"], lap["speed"], points)
+
+    result = {}
+    for name, values in lap.items():
+        values = values[indices]
+        if values.dtype.kind == "f":
+            # float32 -> float64 would otherwise expose representation noise
+            values = np.round(values.astype(np.float64), 3)
+        result[name] = values.tolist()
+    return result
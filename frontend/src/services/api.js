@@ -23,6 +23,9 @@ export const api = {
   driverCompare: (driver1, driver2, season = 2024) =>
     request(`${API_PREFIX}/drivers/compare?driver1=${driver1}&driver2=${driver2}&season=${season}`),
 
+  search: (query, type = null, season = null) =>
+    request(`${API_PREFIX}/search?q=${encodeURIComponent(query)}${type ? `&type=${type}` : ''}${season ? `&season=${season}` : ''}`),
+
   races: (season) => request(`${API_PREFIX}/races?season=${season}`),
   race: (id) => request(`${API_PREFIX}/races/${id}`),
   raceResults: (raceId) => request(`${API_PREFIX}/races/${raceId}/results`),
@@ -30,10 +33,31 @@ export const api = {
     request(`${API_PREFIX}/races/${raceId}/laps${driverCode ? `?driver_code=${driverCode}` : ''}`),
   laps: (raceId, driverCode = null) =>
     request(`${API_PREFIX}/races/${raceId}/laps${driverCode ? `?driver_code=${driverCode}` : ''}`),
-  fastestLaps: (season = 2024, limit = 8) =>
-    request(`${API_PREFIX}/laps/fastest?season=${season}&limit=${limit}`),
-  teamPerformance: (team, season = 2024) =>
-    request(`${API_PREFIX}/team/${encodeURIComponent(team)}/performance?season=${season}`),
+  raceTrace: (raceId) => request(`${API_PREFIX}/races/${raceId}/trace`),
+  raceSectors: (raceId, onlyClean = false) =>
+    request(`${API_PREFIX}/races/${raceId}/sectors${onlyClean ? '?only_clean=true' : ''}`),
+  raceTheoreticalBest: (raceId, onlyClean = false) =>
+    request(`${API_PREFIX}/races/${raceId}/theoretical-best${onlyClean ? '?only_clean=true' : ''}`),
+  raceSpeedTraps: (raceId) => request(`${API_PREFIX}/races/${raceId}/speed-traps`),
+  raceStrategy: (raceId) => request(`${API_PREFIX}/races/${raceId}/strategy`),
+  lapTelemetry: (raceId, driverCode, lapNumber, points = 500) =>
+    request(`${API_PREFIX}/races/${raceId}/telemetry/${driverCode}/${lapNumber}?points=${points}`),
+  fastestLaps: (season = 2024, limit = 8, onlyClean = false) =>
+    request(`${API_PREFIX}/laps/fastest?season=${season}&limit=${limit}${onlyClean ? '&only_clean=true' : ''}`),
+  teams: (season = 2024, onlyClean = false) =>
+    request(`${API_PREFIX}/teams?season=${season}${onlyClean ? '&only_clean=true' : ''}`),
+  teammateHeadToHead: (season = 2024, onlyClean = false) =>
+    request(`${API_PREFIX}/teams/head-to-head?season=${season}${onlyClean ? '&only_clean=true' : ''}`),
+  teamsStrategy: (season = 2024) => request(`${API_PREFIX}/teams/strategy?season=${season}`),
+  circuits: () => request(`${API_PREFIX}/circuits/`),
+  circuitHistory: (circuit, since = null) =>
+    request(`${API_PREFIX}/circuits/${encodeURIComponent(circuit)}/history${since ? `?since=${since}` : ''}`),
+  standings: (season = 2024, type = 'drivers', afterRound = null) =>
+    request(`${API_PREFIX}/standings?season=${season}&type=${type}${afterRound ? `&after_round=${afterRound}` : ''}`),
+  standingsProgression: (season = 2024, type = 'drivers') =>
+    request(`${API_PREFIX}/standings/progression?season=${season}&type=${type}`),
+  teamPerformance: (team, season = 2024, onlyClean = false) =>
+    request(`${API_PREFIX}/team/${encodeURIComponent(team)}/performance?season=${season}${onlyClean ? '&only_clean=true' : ''}`),
   teamPitStops: (team, season = 2024) =>
     request(`${API_PREFIX}/team/${encodeURIComponent(team)}/pit-stops?season=${season}`),
   teamPointsPerRace: (team, season = 2024) =>